@@ -0,0 +1,548 @@
+"""
+비동기(ASGI) 서빙 모드 (uvicorn asgi_app:app)
+
+OpenAI 호출을 AsyncOpenAI로 처리하는 경량 엔드포인트 모음입니다. flask_app과 같은 캐시, 블롭 저장소,
+프롬프트, 긴 문서 섹션 요약 파이프라인을 사용하므로 같은 입력에는 같은 결과를 돌려줍니다.
+제공하는 엔드포인트: /, /ready, /api/analyze-text(/stream), /api/upload-file, /api/generate-image(s),
+/api/images/<key>, /api/cache/stats, /api/openai/stats, /api/echo
+덱 저장/수정/내보내기(/api/decks...), 작업 큐(/api/jobs...), 일괄 분석(/api/analyze-batch)과 /metrics는
+Flask 앱(gunicorn flask_app:app)에서만 제공합니다.
+"""
+from fastapi import FastAPI, Request, UploadFile, File, Form
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse, RedirectResponse, Response
+from starlette.datastructures import Headers
+import os
+import re
+import json
+import codecs
+import asyncio
+import logging
+import anyio
+from dotenv import load_dotenv
+
+# 환경 변수 로드 (로깅 설정과 서비스 모듈이 import 시점에 읽는 설정보다 먼저)
+load_dotenv()
+
+from services.openai_service import OpenAIService, get_async_client, close_async_client, get_blob_store, get_schedulers
+from services.deadlines import (
+    Deadline, DeadlineExceededError, DEADLINE_HEADER, REASON_DISCONNECT, parse_timeout, set_deadline, reset_deadline,
+    current_deadline,
+)
+from services.metrics import DEADLINE_MISSES
+from services.logging_config import configure_logging, preview, should_log_payload
+from services.cache import create_result_cache
+from services.prompts import analysis_cache_key, upload_cache_key, image_cache_key, resolve_image_tier, IMAGE_TIER_FINAL
+from services.chunking import UploadTooLargeError, detect_encoding, hash_stream, iter_decoded_text, iter_sections
+from services.card_parser import is_sample_cards
+from services.blob_store import is_valid_key, content_type_for_key, LocalBlobStore
+
+# 로깅 설정
+configure_logging(default_level="INFO")
+logger = logging.getLogger(__name__)
+
+# 결과 캐시 (flask_app과 같은 키/설정 사용, RESULT_CACHE_DB 지정 시 공유)
+result_cache = create_result_cache()
+
+# 이미지 일괄 생성 설정 (flask_app과 동일한 환경 변수)
+IMAGE_BATCH_DECK_CONCURRENCY = int(os.getenv("IMAGE_BATCH_DECK_CONCURRENCY", "4"))
+IMAGE_BATCH_MAX_CARDS = int(os.getenv("IMAGE_BATCH_MAX_CARDS", "10"))
+# 프로세스 전체에서 동시에 진행할 수 있는 최대 이미지 생성 수
+ASGI_MAX_INFLIGHT_IMAGES = int(os.getenv("ASGI_MAX_INFLIGHT_IMAGES", "200"))
+
+# 업로드 파일 최대 크기와 섹션 크기 (flask_app과 동일한 환경 변수)
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+CHUNK_SECTION_TOKENS = int(os.getenv("CHUNK_SECTION_TOKENS", "4000"))
+
+# 단일 구간 Range 헤더 (bytes=시작-끝, bytes=-끝에서부터의 길이)
+_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# 요청 처리 기한 (초, flask_app과 동일) - X-Request-Timeout 헤더 값의 상한이자 헤더가 없을 때의 기본값 (0이면 끔)
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "110"))
+
+
+class RequestDeadlineMiddleware:
+    """
+    요청마다 처리 기한을 설정하고, 클라이언트 연결이 끊기면 진행 중인 처리를 취소하는 ASGI 미들웨어
+    요청 본문을 다 받은 뒤에는 연결 끊김 메시지를 따로 기다리다가 응답을 보내기 전에 끊기면
+    엔드포인트 태스크를 취소하여 OpenAI 요청도 함께 중단합니다 (앱이 받는 receive에도 끊김을 전달).
+    """
+
+    def __init__(self, app, timeout=None):
+        self.app = app
+        self.timeout = timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timeout = parse_timeout(Headers(scope=scope).get(DEADLINE_HEADER), self.timeout) or self.timeout or None
+        deadline = Deadline(timeout)
+        body_received = anyio.Event()
+        disconnected = anyio.Event()
+        response_sent = False
+
+        async def app_receive():
+            if body_received.is_set():
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+            elif not message.get("more_body", False):
+                body_received.set()
+            return message
+
+        async def app_send(message):
+            nonlocal response_sent
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_sent = True
+            await send(message)
+
+        async def watch_disconnect(cancel_scope):
+            await body_received.wait()
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+            if not response_sent:
+                logger.info("Client disconnected, cancelling %s %s", scope["method"], scope["path"])
+                DEADLINE_MISSES.inc(stage="request", reason=REASON_DISCONNECT)
+                deadline.cancel()
+                cancel_scope.cancel()
+
+        token = set_deadline(deadline)
+        try:
+            async with anyio.create_task_group() as task_group:
+                task_group.start_soon(watch_disconnect, task_group.cancel_scope)
+                await self.app(scope, app_receive, app_send)
+                task_group.cancel_scope.cancel()
+        finally:
+            reset_deadline(token)
+
+
+app = FastAPI(title="newscard")
+app.add_middleware(RequestDeadlineMiddleware, timeout=REQUEST_TIMEOUT)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+image_semaphore = None
+
+
+@app.on_event("startup")
+async def startup():
+    global image_semaphore
+    image_semaphore = asyncio.Semaphore(ASGI_MAX_INFLIGHT_IMAGES)
+    # 워커 프로세스마다 연결 풀을 미리 만들어 첫 요청 지연을 줄임
+    get_async_client()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_async_client()
+
+
+def error_response(message, status_code):
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except Exception:
+        return None
+
+
+def error_status(error=None):
+    """오류 응답 상태 코드 (요청 기한이 지나 중단된 경우 504, 그 외 500)"""
+    if isinstance(error, DeadlineExceededError):
+        return 504
+    deadline = current_deadline()
+    return 504 if deadline is not None and deadline.expired else 500
+
+
+def wants_cache_bypass(request, data=None):
+    if data and str(data.get('noCache', '')).lower() in ('1', 'true'):
+        return True
+    return 'no-cache' in request.headers.get('cache-control', '').lower()
+
+
+def absolute_image_url(request, image_url):
+    if image_url and image_url.startswith('/'):
+        return str(request.base_url).rstrip('/') + image_url
+    return image_url
+
+
+async def cached_analyze_text(text, bypass_cache=False):
+    key = analysis_cache_key(text)
+    if not bypass_cache:
+        hit, cards = await anyio.to_thread.run_sync(result_cache.get, key)
+        if hit:
+            return cards, True
+
+    cards = [card.dict() for card in await OpenAIService.analyze_document(text)]
+    if not is_sample_cards(cards):
+        await anyio.to_thread.run_sync(result_cache.set, key, cards)
+    return cards, False
+
+
+async def cached_generate_image(prompt, title="", content="", highlight="", style="", background_color="", bypass_cache=False,
+                                tier=IMAGE_TIER_FINAL):
+    key = image_cache_key(prompt, title, content, highlight, style, background_color, tier)
+    if not bypass_cache:
+        hit, image_url = await anyio.to_thread.run_sync(result_cache.get, key)
+        if hit:
+            return image_url, True
+
+    async with image_semaphore:
+        image_url = await OpenAIService.generate_image(prompt, title, content, highlight, style, background_color, tier)
+    if image_url:
+        await anyio.to_thread.run_sync(result_cache.set, key, image_url)
+    return image_url, False
+
+
+# 루트 엔드포인트 (프로세스 생존 확인용)
+@app.get('/')
+async def root():
+    return {"status": "ok", "message": "API server is running"}
+
+
+# 준비 상태 엔드포인트 (워커 시작 처리가 끝난 뒤 200, OpenAI 상태는 보고만 함)
+@app.get('/ready')
+async def ready():
+    checks = {
+        "openai_key": "ok" if os.getenv("OPENAI_API_KEY") else "missing",
+        "openai_breaker": {name: scheduler.breaker.state for name, scheduler in get_schedulers().items()},
+    }
+    if image_semaphore is None:
+        return JSONResponse({"status": "unavailable", "checks": checks}, status_code=503)
+    return {"status": "ready", "checks": checks}
+
+
+# 텍스트 분석 엔드포인트
+@app.post('/api/analyze-text')
+async def api_analyze_text(request: Request):
+    try:
+        data = await read_json(request)
+
+        if not data or 'text' not in data:
+            return error_response("No text provided", 400)
+
+        text = data['text']
+        logger.info("Analyzing text (%d chars)", len(text))
+        if should_log_payload(logger):
+            logger.debug("Analysis input: %s", preview(text))
+
+        cards, cached = await cached_analyze_text(text, wants_cache_bypass(request, data))
+        logger.info("Generated %s cards (cached: %s)", len(cards), cached)
+
+        return {"cards": cards, "cached": cached}
+    except Exception as e:
+        logger.error("Error in analyze_text API: %s", e)
+        return error_response(str(e), error_status(e))
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# 스트리밍 텍스트 분석 엔드포인트
+@app.post('/api/analyze-text/stream')
+async def api_analyze_text_stream(request: Request):
+    data = await read_json(request)
+
+    if not data or 'text' not in data:
+        return error_response("No text provided", 400)
+
+    text = data['text']
+    bypass_cache = wants_cache_bypass(request, data)
+
+    async def generate():
+        key = analysis_cache_key(text, structured=False)
+        if not bypass_cache:
+            hit, cards = await anyio.to_thread.run_sync(result_cache.get, key)
+            if hit:
+                for index, card in enumerate(cards):
+                    yield sse_event("card", {"index": index, "card": card})
+                yield sse_event("done", {"count": len(cards), "cached": True})
+                return
+
+        cards = []
+        try:
+            async for card in OpenAIService.stream_analyze_text(text):
+                yield sse_event("card", {"index": len(cards), "card": card.dict()})
+                cards.append(card.dict())
+        except DeadlineExceededError as e:
+            logger.warning("Streaming analysis stopped: %s", e)
+            yield sse_event("error", {"error": str(e)})
+            return
+        except Exception as e:
+            logger.error("Error in streaming analysis: %s", e)
+            if not cards:
+                for index, card in enumerate(OpenAIService._get_sample_cards(f"API 오류: {str(e)}")):
+                    yield sse_event("card", {"index": index, "card": card.dict()})
+            yield sse_event("error", {"error": str(e)})
+            return
+
+        if not cards:
+            cards = [card.dict() for card in OpenAIService._get_sample_cards()]
+            for index, card in enumerate(cards):
+                yield sse_event("card", {"index": index, "card": card})
+        elif not is_sample_cards(cards):
+            await anyio.to_thread.run_sync(result_cache.set, key, cards)
+        yield sse_event("done", {"count": len(cards), "cached": False})
+
+    return StreamingResponse(
+        generate(),
+        media_type='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# 파일 업로드 엔드포인트
+@app.post('/api/upload-file')
+async def api_upload_file(request: Request, file: UploadFile = File(None), noCache: str = Form(""),
+                          encoding: str = Form("")):
+    try:
+        if file is None:
+            return error_response("No file part", 400)
+
+        if file.filename == '':
+            return error_response("No selected file", 400)
+
+        logger.info("File upload requested: %s", file.filename)
+
+        # flask_app과 같이 파일 전체를 메모리에 올리지 않고 해시/크기 검사 후 인코딩 판별 (UTF-8이 아니면 CP949)
+        digest, sample, size = await anyio.to_thread.run_sync(hash_stream, file.file, UPLOAD_MAX_BYTES)
+        encoding = encoding or detect_encoding(sample)
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            return error_response(f"Unknown encoding: {encoding}", 400)
+        logger.info("File size: %s bytes, encoding: %s", size, encoding)
+
+        key = upload_cache_key(digest, encoding)
+        if not wants_cache_bypass(request, {"noCache": noCache}):
+            hit, cards = await anyio.to_thread.run_sync(result_cache.get, key)
+            if hit:
+                return {"cards": cards, "cached": True}
+
+        # 조각 단위로 디코딩하여 섹션으로 나눈 뒤 섹션별로 요약/분석
+        sections = await anyio.to_thread.run_sync(
+            lambda: list(iter_sections(iter_decoded_text(file.file, encoding), CHUNK_SECTION_TOKENS))
+        )
+        cards = [card.dict() for card in await OpenAIService.analyze_sections(sections)]
+        if not is_sample_cards(cards):
+            await anyio.to_thread.run_sync(result_cache.set, key, cards)
+        logger.info("Generated %s cards from file", len(cards))
+
+        return {"cards": cards, "cached": False}
+    except UploadTooLargeError as e:
+        return error_response(str(e), 413)
+    except Exception as e:
+        logger.error("Error in upload_file API: %s", e)
+        return error_response(str(e), error_status(e))
+
+
+# 이미지 생성 엔드포인트
+@app.post('/api/generate-image')
+async def api_generate_image(request: Request):
+    try:
+        data = await read_json(request)
+
+        if not data:
+            return error_response("No data provided", 400)
+
+        if 'prompt' not in data:
+            return error_response("No prompt provided", 400)
+        try:
+            tier = resolve_image_tier(data.get('tier'))
+        except ValueError as e:
+            return error_response(str(e), 400)
+
+        image_url, cached = await cached_generate_image(
+            data['prompt'],
+            data.get('title', ''),
+            data.get('content', ''),
+            data.get('highlight', ''),
+            data.get('style', '사진'),
+            data.get('backgroundColor', ''),
+            bypass_cache=wants_cache_bypass(request, data),
+            tier=tier,
+        )
+
+        if not image_url:
+            logger.error("Image generation failed - empty URL returned")
+            return error_response("이미지 생성에 실패했습니다.", 500)
+
+        return {"image_url": absolute_image_url(request, image_url), "cached": cached, "tier": tier}
+    except Exception as e:
+        logger.error("Error in generate_image API: %s", e)
+        return error_response(str(e), error_status(e))
+
+
+# 이미지 일괄 생성 엔드포인트
+@app.post('/api/generate-images')
+async def api_generate_images(request: Request):
+    try:
+        data = await read_json(request)
+
+        if not data or not isinstance(data.get('cards'), list) or not data['cards']:
+            return error_response("No cards provided", 400)
+
+        cards = data['cards']
+        if len(cards) > IMAGE_BATCH_MAX_CARDS:
+            return error_response(f"Too many cards (max {IMAGE_BATCH_MAX_CARDS})", 400)
+
+        style = data.get('style', '사진')
+        background_color = data.get('backgroundColor', '')
+        try:
+            concurrency = int(data.get('concurrency', IMAGE_BATCH_DECK_CONCURRENCY))
+        except (TypeError, ValueError):
+            concurrency = IMAGE_BATCH_DECK_CONCURRENCY
+        concurrency = max(1, min(IMAGE_BATCH_DECK_CONCURRENCY, concurrency))
+        try:
+            tier = resolve_image_tier(data.get('tier'))
+        except ValueError as e:
+            return error_response(str(e), 400)
+        bypass_cache = wants_cache_bypass(request, data)
+        deck_semaphore = asyncio.Semaphore(concurrency)
+
+        async def generate_one(index, card):
+            prompt = (card or {}).get('prompt', '')
+            if not prompt or not prompt.strip():
+                return {"index": index, "image_url": "", "cached": False, "error": "No prompt provided"}
+            async with deck_semaphore:
+                try:
+                    image_url, cached = await cached_generate_image(
+                        prompt,
+                        card.get('title', ''),
+                        card.get('content', ''),
+                        card.get('highlight', ''),
+                        card.get('style', style),
+                        card.get('backgroundColor', background_color),
+                        bypass_cache,
+                        tier,
+                    )
+                    error = None if image_url else "이미지 생성에 실패했습니다."
+                except Exception as e:
+                    image_url, cached, error = "", False, str(e)
+            return {"index": index, "image_url": absolute_image_url(request, image_url), "cached": cached, "tier": tier, "error": error}
+
+        results = await asyncio.gather(*(generate_one(i, card) for i, card in enumerate(cards)))
+        succeeded = sum(1 for r in results if r["image_url"])
+        body = {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+        if not succeeded:
+            return JSONResponse({**body, "error": "이미지 생성에 실패했습니다."}, status_code=error_status())
+        return body
+    except Exception as e:
+        logger.error("Error in generate_images API: %s", e)
+        return error_response(str(e), error_status(e))
+
+
+def etag_matches(header, etag):
+    """If-None-Match/If-Range 값이 ETag와 일치하는지 (약한 비교)"""
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def parse_byte_range(header, size):
+    """
+    단일 구간 Range 헤더를 (시작, 끝) 바이트 위치로 변환
+    지원하지 않는 형식(여러 구간 등)이면 None(전체 전송), 파일 범위를 벗어나면 ValueError
+    """
+    match = _RANGE_PATTERN.match(header.strip())
+    if match is None or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def read_file_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start + 1)
+
+
+# 생성된 이미지 제공 엔드포인트 (flask_app과 같이 ETag 조건부 요청과 Range 요청 지원)
+@app.get('/api/images/{key}')
+async def api_get_image(request: Request, key: str):
+    if not is_valid_key(key):
+        return error_response("Not found", 404)
+
+    blob_store = get_blob_store()
+    if not isinstance(blob_store, LocalBlobStore):
+        return RedirectResponse(blob_store.presigned_url(key))
+
+    path = blob_store.path(key)
+    if not os.path.exists(path):
+        return error_response("Not found", 404)
+
+    # 콘텐츠 해시가 곧 키이므로 ETag로 사용하고 영구 캐시 허용
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or etag_matches(if_range, etag)):
+        size = os.path.getsize(path)
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            body = await anyio.to_thread.run_sync(read_file_range, path, start, end)
+            return Response(
+                body,
+                status_code=206,
+                media_type=content_type_for_key(key),
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"},
+            )
+
+    return FileResponse(path, media_type=content_type_for_key(key), headers=headers)
+
+
+# 캐시 통계 엔드포인트
+@app.get('/api/cache/stats')
+async def api_cache_stats():
+    return result_cache.stats()
+
+
+# OpenAI 호출 스케줄러 상태 엔드포인트 (재시도, 속도 제한 대기, 회로 차단기)
+@app.get('/api/openai/stats')
+async def api_openai_stats():
+    return {name: scheduler.stats() for name, scheduler in get_schedulers().items()}
+
+
+# 에코 엔드포인트 (테스트용)
+@app.post('/api/echo')
+async def echo(request: Request):
+    return {"received": await read_json(request)}
+
+
+# 애플리케이션 직접 실행 시에만 서버 시작
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run("asgi_app:app", host='0.0.0.0', port=8000)
@@ -0,0 +1,93 @@
+"""
+여러 기사 일괄 카드뉴스 생성 - JSONL 파일의 기사들을 analyze_text로 동시에 분석하여 결과를 JSONL로 기록합니다.
+
+입력 한 줄은 {"id": "...", "text": "..."} 객체(또는 본문 문자열)이며, 결과 파일에는 끝나는 순서대로
+{"id", "index", "status", "cards", "deck_id", "error", "elapsed"}가 한 줄씩 추가됩니다.
+중간에 중단되어도 같은 출력 파일로 다시 실행하면 성공한 기사는 건너뛰고 이어서 처리합니다.
+
+backend 디렉토리에서 실행:
+
+    python batch_cli.py articles.jsonl -o decks.jsonl --concurrency 4
+    cat articles.jsonl | python batch_cli.py - -o decks.jsonl
+"""
+import argparse
+import os
+import sys
+import time
+
+from services.batch import iter_jsonl_articles, load_completed_ids, JsonlWriter, run_batch, STATUS_OK, STATUS_ERROR
+
+# 서버 없이 실행하므로 요청 로그 대신 진행 상황만 출력
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import flask_app  # noqa: E402  OpenAI 클라이언트, 캐시, 스케줄러, 덱 저장소를 서버와 같은 설정으로 사용
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Turn a JSONL file of articles into card news decks")
+    parser.add_argument("input", help="JSONL file with one article per line ('-' for stdin)")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to append results to")
+    parser.add_argument("--concurrency", type=int, default=flask_app.BATCH_MAX_CONCURRENCY)
+    parser.add_argument("--no-cache", action="store_true", help="ignore cached analysis results")
+    parser.add_argument("--no-resume", action="store_true", help="process every article even if already in the output")
+    args = parser.parse_args()
+
+    # 동시 처리 수는 일괄 처리 스레드 풀 크기(BATCH_MAX_WORKERS)를 넘을 수 없음
+    concurrency = max(1, min(args.concurrency, flask_app.BATCH_MAX_WORKERS))
+    if concurrency != args.concurrency:
+        print(
+            f"--concurrency {args.concurrency} is outside 1..BATCH_MAX_WORKERS ({flask_app.BATCH_MAX_WORKERS}), "
+            f"using {concurrency}",
+            file=sys.stderr,
+        )
+    print(f"Processing with concurrency {concurrency}", file=sys.stderr)
+
+    # 서버 워커와 같이 비슷한 기사 색인을 미리 불러옴 (작업 큐는 서버에서만 실행)
+    flask_app.duplicates.warm()
+
+    completed = set() if args.no_resume else load_completed_ids(args.output)
+    if completed:
+        print(f"Resuming: {len(completed)} articles already completed in {args.output}", file=sys.stderr)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    counts = {"succeeded": 0, "failed": 0, "skipped": 0}
+    started = time.perf_counter()
+    try:
+        with JsonlWriter(args.output) as writer:
+            results = run_batch(
+                iter_jsonl_articles(source),
+                lambda article: flask_app.analyze_batch_article(article, args.no_cache),
+                flask_app.batch_executor,
+                concurrency,
+                writer,
+                completed,
+            )
+            try:
+                for record in results:
+                    if record["status"] == STATUS_OK:
+                        counts["succeeded"] += 1
+                        print(f"[ok] {record['id']} ({len(record['cards'])} cards, {record['elapsed']}s)", file=sys.stderr)
+                    elif record["status"] == STATUS_ERROR:
+                        counts["failed"] += 1
+                        print(f"[error] {record['id']}: {record['error']}", file=sys.stderr)
+                    else:
+                        counts["skipped"] += 1
+            finally:
+                results.close()
+    except KeyboardInterrupt:
+        print("Interrupted, in-flight articles were written; rerun to resume", file=sys.stderr)
+        return 130
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Done in {elapsed:.1f}s: {counts['succeeded']} succeeded, {counts['failed']} failed, {counts['skipped']} skipped",
+        file=sys.stderr,
+    )
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
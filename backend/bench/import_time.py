@@ -0,0 +1,153 @@
+"""
+워커 시작 시간 벤치마크 - 새 프로세스에서 flask_app을 import하고 /ready가 응답하기까지의 시간과,
+gunicorn --preload처럼 import가 끝난 프로세스를 fork한 워커가 준비되기까지의 시간을 측정합니다.
+
+backend 디렉토리에서 실행:
+
+    python bench/import_time.py --runs 5
+    python bench/import_time.py --runs 5 --top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 새 프로세스에서 import -> 앱 생성 -> 첫 /ready 응답까지 단계별 시간 (초)
+_COLD_START = """
+import json, time
+started = time.perf_counter()
+import flask_app
+imported = time.perf_counter()
+client = flask_app.app.test_client()
+status = client.get('/ready').status_code
+ready = time.perf_counter()
+import openai
+sdk = time.perf_counter()
+flask_app.get_openai_client()
+client_ready = time.perf_counter()
+print(json.dumps({
+    "import": imported - started, "first_ready": ready - imported, "status": status,
+    "openai_sdk": sdk - ready, "openai_client": client_ready - sdk,
+}))
+"""
+
+# import가 끝난 프로세스(gunicorn --preload 마스터)에서 fork한 워커가 /ready에 응답하기까지의 시간 (초)
+_FORKED_WORKER = """
+import json, os, time
+import flask_app
+import openai
+client = flask_app.app.test_client()
+read_fd, write_fd = os.pipe()
+started = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    flask_app.init_worker()
+    status = flask_app.app.test_client().get('/ready').status_code
+    os.write(write_fd, json.dumps({"fork_ready": time.perf_counter() - started, "status": status}).encode())
+    os._exit(0)
+os.waitpid(pid, 0)
+print(os.read(read_fd, 4096).decode())
+"""
+
+
+def run_python(code, env, extra_args=()):
+    result = subprocess.run(
+        [sys.executable, *extra_args, "-c", code], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    return result
+
+
+def bench_env(workdir):
+    return dict(
+        os.environ,
+        OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "bench"),
+        LOG_LEVEL="WARNING",
+        BLOB_STORE="local",
+        BLOB_STORE_DIR=os.path.join(workdir, "images"),
+        JOB_QUEUE_DB=os.path.join(workdir, "jobs.db"),
+        DECK_STORE_DB=os.path.join(workdir, "decks.db"),
+        BATCH_OUTPUT_DIR=os.path.join(workdir, "batches"),
+        PYTHONDONTWRITEBYTECODE="0",
+    )
+
+
+def summarize(samples):
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def top_imports(env, limit):
+    """python -X importtime 결과에서 flask_app이 직접 import하는 모듈 중 누적 시간이 큰 순서"""
+    stderr = run_python("import flask_app", env, ("-X", "importtime")).stderr
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            entries.append((int(cumulative) / 1000, name.strip()))
+    entries.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(ms, 1)} for ms, name in entries[:limit]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure backend import and worker start time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="show the N slowest direct imports of flask_app")
+    parser.add_argument("--json", dest="json_path", help="write the report to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="newscard-import-")
+    env = bench_env(workdir)
+    # 첫 실행은 바이트코드 컴파일과 DB 생성이 섞이므로 버림
+    run_python(_COLD_START, env)
+
+    cold = [json.loads(run_python(_COLD_START, env).stdout) for _ in range(args.runs)]
+    forked = [json.loads(run_python(_FORKED_WORKER, env).stdout.strip()) for _ in range(args.runs)]
+
+    report = {
+        "runs": args.runs,
+        "cold_start": {
+            "import": summarize([run["import"] for run in cold]),
+            "first_ready": summarize([run["first_ready"] for run in cold]),
+            "import_to_ready": summarize([run["import"] + run["first_ready"] for run in cold]),
+            # 지연된 비용: 첫 OpenAI 호출 때 (preload 시 마스터에서) 한 번 지불
+            "deferred_openai_sdk": summarize([run["openai_sdk"] for run in cold]),
+            "deferred_openai_client": summarize([run["openai_client"] for run in cold]),
+        },
+        "preload_fork_to_ready": summarize([run["fork_ready"] for run in forked]),
+        "ready_status": sorted({run["status"] for run in cold + forked}),
+        "top_imports": top_imports(env, args.top) if args.top else [],
+    }
+
+    cold_start = report["cold_start"]
+    print(f"cold start ({args.runs} runs, median / min / max ms)")
+    for name in ("import", "first_ready", "import_to_ready", "deferred_openai_sdk", "deferred_openai_client"):
+        stats = cold_start[name]
+        print(f"  {name:<24} {stats['median_ms']:>8} {stats['min_ms']:>8} {stats['max_ms']:>8}")
+    stats = report["preload_fork_to_ready"]
+    print(f"preload fork -> ready      {stats['median_ms']:>8} {stats['min_ms']:>8} {stats['max_ms']:>8}")
+    print(f"/ready status codes: {report['ready_status']}")
+    if report["top_imports"]:
+        print("slowest direct imports of flask_app (cumulative ms)")
+        for entry in report["top_imports"]:
+            print(f"  {entry['module']:<32} {entry['cumulative_ms']:>8}")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
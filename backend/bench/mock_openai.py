@@ -0,0 +1,260 @@
+"""
+벤치마크용 로컬 OpenAI API 대역 서버
+
+chat.completions(일반/스트리밍/JSON 출력)와 images.generate를 흉내 내며,
+지연 시간 분포와 응답 크기를 지정할 수 있습니다. 실제 API 비용 없이 백엔드 처리량을 측정할 때 사용합니다.
+
+    python bench/mock_openai.py --port 9100 --chat-latency lognormal:1.5,0.5 --image-latency uniform:5,15
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=bench gunicorn flask_app:app
+"""
+import argparse
+import base64
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 카드 내용 생성용 문장 조각
+_TOPICS = ["탄소중립", "인공지능", "반도체", "기후 위기", "디지털 전환", "고령화 사회", "청년 일자리", "재생에너지"]
+_SENTENCES = [
+    "{topic} 관련 정책이 빠르게 바뀌고 있습니다.",
+    "전문가들은 {topic} 문제가 앞으로 10년간 가장 중요한 과제가 될 것이라고 말합니다.",
+    "정부는 올해 {topic} 분야에 예산을 크게 늘렸습니다.",
+    "기업들도 {topic}에 대응하기 위한 전략을 새로 세우고 있습니다.",
+    "시민들의 {topic}에 대한 관심은 그 어느 때보다 높습니다.",
+    "{topic}의 영향은 지역과 세대에 따라 다르게 나타납니다.",
+]
+_PROMPTS = [
+    "A clean infographic style illustration about {topic}, soft pastel colors",
+    "Photorealistic scene showing people discussing {topic} in a modern office",
+    "Minimal flat design icon set representing {topic}, white background",
+]
+
+_CARD_COUNT = re.compile(r'카드수:\s*(\d+)')
+
+
+def parse_latency(spec):
+    """
+    지연 시간 분포 문자열을 샘플러로 변환
+    fixed:0.5 | uniform:0.2,1.0 | normal:1.0,0.2 | lognormal:1.5,0.5 (중앙값, 시그마)
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v] if args else []
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def make_png(target_bytes):
+    """
+    대략 target_bytes 크기의 유효한 PNG 생성 (압축되지 않는 무작위 픽셀)
+    실제 gpt-image-1 응답과 비슷한 ~2MB base64 페이로드를 만들기 위해 사용합니다.
+    """
+    width = 1024
+    height = max(1, target_bytes // (width * 3))
+    rng = random.Random(42)
+    raw = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+def make_cards(count, rng):
+    cards = []
+    for i in range(count):
+        topic = rng.choice(_TOPICS)
+        sentences = [s.format(topic=topic) for s in rng.sample(_SENTENCES, 3)]
+        cards.append({
+            "title": f"{topic}, 지금 알아야 할 {i + 1}가지",
+            "content": " ".join(sentences),
+            "highlight": f"{topic}은 모두의 문제입니다",
+            "prompt": rng.choice(_PROMPTS).format(topic=topic),
+        })
+    return cards
+
+
+def cards_to_text(cards):
+    """텍스트 출력 모드 응답 형식 ('카드 N:' 블록)"""
+    blocks = []
+    for i, card in enumerate(cards, 1):
+        blocks.append(
+            f"카드 {i}:\n제목: {card['title']}\n내용: {card['content']}\n"
+            f"강조: {card['highlight']}\n이미지: {card['prompt']}"
+        )
+    return "\n\n".join(blocks)
+
+
+def chat_content(body, rng):
+    """요청 메시지의 카드 수와 출력 형식에 맞는 응답 본문 생성"""
+    messages = body.get("messages") or []
+    prompt = " ".join(str(m.get("content", "")) for m in messages)
+    if "요약해주세요" in prompt:
+        # 긴 문서의 섹션 요약 요청
+        topic = rng.choice(_TOPICS)
+        return " ".join(s.format(topic=topic) for s in rng.sample(_SENTENCES, 4))
+
+    match = _CARD_COUNT.search(prompt)
+    cards = make_cards(int(match.group(1)) if match else 5, rng)
+    if body.get("response_format"):
+        return json.dumps({"cards": cards}, ensure_ascii=False)
+    return cards_to_text(cards)
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockOpenAI/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            body = {}
+
+        config = self.server.config
+        self.server.count(self.path)
+        if config.error_rate and random.random() < config.error_rate:
+            time.sleep(config.chat_latency() / 4)
+            # 실제 API처럼 재시도까지 기다릴 시간을 알려줌
+            self._send_json(
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                status=429,
+                headers={"retry-after-ms": "200"},
+            )
+            return
+
+        if self.path.endswith("/chat/completions"):
+            self._chat(body)
+        elif self.path.endswith("/images/generations"):
+            time.sleep(config.image_latency())
+            self._send_json({
+                "created": int(time.time()),
+                "data": [{"b64_json": config.image_b64}],
+                "usage": {"input_tokens": 60, "output_tokens": 4160, "total_tokens": 4220},
+            })
+        else:
+            self._send_json({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+
+    def _chat(self, body):
+        config = self.server.config
+        rng = random.Random()
+        content = chat_content(body, rng)
+        latency = config.chat_latency()
+        usage = {
+            "prompt_tokens": sum(len(str(m.get("content", ""))) for m in body.get("messages", [])),
+            "completion_tokens": len(content),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if not body.get("stream"):
+            time.sleep(latency)
+            self._send_json({
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        # 스트리밍 - 지연 시간의 20%를 첫 토큰까지, 나머지를 조각마다 나눠서 전송
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        time.sleep(latency * 0.2)
+        pieces = [content[i:i + 8] for i in range(0, len(content), 8)]
+        delay = latency * 0.8 / max(1, len(pieces))
+        for piece in pieces:
+            chunk = {
+                "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(delay)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            final = {
+                "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "mock"), "choices": [], "usage": usage,
+            }
+            self.wfile.write(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, config):
+        super().__init__(address, MockOpenAIHandler)
+        self.config = config
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def count(self, path):
+        with self._lock:
+            self.counts[path] = self.counts.get(path, 0) + 1
+
+
+class MockConfig:
+    def __init__(self, chat_latency="lognormal:1.5,0.4", image_latency="lognormal:8,0.3",
+                 image_bytes=1536 * 1024, error_rate=0.0):
+        self.chat_latency = parse_latency(chat_latency)
+        self.image_latency = parse_latency(image_latency)
+        self.error_rate = error_rate
+        self.image_b64 = base64.b64encode(make_png(image_bytes)).decode("ascii")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI stand-in for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--chat-latency", default="lognormal:1.5,0.4", help="fixed:S | uniform:A,B | normal:M,SD | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--image-latency", default="lognormal:8,0.3")
+    parser.add_argument("--image-bytes", type=int, default=1536 * 1024, help="raw PNG size (base64 is ~4/3 larger)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    args = parser.parse_args()
+
+    config = MockConfig(args.chat_latency, args.image_latency, args.image_bytes, args.error_rate)
+    server = MockOpenAIServer((args.host, args.port), config)
+    print(f"Mock OpenAI listening on http://{args.host}:{args.port}/v1 (image payload {len(config.image_b64)} bytes)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
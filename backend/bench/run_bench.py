@@ -0,0 +1,339 @@
+"""
+오프라인 벤치마크 - 로컬 OpenAI 대역 서버를 띄우고 백엔드 서버에 부하를 주어
+처리량(req/s), 지연 시간 분위수(p50/p95/p99), 워커 메모리, 응답 크기별 파서 비용을 측정합니다.
+
+backend 디렉토리에서 실행:
+
+    python bench/run_bench.py --server gunicorn --workers 2 --threads 8 --concurrency 16 --requests 200
+    python bench/run_bench.py --server uvicorn --workers 2 --endpoints analyze,image
+    python bench/run_bench.py --parser-only
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from bench.mock_openai import make_cards, cards_to_text  # noqa: E402
+
+ENDPOINTS = ("analyze", "upload", "image")
+
+_PARAGRAPH = (
+    "정부가 발표한 새로운 에너지 정책은 2030년까지 재생에너지 비중을 크게 늘리는 것을 목표로 합니다. "
+    "업계는 전력망 투자와 규제 개선이 함께 이뤄져야 한다고 강조했습니다. "
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start within {timeout}s")
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def process_tree_rss(pid):
+    """프로세스와 모든 하위 프로세스의 RSS 합계 (바이트, Linux /proc 기준)"""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+    return total
+
+
+class MemorySampler(threading.Thread):
+    """부하 중 서버 프로세스 트리의 메모리 사용량을 주기적으로 기록"""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            self.samples.append(process_tree_rss(self.pid))
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def server_command(args, port):
+    if args.server == "gunicorn":
+        return [
+            "gunicorn", "flask_app:app", "--bind", f"127.0.0.1:{port}",
+            "--workers", str(args.workers), "--threads", str(args.threads), "--timeout", "120",
+        ]
+    if args.server == "uvicorn":
+        return ["uvicorn", "asgi_app:app", "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers)]
+    # Flask 개발 서버 (스레드 모드)
+    return [sys.executable, "-m", "flask", "--app", "flask_app", "run", "--port", str(port), "--with-threads", "--no-reload"]
+
+
+def make_text(index, unique):
+    """카드 수 지시문이 포함된 분석 입력 텍스트 (unique이면 요청마다 달라 캐시에 적중하지 않음)"""
+    suffix = f"\n\n요청 번호 {index} {uuid.uuid4().hex}" if unique else ""
+    return f"카드수: 5\n주제: 에너지 전환\n\n{_PARAGRAPH * 8}{suffix}"
+
+
+def multipart_body(text):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="article.txt"\r\n'
+        "Content-Type: text/plain\r\n\r\n"
+    ).encode("utf-8") + text.encode("utf-8") + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def build_request(endpoint, index, unique):
+    if endpoint == "analyze":
+        body = json.dumps({"text": make_text(index, unique)}, ensure_ascii=False).encode("utf-8")
+        return "/api/analyze-text", body, "application/json"
+    if endpoint == "upload":
+        body, content_type = multipart_body(make_text(index, unique))
+        return "/api/upload-file", body, content_type
+    prompt = f"재생에너지 발전소 풍경 {index if unique else 0}"
+    body = json.dumps({"prompt": prompt, "title": "에너지 전환", "style": "사진"}, ensure_ascii=False).encode("utf-8")
+    return "/api/generate-image", body, "application/json"
+
+
+class LoadClient:
+    """스레드마다 연결을 유지하는 HTTP 클라이언트"""
+
+    def __init__(self, port, timeout):
+        self.port = port
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def post(self, path, body, content_type):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=self.timeout)
+        try:
+            conn.request("POST", path, body=body, headers={"Content-Type": content_type})
+            response = conn.getresponse()
+            payload = response.read()
+            return response.status, len(payload)
+        except Exception:
+            conn.close()
+            self._local.conn = None
+            raise
+
+
+def run_load(args, port):
+    client = LoadClient(port, args.timeout)
+    endpoints = [e for e in args.endpoints.split(",") if e]
+    results = {endpoint: {"latencies": [], "statuses": {}, "bytes": 0, "errors": 0} for endpoint in endpoints}
+    lock = threading.Lock()
+
+    def one(index):
+        endpoint = endpoints[index % len(endpoints)]
+        path, body, content_type = build_request(endpoint, index, not args.repeat)
+        start = time.perf_counter()
+        try:
+            status, size = client.post(path, body, content_type)
+        except Exception:
+            status, size = "error", 0
+        elapsed = time.perf_counter() - start
+        with lock:
+            result = results[endpoint]
+            result["latencies"].append(elapsed)
+            result["statuses"][str(status)] = result["statuses"].get(str(status), 0) + 1
+            result["bytes"] += size
+            if status != 200:
+                result["errors"] += 1
+
+    # 워밍업 (연결 풀, 지연 초기화)
+    with ThreadPoolExecutor(max_workers=min(args.concurrency, 4)) as executor:
+        list(executor.map(lambda i: client.post(*build_request(endpoints[i % len(endpoints)], -i - 1, True)), range(min(4, args.concurrency))))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(one, range(args.requests)))
+    wall = time.perf_counter() - started
+
+    report = {"wall_seconds": round(wall, 3), "requests": args.requests, "rps": round(args.requests / wall, 2), "endpoints": {}}
+    for endpoint, result in results.items():
+        latencies = result["latencies"]
+        report["endpoints"][endpoint] = {
+            "count": len(latencies),
+            "rps": round(len(latencies) / wall, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else 0,
+            "errors": result["errors"],
+            "statuses": result["statuses"],
+            "avg_response_bytes": result["bytes"] // max(1, len(latencies)),
+        }
+    return report
+
+
+def bench_parser(iterations):
+    """응답 크기(카드 수)별 카드 파서 비용 측정 (텍스트/JSON 출력 모두)"""
+    from services.card_parser import parse_analysis_response
+
+    rng = random.Random(7)
+    rows = []
+    for count in (1, 5, 10, 20, 50):
+        cards = make_cards(count, rng)
+        for mode, content, structured in (
+            ("text", cards_to_text(cards), False),
+            ("json", json.dumps({"cards": cards}, ensure_ascii=False), True),
+        ):
+            parsed = parse_analysis_response(content, structured)
+            assert len(parsed) == count, f"parser returned {len(parsed)} cards for {count}"
+            start = time.perf_counter()
+            for _ in range(iterations):
+                parse_analysis_response(content, structured)
+            elapsed = (time.perf_counter() - start) / iterations
+            size_kb = len(content.encode("utf-8")) / 1024
+            rows.append({
+                "mode": mode,
+                "cards": count,
+                "response_kb": round(size_kb, 2),
+                "us_per_parse": round(elapsed * 1e6, 1),
+                "us_per_kb": round(elapsed * 1e6 / size_kb, 1),
+            })
+    return rows
+
+
+def print_report(report):
+    load = report.get("load")
+    if load:
+        print(f"\n== Load ({report['server']}, workers={report['workers']}, concurrency={report['concurrency']}) ==")
+        print(f"total: {load['requests']} requests in {load['wall_seconds']}s, {load['rps']} req/s")
+        print(f"{'endpoint':<10}{'count':>7}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for endpoint, row in load["endpoints"].items():
+            print(f"{endpoint:<10}{row['count']:>7}{row['rps']:>9}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['errors']:>8}")
+    memory = report.get("memory")
+    if memory:
+        print("\n== Memory (server process tree) ==")
+        print(f"idle: {memory['idle_mb']} MB, peak: {memory['peak_mb']} MB, after: {memory['after_mb']} MB")
+    parser = report.get("parser")
+    if parser:
+        print("\n== Parser cost ==")
+        print(f"{'mode':<6}{'cards':>6}{'KB':>8}{'us/parse':>11}{'us/KB':>9}")
+        for row in parser:
+            print(f"{row['mode']:<6}{row['cards']:>6}{row['response_kb']:>8}{row['us_per_parse']:>11}{row['us_per_kb']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline backend benchmark against a local OpenAI stand-in")
+    parser.add_argument("--server", choices=("gunicorn", "uvicorn", "flask"), default="gunicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent client connections")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--endpoints", default="analyze,upload,image", help=f"comma separated subset of {','.join(ENDPOINTS)}")
+    parser.add_argument("--repeat", action="store_true", help="send identical inputs (exercises cache/coalescing)")
+    parser.add_argument("--chat-latency", default="lognormal:1.5,0.4")
+    parser.add_argument("--image-latency", default="lognormal:8,0.3")
+    parser.add_argument("--image-bytes", type=int, default=1536 * 1024)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=180)
+    parser.add_argument("--parser-iterations", type=int, default=200)
+    parser.add_argument("--parser-only", action="store_true", help="only measure parser cost, no servers")
+    parser.add_argument("--json", dest="json_path", help="write the full report to this file")
+    args = parser.parse_args()
+
+    report = {"server": args.server, "workers": args.workers, "concurrency": args.concurrency}
+    if not args.parser_only:
+        mock_port, server_port = free_port(), free_port()
+        workdir = tempfile.mkdtemp(prefix="newscard-bench-")
+        env = dict(
+            os.environ,
+            OPENAI_API_KEY="bench",
+            OPENAI_BASE_URL=f"http://127.0.0.1:{mock_port}/v1",
+            BLOB_STORE="local",
+            BLOB_STORE_DIR=os.path.join(workdir, "images"),
+            JOB_QUEUE_DB=os.path.join(workdir, "jobs.db"),
+            RESULT_CACHE_DB=os.path.join(workdir, "cache.db"),
+            PYTHONUNBUFFERED="1",
+        )
+        mock = subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, "bench", "mock_openai.py"), "--port", str(mock_port),
+             "--chat-latency", args.chat_latency, "--image-latency", args.image_latency,
+             "--image-bytes", str(args.image_bytes), "--error-rate", str(args.error_rate)],
+            env=env,
+        )
+        server_log = open(os.path.join(workdir, "server.log"), "w")
+        server = subprocess.Popen(server_command(args, server_port), cwd=BACKEND_DIR, env=env,
+                                  stdout=server_log, stderr=subprocess.STDOUT)
+        try:
+            wait_for_port(mock_port)
+            wait_for_port(server_port)
+            # 임포트/초기화가 끝날 때까지 잠시 대기
+            time.sleep(1.0)
+            idle = process_tree_rss(server.pid)
+            sampler = MemorySampler(server.pid)
+            sampler.start()
+            report["load"] = run_load(args, server_port)
+            sampler.stop()
+            after = process_tree_rss(server.pid)
+            report["memory"] = {
+                "idle_mb": round(idle / 2 ** 20, 1),
+                "peak_mb": round(max(sampler.samples or [0]) / 2 ** 20, 1),
+                "after_mb": round(after / 2 ** 20, 1),
+            }
+        finally:
+            server.terminate()
+            mock.terminate()
+            server.wait(timeout=30)
+            mock.wait(timeout=30)
+            server_log.close()
+        print(f"server log: {os.path.join(workdir, 'server.log')}")
+
+    report["parser"] = bench_parser(args.parser_iterations)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
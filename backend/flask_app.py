@@ -1,29 +1,184 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, Response, request, jsonify, send_file, redirect, abort, stream_with_context, g
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import os
 import json
+import time
+import codecs
 import logging
+import itertools
+import functools
 import re
-from openai import OpenAI
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
 
+# 환경 변수 로드 (서비스 모듈이 import 시점에 읽는 설정보다 먼저)
+load_dotenv()
+
+from services.logging_config import (
+    configure_logging, preview, should_log_payload, summarize_payload, dropped_log_records, LOG_PAYLOAD_MAX_CHARS,
+)
+from services.cache import create_result_cache
+from services.singleflight import create_singleflight
+from services.prompts import (
+    ANALYSIS_MODEL, ANALYSIS_TEMPERATURE, ANALYSIS_OUTPUT_MODE,
+    IMAGE_MODEL, IMAGE_TIERS, IMAGE_TIER_FINAL, resolve_image_tier,
+    SUMMARY_MODEL, SUMMARY_MAX_TOKENS, REGENERATE_MAX_TOKENS,
+    build_analysis_request, build_image_prompt, analysis_response_format,
+    estimate_tokens, find_card_count_directive, build_summary_messages, build_card_regeneration_messages,
+    analysis_cache_key, upload_cache_key, image_cache_key, analysis_directives, analysis_retry_max_tokens,
+)
+from services.card_parser import parse_analysis_response_with_outcome, is_sample_cards, CardStreamParser, PARSE_TEXT, PARSE_SAMPLE
+from services.metrics import (
+    registry, time_stage, record_usage, record_error,
+    HTTP_REQUEST_SECONDS, DECK_TOKENS, DEADLINE_MISSES, IMAGES_GENERATED, IMAGE_SECONDS, PARSE_OUTCOMES, CARDS_GENERATED,
+)
+from services.chunking import (
+    UploadTooLargeError, detect_encoding, hash_stream, iter_decoded_text, iter_sections, map_sections,
+)
+from services.job_queue import create_job_queue, QueueFullError
+from services.deck_store import create_deck_store, DeckNotFoundError, DeckConflictError, EDITABLE_FIELDS
+from services.similarity import create_duplicate_detector
+from services.blob_store import create_blob_store, store_generated_image, is_valid_key, content_type_for_key, LocalBlobStore
+from services.deck_export import iter_deck_zip, iter_deck_pdf, pdf_available
+from services.renditions import create_rendition_service, negotiate_format
+from services.batch import (
+    iter_jsonl_articles, normalize_article, load_completed_ids, JsonlWriter, run_batch, STATUS_OK, STATUS_ERROR,
+)
+from services.deadlines import (
+    Deadline, DeadlineExceededError, DEADLINE_HEADER, REASON_DISCONNECT, parse_timeout, set_deadline, reset_deadline,
+    bind_deadline, request_deadline, with_deadline, current_deadline,
+)
+from services.openai_scheduler import (
+    create_openai_schedulers, openai_lane, bind_lane, estimate_request_tokens, usage_total_tokens, LANE_BATCH,
+)
+
 # 로깅 설정
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# LOG_MODE=production이면 큐 기반 비동기 JSON 로그 사용
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# 환경 변수 로드
-load_dotenv()
-
 # OpenAI API 키 설정
 api_key = os.getenv("OPENAI_API_KEY")
 if not api_key:
     logger.warning("WARNING: OPENAI_API_KEY is not set in .env file")
 
-# OpenAI 클라이언트 생성
-client = OpenAI(api_key=api_key)
+# 프로세스당 OpenAI 연결 풀 크기 (모든 요청 스레드가 keep-alive 연결을 공유)
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+# OpenAI 클라이언트 (워커 프로세스마다 첫 호출 시 생성, SDK import도 이때 수행하여 워커 시작을 빠르게 함)
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        with _openai_client_lock:
+            if _openai_client is None:
+                import httpx
+                from openai import OpenAI, DefaultHttpxClient
+
+                http_client = DefaultHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+                    ),
+                )
+                # 재시도는 스케줄러가 담당하므로 SDK 자체 재시도는 끔
+                _openai_client = OpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+                logger.info("Created OpenAI client (pid %s)", os.getpid())
+    return _openai_client
+
+# fork된 워커는 부모의 연결 풀(소켓)을 공유하지 않도록 클라이언트를 새로 만듦
+def _reset_openai_client():
+    global _openai_client, _openai_client_lock
+    _openai_client = None
+    _openai_client_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_openai_client)
+
+# OpenAI 호출 스케줄러 (RPM/TPM 토큰 버킷, 우선순위 레인, 재시도, 회로 차단기)
+openai_schedulers = create_openai_schedulers()
+chat_scheduler = openai_schedulers["chat"]
+image_scheduler = openai_schedulers["image"]
+
+# 결과 캐시 설정 (RESULT_CACHE_DB를 지정하면 워커 간 공유되는 디스크 캐시 사용)
+result_cache = create_result_cache()
+
+# 동일한 요청 병합 (SINGLEFLIGHT_LOCK을 지정하면 워커 간에도 병합)
+singleflight = create_singleflight()
+
+# 생성된 이미지 저장소 (BLOB_STORE=local|s3)
+blob_store = create_blob_store()
+
+# 썸네일/미리보기/WebP·AVIF 렌디션 생성기 (RENDITION_WORKERS)
+renditions = create_rendition_service(blob_store)
 
-app = Flask(__name__)
-CORS(app)  # CORS 설정
+# 생성된 덱 저장소 (카드 단위 수정/재생성용, DECK_STORE_URL 또는 DECK_STORE_DB)
+deck_store = create_deck_store(blob_store)
+
+# 비슷한 기사 검출 (이전에 만든 덱 재사용, DUPLICATE_THRESHOLD=0이면 끔)
+duplicates = create_duplicate_detector(deck_store)
+
+# JSON 직렬화 시간을 지표로 기록하는 JSON 처리기
+class TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with time_stage("serialize"):
+            return super().dumps(obj, **kwargs)
+
+# API 라우트 (build_app에서 애플리케이션에 등록)
+api = Blueprint("api", __name__)
+
+# 이미지 일괄 생성 설정
+# 프로세스 전체에서 공유하는 이미지 생성 스레드 수
+IMAGE_BATCH_MAX_WORKERS = int(os.getenv("IMAGE_BATCH_MAX_WORKERS", "8"))
+# 덱(요청) 하나가 동시에 사용할 수 있는 최대 이미지 생성 수
+IMAGE_BATCH_DECK_CONCURRENCY = int(os.getenv("IMAGE_BATCH_DECK_CONCURRENCY", "4"))
+# 한 번에 요청할 수 있는 최대 카드 수
+IMAGE_BATCH_MAX_CARDS = int(os.getenv("IMAGE_BATCH_MAX_CARDS", "10"))
+
+# 이미지 생성은 대부분 OpenAI 응답 대기 시간이므로 스레드 풀로 충분합니다
+image_executor = ThreadPoolExecutor(max_workers=IMAGE_BATCH_MAX_WORKERS, thread_name_prefix="image-batch")
+
+# 긴 문서 처리 설정
+# 업로드 파일 최대 크기
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+# 이 토큰 수를 넘는 입력은 섹션별로 요약한 뒤 카드를 구성
+LONG_TEXT_TOKEN_LIMIT = int(os.getenv("LONG_TEXT_TOKEN_LIMIT", "8000"))
+# 요약 단위 섹션 크기
+CHUNK_SECTION_TOKENS = int(os.getenv("CHUNK_SECTION_TOKENS", "4000"))
+# 동시에 요약할 섹션 수
+CHUNK_SUMMARY_WORKERS = int(os.getenv("CHUNK_SUMMARY_WORKERS", "4"))
+
+summary_executor = ThreadPoolExecutor(max_workers=CHUNK_SUMMARY_WORKERS, thread_name_prefix="section-summary")
+
+# 여러 기사 일괄 분석 설정
+# 프로세스 전체에서 공유하는 일괄 분석 스레드 수
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "8"))
+# 일괄 요청 하나가 동시에 분석할 수 있는 최대 기사 수
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+# JSON 본문으로 보낼 수 있는 최대 기사 수 (더 많으면 JSONL 파일로 업로드)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "200"))
+# 일괄 분석 결과(JSONL) 저장 위치 (같은 batchId로 다시 요청하면 이어서 처리)
+# 처리 중인 기사만 있을 때 보내는 heartbeat 줄 간격 (초) - 끊긴 연결을 빨리 알아채고 남은 기사를 취소
+BATCH_HEARTBEAT_SECONDS = float(os.getenv("BATCH_HEARTBEAT_SECONDS", "15"))
+BATCH_OUTPUT_DIR = os.getenv("BATCH_OUTPUT_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "batches"
+)
+
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix="analyze-batch")
+
+# 요청 처리 기한 (초) - 클라이언트가 X-Request-Timeout 헤더로 보낸 값을 이 값으로 제한하고,
+# 헤더가 없으면 이 값을 사용하여 gunicorn 타임아웃(120초)에 워커가 강제 종료되기 전에 OpenAI 호출을 끝냄 (0이면 끔)
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "110"))
+# 헤더가 없으면 기한을 두지 않는 엔드포인트 (오래 걸리는 일괄 처리, 연결이 끊기면 취소)
+UNBOUNDED_ENDPOINTS = {"api.api_analyze_batch"}
 
 # 카드 클래스 정의
 class Card:
@@ -58,262 +213,860 @@ def analyze_text(text):
             logger.error("Empty text provided for analysis")
             return get_sample_cards()
             
-        logger.info(f"Starting text analysis with OpenAI API, text length: {len(text)}")
+        logger.info("Starting text analysis with OpenAI API, text length: %s", len(text))
         
         # OpenAI API 키 확인
         if not api_key:
             logger.error("OpenAI API key is not set")
             return get_sample_cards("API 키가 설정되지 않았습니다")
         
-        # 카드 수 추출 (기본값: 5)
-        card_count = 5
-        try:
-            card_count_match = re.search(r'카드수:\s*(\d+)', text)
-            if card_count_match:
-                extracted_count = int(card_count_match.group(1))
-                # 1-10 사이의 유효한 값으로 제한
-                card_count = max(1, min(10, extracted_count))
-                logger.info(f"Extracted card count: {card_count}")
-        except Exception as count_error:
-            logger.warning(f"Failed to extract card count, using default: {str(count_error)}")
-        
-        messages = [
-            {"role": "system", "content": """당신은 고품질 카드뉴스를 생성하는 AI입니다. 
-            주어진 텍스트를 분석하여 카드뉴스 구성을 제안하세요.
-            각 카드는 다음 형식으로 작성해주세요:
-            
-            카드 1:
-            제목: [카드 제목]
-            내용: [카드 내용]
-            강조: [강조 문구]
-            이미지: [이미지 프롬프트]
-            
-            카드 2:
-            제목: [카드 제목]
-            내용: [카드 내용]
-            강조: [강조 문구]
-            이미지: [이미지 프롬프트]
-            
-            이런 식으로 각 카드를 명확히 구분해서 작성해주세요."""},
-            {"role": "user", "content": f"""다음 텍스트를 바탕으로 SNS용 카드뉴스를 만들어주세요.
-            - 각 페이지마다 주제와 설명을 포함하고,
-            - 총 {card_count}장으로 구성되게 하며, 강조 문구는 따로 구분해주세요.
-            - 주제와 설명을 강조하기 위한 이미지 제안을 해주세요.
-            
-            텍스트: {text}"""}
-        ]
+        structured = ANALYSIS_OUTPUT_MODE == "json"
+        params = build_analysis_request(text, structured)
         
         logger.info("Calling OpenAI API...")
         
         try:
-            response = client.chat.completions.create(
-                model="gpt-4.1",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=1500,
-            )
+            retry_tokens = analysis_retry_max_tokens(params["max_tokens"])
+            while True:
+                with time_stage("openai_chat"):
+                    response = chat_scheduler.call(
+                        lambda: with_deadline(get_openai_client()).chat.completions.create(**params),
+                        tokens=estimate_request_tokens(params["messages"], params["max_tokens"]),
+                        usage=usage_total_tokens,
+                    )
+                DECK_TOKENS.observe(record_usage("analyze", ANALYSIS_MODEL, response.usage), operation="analyze")
+                if response.choices[0].finish_reason != "length":
+                    break
+                # 응답이 잘리면 마지막 카드가 빠지거나 JSON이 깨지므로 더 큰 예산으로 한 번만 다시 요청
+                if retry_tokens is None:
+                    logger.warning("Analysis response hit max_tokens=%s and may be missing cards", params["max_tokens"])
+                    break
+                logger.warning(
+                    "Analysis response hit max_tokens=%s, retrying with max_tokens=%s", params["max_tokens"], retry_tokens
+                )
+                params = {**params, "max_tokens": retry_tokens}
+                retry_tokens = None
             
             content = response.choices[0].message.content
-            logger.info(f"OpenAI API response received, content length: {len(content)}")
-            logger.info(f"OpenAI API raw response: {content}")
+            logger.info("OpenAI API response received, content length: %s", len(content))
+            if should_log_payload(logger):
+                logger.debug("OpenAI API raw response: %s", preview(content, LOG_PAYLOAD_MAX_CHARS))
             
             # 응답 파싱
-            cards = []
-            
-            # 새로운 파싱 로직
-            # '카드 1:', '카드 2:' 등의 패턴으로 분할
-            card_pattern = r'카드\s*\d+\s*:'
-            card_blocks = re.split(card_pattern, content)
-            
-            # 첫 번째 블록은 카드가 아닐 수 있으므로 건너뛰기
-            card_blocks = [block for block in card_blocks if block.strip()]
-            
-            logger.info(f"Found {len(card_blocks)} card blocks")
-            
-            for i, block in enumerate(card_blocks):
-                logger.info(f"Processing card block {i+1}: {block[:100]}...")
-                lines = block.strip().split('\n')
-                
-                title = ""
-                card_content = []
-                highlight = ""
-                prompt = ""
-                
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    if line.startswith("제목:"):
-                        title = line.replace("제목:", "").strip()
-                    elif line.startswith("강조:"):
-                        highlight = line.replace("강조:", "").strip()
-                    elif line.startswith("이미지:"):
-                        prompt = line.replace("이미지:", "").strip()
-                    elif line.startswith("내용:"):
-                        card_content.append(line.replace("내용:", "").strip())
-                    elif not (line.startswith("카드") or line.startswith("제목") or line.startswith("강조") or line.startswith("이미지")):
-                        card_content.append(line)
-                
-                content_text = "\n".join(card_content).strip()
-                
-                if title:  # 제목이 있는 경우에만 카드 추가
-                    logger.info(f"Adding card: {title}")
-                    cards.append(Card(title, content_text, highlight, "", prompt).to_dict())
-            
-            # 백업 파싱 로직 - 기존 카드가 없는 경우
-            if not cards:
-                logger.warning("Primary parsing failed, trying backup parsing method")
-                sections = content.split("카드 ")
-                
-                for i, section in enumerate(sections[1:]):
-                    logger.debug(f"Backup parsing - section {i+1}: {section[:100]}...")
-                    lines = section.strip().split("\n")
-                    if len(lines) >= 2:
-                        title_line = lines[0].strip()
-                        title = title_line.replace(":", "").strip()
-                        content_lines = [l for l in lines[1:] if not (l.startswith("강조:") or l.startswith("이미지:"))]
-                        content_text = "\n".join(content_lines).strip()
-                        
-                        # 강조 문구 추출
-                        highlight = next((l.replace("강조:", "").strip() for l in lines if l.startswith("강조:")), "")
-                        
-                        # 이미지 프롬프트 추출
-                        prompt = next((l.replace("이미지:", "").strip() for l in lines if l.startswith("이미지:")), "")
-                        
-                        if title:  # 제목이 있는 경우에만 카드 추가
-                            logger.info(f"Adding card from backup method: {title}")
-                            cards.append(Card(title, content_text, highlight, "", prompt).to_dict())
-            
-            # 마지막 백업 - 응답 전체 분석
-            if not cards:
-                logger.warning("Both parsing methods failed, attempting content extraction")
-                
-                # 최소한 제목이라도 추출
-                title_matches = re.findall(r'제목:([^\n]+)', content)
-                
-                if title_matches:
-                    for i, title in enumerate(title_matches):
-                        title = title.strip()
-                        logger.info(f"Extracted title: {title}")
-                        cards.append(Card(
-                            title, 
-                            f"카드 내용 {i+1}", 
-                            f"강조 {i+1}", 
-                            "", 
-                            f"이미지 프롬프트 {i+1}"
-                        ).to_dict())
+            with time_stage("parse"):
+                cards, outcome = parse_analysis_response_with_outcome(content, structured)
             
             # 카드가 없으면 샘플 카드 제공
             if not cards:
-                logger.warning("All parsing methods failed, using sample cards")
+                logger.warning("Failed to parse cards from response, using sample cards")
+                PARSE_OUTCOMES.inc(outcome=PARSE_SAMPLE)
                 return get_sample_cards()
                 
-            logger.info(f"Successfully generated {len(cards)} cards")
+            logger.info("Successfully generated %s cards", len(cards))
+            PARSE_OUTCOMES.inc(outcome=outcome)
+            CARDS_GENERATED.inc(len(cards), outcome=outcome)
             return cards
             
+        except DeadlineExceededError:
+            # 기다리는 클라이언트가 없으므로 샘플 카드 대신 그대로 전달 (캐시에도 저장되지 않음)
+            raise
         except Exception as api_error:
-            logger.error(f"OpenAI API call failed: {str(api_error)}")
+            logger.error("OpenAI API call failed: %s", api_error)
+            record_error("analyze", api_error)
+            PARSE_OUTCOMES.inc(outcome=PARSE_SAMPLE)
             # API 호출 실패 시 샘플 카드 반환
             return get_sample_cards(f"API 오류: {str(api_error)}")
             
+    except DeadlineExceededError:
+        raise
     except Exception as e:
-        logger.error(f"Error in analyze_text: {str(e)}")
+        logger.error("Error in analyze_text: %s", e)
         # 오류 발생 시 샘플 카드 반환
         return get_sample_cards(f"처리 오류: {str(e)}")
 
-# 이미지 생성 함수
-def generate_image(prompt, title="", content="", highlight="", style="", background_color=""):
+# 섹션 요약 함수
+def summarize_section(section, index):
+    logger.info("Summarizing section %s, estimated tokens: %s", index + 1, estimate_tokens(section))
+    messages = build_summary_messages(section, index)
+    try:
+        with time_stage("openai_summary"):
+            response = chat_scheduler.call(
+                lambda: with_deadline(get_openai_client()).chat.completions.create(
+                    model=SUMMARY_MODEL,
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=SUMMARY_MAX_TOKENS,
+                ),
+                tokens=estimate_request_tokens(messages, SUMMARY_MAX_TOKENS),
+                usage=usage_total_tokens,
+            )
+    except Exception as e:
+        record_error("summary", e)
+        raise
+    DECK_TOKENS.observe(record_usage("summary", SUMMARY_MODEL, response.usage), operation="summary")
+    return response.choices[0].message.content.strip()
+
+# 긴 문서 분석 함수 - 섹션을 병렬로 요약한 뒤 요약본으로 카드 구성
+def analyze_sections(sections, depth=0):
+    try:
+        directive = None
+        head = []
+        head_tokens = 0
+
+        # 제한 이내의 분량이면 요약 없이 바로 분석
+        for section in sections:
+            directive = directive or find_card_count_directive(section)
+            head.append(section)
+            head_tokens += estimate_tokens(section)
+            if head_tokens > LONG_TEXT_TOKEN_LIMIT:
+                break
+        else:
+            return analyze_text("\n\n".join(head))
+
+        def tracked_sections():
+            nonlocal directive
+            for section in itertools.chain(head, sections):
+                directive = directive or find_card_count_directive(section)
+                yield section
+
+        summaries = map_sections(
+            tracked_sections(), bind_deadline(bind_lane(summarize_section)), summary_executor, CHUNK_SUMMARY_WORKERS * 2,
+        )
+        logger.info("Summarized %s sections (depth %s)", len(summaries), depth)
+
+        composed = "\n\n".join(summaries)
+        if directive:
+            # 카드 수 지시문은 요약 과정에서 사라질 수 있으므로 다시 붙임
+            composed = f"{directive}\n\n{composed}"
+
+        # 요약본도 제한을 넘으면 한 단계 더 요약
+        if estimate_tokens(composed) > LONG_TEXT_TOKEN_LIMIT and depth < 2:
+            return analyze_sections(iter_sections([composed], CHUNK_SECTION_TOKENS), depth + 1)
+        return analyze_text(composed)
+    except DeadlineExceededError:
+        raise
+    except Exception as e:
+        logger.error("Error in analyze_sections: %s", e)
+        return get_sample_cards(f"처리 오류: {str(e)}")
+
+# 입력 길이에 따라 단일 분석 또는 섹션 요약 파이프라인 선택
+def analyze_document(text):
+    if estimate_tokens(text or "") <= LONG_TEXT_TOKEN_LIMIT:
+        return analyze_text(text)
+    logger.info("Long text detected (%s chars), using chunked analysis", len(text))
+    return analyze_sections(iter_sections([text], CHUNK_SECTION_TOKENS))
+
+# 스트리밍 텍스트 분석 함수 - 카드가 완성될 때마다 하나씩 반환
+def stream_analyze_text(text):
+    if not text or len(text.strip()) == 0:
+        raise ValueError("Empty text provided for analysis")
+    if not api_key:
+        raise RuntimeError("API 키가 설정되지 않았습니다")
+
+    params = build_analysis_request(text)
+
+    logger.info("Starting streaming text analysis, text length: %s", len(text))
+
+    # 스트림 연결까지만 재시도 (카드를 보내기 시작한 뒤에는 재시도하지 않음)
+    stream = chat_scheduler.call(
+        lambda: with_deadline(get_openai_client()).chat.completions.create(
+            **params,
+            stream=True,
+            # 마지막 조각에 토큰 사용량 포함
+            stream_options={"include_usage": True},
+        ),
+        tokens=estimate_request_tokens(params["messages"], params["max_tokens"]),
+    )
+    parser = CardStreamParser()
+    deadline = current_deadline()
+    try:
+        for chunk in stream:
+            # 읽기 타임아웃은 조각 사이 간격에만 적용되므로 전체 기한은 직접 확인
+            if deadline is not None:
+                deadline.check("stream")
+            if getattr(chunk, "usage", None):
+                DECK_TOKENS.observe(record_usage("analyze_stream", ANALYSIS_MODEL, chunk.usage), operation="analyze_stream")
+            if not chunk.choices:
+                continue
+            for card in parser.feed(chunk.choices[0].delta.content or ""):
+                yield card
+        for card in parser.close():
+            yield card
+    finally:
+        # 클라이언트 연결이 끊겨 제너레이터가 닫히면 OpenAI 스트림도 함께 종료
+        stream.close()
+
+    logger.info("Streaming analysis finished, %s cards, content length: %s", parser.emitted, len(parser.text))
+
+# 이미지 생성 함수 (tier: draft는 빠른 시안용 저품질, final은 최종본)
+def generate_image(prompt, title="", content="", highlight="", style="", background_color="", tier=IMAGE_TIER_FINAL):
     try:
         if not prompt or len(prompt.strip()) == 0:
             logger.error("Empty prompt provided for image generation")
             return ""
-            
-        # 추가 스타일 정보는 사용자가 명시적으로 지정한 경우에만 포함
-        additional_styles = ""
-        if style or background_color:
-            style_parts = []
-            if style:
-                style_parts.append(f"스타일: {style}")
-            if background_color:
-                style_parts.append(f"배경색: {background_color}")
-                
-            if style_parts:
-                additional_styles = "\n\n" + "\n".join(style_parts)
-        
-        # 카드 정보를 조합하여 풍부한 프롬프트 구성 (스타일 옵션 제외)
-        enhanced_prompt = f"""당신은 카드뉴스 생성 전문가 입니다. 아래 조건에 맞는 바로 매체에 등록가능한 수준의 카드뉴스 이미지를 생성해주세요.
-
-[이미지 프롬프트]
-{prompt}
 
-[이미지 안에 다음 문구를 포함]
-메인문구: {title}
-강조: {highlight}
-내용: {content}{additional_styles}"""
+        enhanced_prompt = build_image_prompt(prompt, title, content, highlight, style, background_color)
 
-        logger.info(f"Starting image generation with OpenAI API, prompt length: {len(enhanced_prompt)}")
-        logger.debug(f"Enhanced prompt: {enhanced_prompt}")
+        logger.info("Starting image generation with OpenAI API, prompt length: %s", len(enhanced_prompt))
+        if should_log_payload(logger):
+            logger.debug("Enhanced prompt: %s", preview(enhanced_prompt, LOG_PAYLOAD_MAX_CHARS))
         
         # OpenAI API 키 확인
         if not api_key:
             logger.error("OpenAI API key is not set")
             return ""
             
-        response = client.images.generate(
-            model="gpt-image-1",  # 최신 이미지 생성 모델
-            prompt=enhanced_prompt,
-            size="1024x1024",
-            quality="high",
-            n=1,
-        )
+        params = IMAGE_TIERS[tier]
+        with time_stage("openai_image"), IMAGE_SECONDS.time(tier=tier, quality=params["quality"]):
+            response = image_scheduler.call(
+                lambda: with_deadline(get_openai_client()).images.generate(
+                    model=IMAGE_MODEL,  # 최신 이미지 생성 모델
+                    prompt=enhanced_prompt,
+                    size=params["size"],
+                    quality=params["quality"],
+                    n=1,
+                )
+            )
         
-        logger.info("Image generated successfully")
+        logger.info("Image generated successfully (tier: %s)", tier)
+        IMAGES_GENERATED.inc(len(response.data), model=IMAGE_MODEL, quality=params["quality"], tier=tier)
+        record_usage("image", IMAGE_MODEL, getattr(response, "usage", None))
         
         # gpt-image-1 모델은 항상 base64 형식으로 이미지를 반환합니다
-        if hasattr(response.data[0], 'b64_json'):
-            # base64 이미지 데이터 형식: "data:image/png;base64,{base64_encoded_data}"
-            return f"data:image/png;base64,{response.data[0].b64_json}"
-        elif hasattr(response.data[0], 'url'):
-            # 이전 모델 호환성을 위해 url이 있는 경우 url 반환
-            return response.data[0].url
-        else:
+        # base64를 한 번만 디코딩하여 블롭 저장소에 저장하고 짧은 URL을 반환
+        with time_stage("image_store"):
+            image_url = store_generated_image(blob_store, response.data[0])
+        if not image_url:
             logger.error("No image data found in API response")
-            return ""
+        # 화면에서 주로 쓰는 썸네일/미리보기 렌디션은 백그라운드에서 미리 생성
+        renditions.prewarm(blob_store.key_for_url(image_url))
+        return image_url
         
+    except DeadlineExceededError:
+        raise
     except Exception as e:
-        logger.error(f"Image generation error: {str(e)}")
+        logger.error("Image generation error: %s", e)
+        record_error("image", e)
         return ""
 
-# 루트 엔드포인트
-@app.route('/')
+# 캐시를 거치는 텍스트 분석 함수 (결과, 캐시 적중 여부 반환)
+def cached_analyze_text(text, bypass_cache=False):
+    return coalesced_get_or_compute(
+        analysis_cache_key(text),
+        lambda: analyze_document(text),
+        bypass_cache,
+        should_store=lambda cards: not is_sample_cards(cards),
+    )
+
+# 캐시를 거치는 이미지 생성 함수 (결과, 캐시 적중 여부 반환)
+def cached_generate_image(prompt, title="", content="", highlight="", style="", background_color="", bypass_cache=False,
+                          tier=IMAGE_TIER_FINAL):
+    return coalesced_get_or_compute(
+        image_cache_key(prompt, title, content, highlight, style, background_color, tier),
+        lambda: generate_image(prompt, title, content, highlight, style, background_color, tier),
+        bypass_cache,
+    )
+
+# 캐시 조회 후 같은 키의 요청이 이미 진행 중이면 그 결과를 함께 사용 (결과, 캐시 적중 여부 반환)
+def coalesced_get_or_compute(key, compute, bypass_cache=False, should_store=bool):
+    def lookup():
+        hit, value = result_cache.get(key)
+        return hit, (value, True)
+
+    return singleflight.do(
+        key,
+        lambda: result_cache.get_or_compute(key, compute, bypass=bypass_cache, should_store=should_store),
+        lookup=lookup,
+    )
+
+# 저장소가 발급한 상대 경로를 클라이언트가 바로 쓸 수 있는 절대 URL로 변환
+def absolute_image_url(image_url):
+    if image_url and image_url.startswith('/'):
+        return request.host_url.rstrip('/') + image_url
+    return image_url
+
+# 작업 결과의 이미지 경로를 절대 URL로 변환하여 응답용 작업 정보 구성
+def job_response(job):
+    result = job.get("result") or {}
+    if result.get("image_url"):
+        result["image_url"] = absolute_image_url(result["image_url"])
+    for item in result.get("results", []):
+        item["image_url"] = absolute_image_url(item["image_url"])
+    return job
+
+# 작업 등록 응답 (202 Accepted)
+def job_accepted(kind, payload):
+    try:
+        job_id = job_queue.enqueue(kind, payload)
+    except QueueFullError as e:
+        logger.warning("Rejected %s job: %s", kind, e)
+        return jsonify({"error": str(e)}), 503
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": request.host_url.rstrip('/') + f"/api/jobs/{job_id}",
+    }), 202
+
+# 오류 응답 상태 코드 (요청 기한이 지나 중단된 경우 504, 그 외 500)
+def error_status(error=None):
+    if isinstance(error, DeadlineExceededError):
+        return 504
+    deadline = current_deadline()
+    return 504 if deadline is not None and deadline.expired else 500
+
+# 요청 단위 캐시 우회 여부 (noCache 필드 또는 Cache-Control: no-cache 헤더)
+def wants_cache_bypass(data=None):
+    if data and str(data.get('noCache', '')).lower() in ('1', 'true'):
+        return True
+    return 'no-cache' in request.headers.get('Cache-Control', '').lower()
+
+# 요청의 이미지 품질 등급 (tier 필드, 잘못된 값이면 ValueError)
+def requested_image_tier(data=None):
+    return resolve_image_tier((data or {}).get('tier'))
+
+# 요청의 덱 revision (revision 필드, 없으면 None, 정수가 아니면 ValueError)
+def requested_revision(data=None):
+    revision = (data or {}).get('revision')
+    if revision is None:
+        return None
+    if isinstance(revision, bool) or not isinstance(revision, (int, str)):
+        raise ValueError("revision must be an integer")
+    try:
+        return int(revision)
+    except ValueError:
+        raise ValueError("revision must be an integer") from None
+
+# 일괄 작업의 OpenAI 호출은 대화형 요청보다 뒤에 예약 (작업 큐 핸들러용)
+def in_batch_lane(fn, *args):
+    with openai_lane(LANE_BATCH):
+        return fn(*args)
+
+# 여러 카드 이미지 일괄 생성 함수
+def generate_images(cards, style="", background_color="", concurrency=IMAGE_BATCH_DECK_CONCURRENCY, bypass_cache=False,
+                    tier=IMAGE_TIER_FINAL):
+    """카드 목록의 이미지를 공유 스레드 풀에서 동시에 생성합니다.
+
+    덱 하나가 풀을 독점하지 않도록 동시에 실행되는 작업 수를 concurrency로 제한하고,
+    카드별 성공/실패 결과를 입력 순서대로 반환합니다. 각 호출은 호출한 쪽의 레인으로 예약되므로
+    대화형 요청은 대화형 레인, 작업 큐/일괄 처리는 일괄 레인에서 실행됩니다.
+    """
+    results = [None] * len(cards)
+    pending = {}
+    queue = iter(enumerate(cards))
+
+    def submit_next():
+        for index, card in queue:
+            prompt = (card or {}).get('prompt', '')
+            if not prompt or not prompt.strip():
+                results[index] = {"index": index, "image_url": "", "cached": False, "error": "No prompt provided"}
+                continue
+            future = image_executor.submit(
+                bind_deadline(bind_lane(cached_generate_image)),
+                prompt,
+                card.get('title', ''),
+                card.get('content', ''),
+                card.get('highlight', ''),
+                card.get('style', style),
+                card.get('backgroundColor', background_color),
+                bypass_cache,
+                tier,
+            )
+            pending[future] = index
+            return True
+        return False
+
+    for _ in range(max(1, concurrency)):
+        if not submit_next():
+            break
+
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = pending.pop(future)
+            try:
+                image_url, cached = future.result()
+                error = None if image_url else "이미지 생성에 실패했습니다."
+            except Exception as e:
+                image_url, cached, error = "", False, str(e)
+            results[index] = {"index": index, "image_url": image_url, "cached": cached, "tier": tier, "error": error}
+            submit_next()
+
+    return results
+
+# 카드 한 장 재생성 함수 - 나머지 카드를 문맥으로 해당 카드만 다시 작성
+def regenerate_card(source_text, cards, index, instruction=""):
+    structured = ANALYSIS_OUTPUT_MODE == "json"
+    messages = build_card_regeneration_messages(source_text, cards, index, instruction, structured)
+    extra_params = {"response_format": analysis_response_format()} if structured else {}
+    try:
+        with time_stage("openai_chat"):
+            response = chat_scheduler.call(
+                lambda: with_deadline(get_openai_client()).chat.completions.create(
+                    model=ANALYSIS_MODEL,
+                    messages=messages,
+                    temperature=ANALYSIS_TEMPERATURE,
+                    max_tokens=REGENERATE_MAX_TOKENS,
+                    **extra_params,
+                ),
+                tokens=estimate_request_tokens(messages, REGENERATE_MAX_TOKENS),
+                usage=usage_total_tokens,
+            )
+    except Exception as e:
+        record_error("regenerate", e)
+        raise
+    DECK_TOKENS.observe(record_usage("regenerate", ANALYSIS_MODEL, response.usage), operation="regenerate")
+
+    with time_stage("parse"):
+        parsed, outcome = parse_analysis_response_with_outcome(response.choices[0].message.content, structured)
+    PARSE_OUTCOMES.inc(outcome=outcome if parsed else PARSE_SAMPLE)
+    if not parsed:
+        raise RuntimeError("카드를 다시 생성하지 못했습니다.")
+    return parsed[0]
+
+# 일괄 분석의 기사 한 건 처리 (카드 생성 실패 시 예외를 발생시켜 재실행 대상으로 남김)
+def analyze_batch_article(article, bypass_cache=False):
+    if not bypass_cache:
+        duplicate = find_duplicate_deck(article["text"])
+        if duplicate:
+            deck, similarity = duplicate
+            return {
+                "cards": deck["cards"], "cached": True, "deck_id": deck["deck_id"],
+                "duplicate_of": {"deck_id": deck["deck_id"], "similarity": round(similarity, 3)},
+            }
+    with openai_lane(LANE_BATCH):
+        cards, cached = cached_analyze_text(article["text"], bypass_cache)
+    if is_sample_cards(cards):
+        raise RuntimeError("카드뉴스를 생성하지 못했습니다.")
+    return {"cards": cards, "cached": cached, "deck_id": save_deck(article["text"], cards)}
+
+# 분석 결과를 덱으로 저장하고 덱 ID 반환 (샘플 카드는 저장하지 않음)
+def save_deck(source_text, cards):
+    if is_sample_cards(cards):
+        return None
+    try:
+        fingerprint = duplicates.fingerprint(source_text)
+        deck_id = deck_store.create(source_text, cards, fingerprint=fingerprint)
+    except Exception as e:
+        logger.error("Failed to save deck: %s", e)
+        return None
+    duplicates.add(deck_id, fingerprint)
+    return deck_id
+
+# 요청이 비슷한 기사로 만든 이전 덱을 재사용해도 되는지 (force 또는 캐시 우회 요청이면 새로 생성)
+def allows_duplicate_reuse(data=None):
+    if data and str(data.get('force', '')).lower() in ('1', 'true'):
+        return False
+    return not wants_cache_bypass(data)
+
+# 비슷한 기사로 이전에 만든 덱과 유사도 (없으면 None, 검출 오류는 새로 생성하도록 None)
+# 카드 수 등 요청 지시문이 같은 덱만 재사용
+def find_duplicate_deck(text):
+    try:
+        directives = analysis_directives(text)
+        for deck_id, similarity in duplicates.find_all(text):
+            deck = deck_store.get(deck_id, include_source=True)
+            if deck is None:
+                continue
+            if analysis_directives(deck.pop("source_text")) != directives:
+                logger.info("Skipping near-duplicate deck %s: request directives differ", deck_id)
+                continue
+            logger.info("Reusing deck %s for a near-duplicate article (similarity %.3f)", deck_id, similarity)
+            return deck, similarity
+    except Exception as e:
+        logger.error("Duplicate article lookup failed: %s", e)
+    return None
+
+# 재사용한 덱의 분석 응답 (duplicate_of로 원래 덱과 유사도를 알려 force로 새로 생성할 수 있게 함)
+def duplicate_response(deck, similarity):
+    return {
+        "cards": deck_response(deck)["cards"],
+        "cached": True,
+        "deck_id": deck["deck_id"],
+        "duplicate_of": {"deck_id": deck["deck_id"], "similarity": round(similarity, 3)},
+    }
+
+# 덱 응답 (이미지 경로를 절대 URL로 변환)
+def deck_response(deck):
+    for card in deck["cards"]:
+        card["image"] = absolute_image_url(card["image"])
+    return deck
+
+# 덱에서 이미지가 없거나 내용이 바뀐 카드(또는 지정한 카드)의 이미지만 생성하여 저장
+def refresh_deck_images(deck_id, indexes=None, concurrency=IMAGE_BATCH_DECK_CONCURRENCY, bypass_cache=False,
+                        tier=IMAGE_TIER_FINAL):
+    deck = deck_store.get(deck_id)
+    if deck is None:
+        raise DeckNotFoundError(f"Deck {deck_id} not found")
+
+    if indexes is None:
+        targets = [card for card in deck["cards"] if card["image_stale"]]
+    else:
+        targets = [card for card in deck["cards"] if card["index"] in indexes]
+    logger.info("Refreshing %s of %s card images for deck %s", len(targets), len(deck["cards"]), deck_id)
+
+    results = generate_images(targets, deck["style"], deck["backgroundColor"], concurrency, bypass_cache, tier)
+    for card, result in zip(targets, results):
+        result["index"] = card["index"]
+        # 이미지 생성 중 카드가 수정되었으면 저장하지 않음 (다음 갱신 때 다시 생성)
+        result["saved"] = bool(result["image_url"]) and deck_store.set_card_image(
+            deck_id, card["index"], result["image_url"], card["version"], tier
+        )
+    return results
+
+# 덱 카드에 생성한 이미지 연결 (deckId/cardIndex가 지정된 이미지 생성 요청, 실패해도 이미지 응답은 그대로 반환)
+def attach_deck_image(deck_id, card_index, image_url, tier=IMAGE_TIER_FINAL):
+    if not deck_id or card_index is None:
+        return False
+    try:
+        deck_store.attach_image(deck_id, int(card_index), image_url, tier)
+        return True
+    except (DeckNotFoundError, TypeError, ValueError) as e:
+        logger.warning("Could not attach image to deck %s card %s: %s", deck_id, card_index, e)
+        return False
+
+# 백그라운드 이미지 생성 작업
+def run_image_job(payload):
+    image_url, cached = cached_generate_image(
+        payload['prompt'],
+        payload.get('title', ''),
+        payload.get('content', ''),
+        payload.get('highlight', ''),
+        payload.get('style', ''),
+        payload.get('backgroundColor', ''),
+        bypass_cache=payload.get('noCache', False),
+        tier=payload.get('tier', IMAGE_TIER_FINAL),
+    )
+    if not image_url:
+        raise RuntimeError("이미지 생성에 실패했습니다.")
+    attach_deck_image(payload.get('deckId'), payload.get('cardIndex'), image_url, payload.get('tier', IMAGE_TIER_FINAL))
+    return {"image_url": image_url, "cached": cached, "tier": payload.get('tier', IMAGE_TIER_FINAL)}
+
+# 백그라운드 덱 이미지 일괄 생성 작업 (카드별 결과 포함)
+def run_deck_images_job(payload):
+    results = generate_images(
+        payload['cards'],
+        payload.get('style', ''),
+        payload.get('backgroundColor', ''),
+        payload.get('concurrency', IMAGE_BATCH_DECK_CONCURRENCY),
+        payload.get('noCache', False),
+        payload.get('tier', IMAGE_TIER_FINAL),
+    )
+    succeeded = sum(1 for r in results if r["image_url"])
+    if not succeeded:
+        raise RuntimeError("이미지 생성에 실패했습니다.")
+    return {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+
+# 백그라운드 덱 이미지 갱신 작업 (바뀐 카드만)
+def run_deck_refresh_job(payload):
+    results = refresh_deck_images(
+        payload['deck_id'],
+        payload.get('indexes'),
+        payload.get('concurrency', IMAGE_BATCH_DECK_CONCURRENCY),
+        payload.get('noCache', False),
+        payload.get('tier', IMAGE_TIER_FINAL),
+    )
+    succeeded = sum(1 for r in results if r["image_url"])
+    if results and not succeeded:
+        raise RuntimeError("이미지 생성에 실패했습니다.")
+    return {"deck_id": payload['deck_id'], "results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+
+# 이미지 생성 작업 큐 (JOB_QUEUE_DB, JOB_WORKERS, JOB_MAX_DEPTH, JOB_STALE_SECONDS, JOB_HEARTBEAT_SECONDS)
+job_queue = create_job_queue()
+job_queue.register("image", functools.partial(in_batch_lane, run_image_job))
+job_queue.register("deck_images", functools.partial(in_batch_lane, run_deck_images_job))
+job_queue.register("deck_refresh", functools.partial(in_batch_lane, run_deck_refresh_job))
+
+# 결과 캐시/요청 병합/작업 큐 상태를 스크레이프 시점에 지표로 제공
+registry.gauge("result_cache", "Result cache counters and size", result_cache.stats, labelname="stat")
+registry.gauge("singleflight", "Request coalescing counters", singleflight.stats, labelname="stat")
+registry.gauge("job_queue_jobs", "Jobs by status", lambda: job_queue.stats()["counts"], labelname="status")
+registry.gauge(
+    "openai_scheduler", "OpenAI scheduler counters and queue depth",
+    lambda: {f"{name}_{stat}": value for name, scheduler in openai_schedulers.items() for stat, value in scheduler.stats().items()},
+    labelname="stat",
+)
+registry.gauge("renditions", "Image rendition counters", renditions.stats, labelname="stat")
+registry.gauge("similarity_index", "Near-duplicate article lookups and index size", duplicates.stats, labelname="stat")
+registry.gauge("log_records_dropped", "Log records dropped because the log queue was full", dropped_log_records)
+
+_worker_pid = None
+
+# 워커 프로세스 초기화 (작업 큐 스레드 시작, 비슷한 기사 색인 로드)
+# gunicorn은 post_fork에서 호출하며, 다른 방식으로 실행된 경우 첫 요청에서 시작합니다.
+def init_worker():
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+    _worker_pid = os.getpid()
+    job_queue.start()
+    duplicates.warm()
+
+@api.before_app_request
+def ensure_worker_started():
+    init_worker()
+
+# 라우트별 처리 시간 기록 (스트리밍 응답은 첫 응답까지의 시간)
+@api.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@api.after_app_request
+def record_request_time(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=route,
+            status=str(response.status_code),
+        )
+    return response
+
+# 요청 처리 기한 설정 (X-Request-Timeout 헤더 또는 REQUEST_TIMEOUT, 이 요청의 OpenAI 호출과 대기에 적용)
+@api.before_app_request
+def start_request_deadline():
+    timeout = parse_timeout(request.headers.get(DEADLINE_HEADER), REQUEST_TIMEOUT)
+    if timeout is None and request.endpoint not in UNBOUNDED_ENDPOINTS:
+        timeout = REQUEST_TIMEOUT or None
+    g.deadline = Deadline(timeout)
+    g.deadline_token = set_deadline(g.deadline)
+
+# 스트리밍 응답은 전송이 끝난 뒤에 호출됨
+@api.teardown_app_request
+def end_request_deadline(error=None):
+    token = g.pop("deadline_token", None)
+    if token is not None:
+        reset_deadline(token)
+
+# Prometheus 지표 엔드포인트
+@api.route('/metrics')
+def metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+# 루트 엔드포인트 (프로세스 생존 확인용)
+@api.route('/')
 def root():
     return jsonify({"status": "ok", "message": "API server is running"})
 
+# 준비 상태 엔드포인트 (덱 저장소/작업 큐에 접근할 수 있을 때만 200, 로드 밸런서 헬스 체크용)
+@api.route('/ready')
+def ready():
+    checks = {}
+    for name, check in (("deck_store", deck_store.ping), ("job_queue", job_queue.depth)):
+        try:
+            check()
+            checks[name] = "ok"
+        except Exception as e:
+            logger.error("Readiness check %s failed: %s", name, e)
+            checks[name] = "error"
+    # OpenAI 상태는 보고만 함 (외부 장애로 모든 인스턴스가 빠지지 않도록 준비 상태에는 반영하지 않음)
+    checks["openai_key"] = "ok" if api_key else "missing"
+    checks["openai_breaker"] = {name: scheduler.breaker.state for name, scheduler in openai_schedulers.items()}
+    is_ready = checks["deck_store"] == "ok" and checks["job_queue"] == "ok"
+    return jsonify({"status": "ready" if is_ready else "unavailable", "checks": checks}), 200 if is_ready else 503
+
 # 텍스트 분석 엔드포인트
-@app.route('/api/analyze-text', methods=['POST'])
+@api.route('/api/analyze-text', methods=['POST'])
 def api_analyze_text():
     try:
         data = request.json
-        logger.debug(f"Received raw request data: {data}")
+        if should_log_payload(logger):
+            logger.debug("Received request data: %s", summarize_payload(data))
         
         if not data or 'text' not in data:
             return jsonify({"error": "No text provided"}), 400
             
         text = data['text']
-        logger.debug(f"Raw input text encoding: {text.encode()}")
-        logger.info(f"Analyzing text: {text[:100]}...")
+        logger.info("Analyzing text (%d chars)", len(text))
+        if should_log_payload(logger):
+            logger.debug("Analysis input: %s", preview(text))
+
+        if allows_duplicate_reuse(data):
+            duplicate = find_duplicate_deck(text)
+            if duplicate:
+                return jsonify(duplicate_response(*duplicate))
         
-        cards = analyze_text(text)
-        logger.info(f"Generated {len(cards)} cards")
+        cards, cached = cached_analyze_text(text, wants_cache_bypass(data))
+        logger.info("Generated %s cards (cached: %s)", len(cards), cached)
         
-        return jsonify({"cards": cards})
+        return jsonify({"cards": cards, "cached": cached, "deck_id": save_deck(text, cards)})
     except Exception as e:
-        logger.error(f"Error in analyze_text API: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        logger.error("Error in analyze_text API: %s", e)
+        return jsonify({"error": str(e)}), error_status(e)
+
+# Server-Sent Events 메시지 포맷
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# 스트리밍 텍스트 분석 엔드포인트 (카드가 완성될 때마다 SSE 이벤트로 전송)
+@api.route('/api/analyze-text/stream', methods=['POST'])
+def api_analyze_text_stream():
+    data = request.json
+
+    if not data or 'text' not in data:
+        return jsonify({"error": "No text provided"}), 400
+
+    text = data['text']
+    bypass_cache = wants_cache_bypass(data)
+    reuse_duplicate = allows_duplicate_reuse(data)
+    logger.info("Streaming analysis requested (%d chars)", len(text))
+    if should_log_payload(logger):
+        logger.debug("Analysis input: %s", preview(text))
+
+    def generate():
+        duplicate = find_duplicate_deck(text) if reuse_duplicate else None
+        if duplicate:
+            response = duplicate_response(*duplicate)
+            for index, card in enumerate(response["cards"]):
+                yield sse_event("card", {"index": index, "card": card})
+            yield sse_event("done", {
+                "count": len(response["cards"]), "cached": True,
+                "deck_id": response["deck_id"], "duplicate_of": response["duplicate_of"],
+            })
+            return
+
+        key = analysis_cache_key(text, structured=False)
+        if not bypass_cache:
+            hit, cards = result_cache.get(key)
+            if hit:
+                for index, card in enumerate(cards):
+                    yield sse_event("card", {"index": index, "card": card})
+                yield sse_event("done", {"count": len(cards), "cached": True, "deck_id": save_deck(text, cards)})
+                return
+
+        cards = []
+        try:
+            for card in stream_analyze_text(text):
+                yield sse_event("card", {"index": len(cards), "card": card})
+                cards.append(card)
+        except GeneratorExit:
+            # 클라이언트 연결이 끊기면 제너레이터가 닫히며 OpenAI 스트림도 함께 종료됨
+            DEADLINE_MISSES.inc(stage="stream", reason=REASON_DISCONNECT)
+            raise
+        except DeadlineExceededError as e:
+            logger.warning("Streaming analysis stopped: %s", e)
+            yield sse_event("error", {"error": str(e)})
+            return
+        except Exception as e:
+            logger.error("Error in streaming analysis: %s", e)
+            record_error("analyze_stream", e)
+            PARSE_OUTCOMES.inc(outcome=PARSE_TEXT if cards else PARSE_SAMPLE)
+            if not cards:
+                # 카드를 하나도 받지 못한 경우 기존 엔드포인트와 같이 샘플 카드 제공
+                for index, card in enumerate(get_sample_cards(f"API 오류: {str(e)}")):
+                    yield sse_event("card", {"index": index, "card": card})
+            yield sse_event("error", {"error": str(e)})
+            return
+
+        if not cards:
+            logger.warning("All parsing methods failed, using sample cards")
+            PARSE_OUTCOMES.inc(outcome=PARSE_SAMPLE)
+            cards = get_sample_cards()
+            for index, card in enumerate(cards):
+                yield sse_event("card", {"index": index, "card": card})
+        elif not is_sample_cards(cards):
+            PARSE_OUTCOMES.inc(outcome=PARSE_TEXT)
+            CARDS_GENERATED.inc(len(cards), outcome=PARSE_TEXT)
+            result_cache.set(key, cards)
+        yield sse_event("done", {"count": len(cards), "cached": False, "deck_id": save_deck(text, cards)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def ndjson_line(data):
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+def batch_output_path(batch_id):
+    return os.path.join(BATCH_OUTPUT_DIR, f"{batch_id}.jsonl")
+
+# 여러 기사 일괄 분석 엔드포인트
+# JSON {"articles": [...]} 또는 JSONL 파일(file)을 받아 기사별 결과를 끝나는 순서대로 NDJSON으로 전송하고,
+# 같은 내용을 결과 파일에도 기록합니다. 같은 batchId로 다시 요청하면 성공한 기사는 건너뜁니다.
+@api.route('/api/analyze-batch', methods=['POST'])
+def api_analyze_batch():
+    if 'file' in request.files:
+        options = request.form
+        articles = iter_jsonl_articles(request.files['file'].stream)
+    else:
+        options = request.json or {}
+        raw_articles = options.get('articles')
+        if not isinstance(raw_articles, list) or not raw_articles:
+            return jsonify({"error": "No articles provided"}), 400
+        if len(raw_articles) > BATCH_MAX_ITEMS:
+            return jsonify({"error": f"Too many articles (max {BATCH_MAX_ITEMS}), upload a JSONL file instead"}), 400
+        articles = (normalize_article(raw, index) for index, raw in enumerate(raw_articles))
+
+    batch_id = options.get('batchId') or uuid.uuid4().hex
+    if not re.fullmatch(r'[A-Za-z0-9_-]{1,64}', batch_id):
+        return jsonify({"error": "Invalid batchId"}), 400
+    try:
+        concurrency = int(options.get('concurrency', BATCH_MAX_CONCURRENCY))
+    except (TypeError, ValueError):
+        concurrency = BATCH_MAX_CONCURRENCY
+    concurrency = max(1, min(BATCH_MAX_CONCURRENCY, concurrency))
+    bypass_cache = wants_cache_bypass(options)
+
+    path = batch_output_path(batch_id)
+    completed = load_completed_ids(path)
+    deadline = g.deadline
+    logger.info("Batch %s started (concurrency: %s, already completed: %s)", batch_id, concurrency, len(completed))
+
+    def process(article):
+        with request_deadline(deadline):
+            return analyze_batch_article(article, bypass_cache)
+
+    def generate():
+        counts = {"succeeded": 0, "failed": 0, "skipped": 0}
+        # 결과 파일은 스트림이 시작된 뒤에 열어 응답 전에 연결이 끊겨도 파일 핸들이 남지 않게 함
+        writer = JsonlWriter(path)
+        results = run_batch(
+            articles, process, batch_executor, concurrency, writer, completed, heartbeat=BATCH_HEARTBEAT_SECONDS,
+        )
+        try:
+            yield ndjson_line({"type": "batch", "batch_id": batch_id, "concurrency": concurrency, "resumed": len(completed)})
+            for record in results:
+                if record is None:
+                    yield ndjson_line({"type": "heartbeat"})
+                    continue
+                if record["status"] == STATUS_OK:
+                    counts["succeeded"] += 1
+                elif record["status"] == STATUS_ERROR:
+                    counts["failed"] += 1
+                else:
+                    counts["skipped"] += 1
+                yield ndjson_line({"type": "item", **record})
+            logger.info("Batch %s finished: %s", batch_id, counts)
+            yield ndjson_line({"type": "done", "batch_id": batch_id, **counts})
+        except GeneratorExit:
+            # 클라이언트 연결이 끊기면 대기 중인 OpenAI 호출은 취소하고 (오류로 기록되어 다시 요청하면 재처리),
+            # 이미 응답을 받고 있는 기사는 끝까지 처리하여 기록
+            logger.warning("Batch %s client disconnected, cancelling pending articles", batch_id)
+            DEADLINE_MISSES.inc(stage="batch", reason=REASON_DISCONNECT)
+            deadline.cancel()
+            raise
+        finally:
+            results.close()
+            writer.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Batch-Id": batch_id},
+    )
+
+# 일괄 분석 결과 파일 조회 엔드포인트 (기사별 결과 JSONL, 완료 순서)
+@api.route('/api/analyze-batch/<batch_id>')
+def api_get_batch(batch_id):
+    if not re.fullmatch(r'[A-Za-z0-9_-]{1,64}', batch_id) or not os.path.exists(batch_output_path(batch_id)):
+        return jsonify({"error": "Batch not found"}), 404
+    return send_file(batch_output_path(batch_id), mimetype='application/x-ndjson', max_age=0)
 
 # 파일 업로드 엔드포인트
-@app.route('/api/upload-file', methods=['POST'])
+@api.route('/api/upload-file', methods=['POST'])
 def api_upload_file():
     try:
         if 'file' not in request.files:
@@ -324,23 +1077,41 @@ def api_upload_file():
         if file.filename == '':
             return jsonify({"error": "No selected file"}), 400
             
-        logger.info(f"File upload requested: {file.filename}")
+        logger.info("File upload requested: %s", file.filename)
         
-        # 파일 내용 읽기
-        text_content = file.read().decode('utf-8')
-        logger.info(f"File content (first 100 chars): {text_content[:100]}...")
+        # 파일 전체를 메모리에 올리지 않고 해시/크기 검사 후 인코딩 판별
+        digest, sample, size = hash_stream(file.stream, UPLOAD_MAX_BYTES)
+        encoding = request.form.get('encoding') or detect_encoding(sample)
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            return jsonify({"error": f"Unknown encoding: {encoding}"}), 400
+        logger.info("File size: %s bytes, encoding: %s", size, encoding)
+        
+        # 조각 단위로 읽어 섹션별로 분석
+        def analyze_upload():
+            text_chunks = iter_decoded_text(file.stream, encoding)
+            return analyze_sections(iter_sections(text_chunks, CHUNK_SECTION_TOKENS))
         
-        # 텍스트 분석
-        cards = analyze_text(text_content)
-        logger.info(f"Generated {len(cards)} cards from file")
+        cards, cached = coalesced_get_or_compute(
+            upload_cache_key(digest, encoding),
+            analyze_upload,
+            wants_cache_bypass(request.form),
+            should_store=lambda cards: not is_sample_cards(cards),
+        )
+        logger.info("Generated %s cards from file (cached: %s)", len(cards), cached)
         
-        return jsonify({"cards": cards})
+        # 재생성 문맥으로 쓸 원문은 파일 앞부분만 저장
+        source_text = sample.decode(encoding, errors="replace")
+        return jsonify({"cards": cards, "cached": cached, "deck_id": save_deck(source_text, cards)})
+    except UploadTooLargeError as e:
+        return jsonify({"error": str(e)}), 413
     except Exception as e:
-        logger.error(f"Error in upload_file API: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        logger.error("Error in upload_file API: %s", e)
+        return jsonify({"error": str(e)}), error_status(e)
 
 # 이미지 생성 엔드포인트
-@app.route('/api/generate-image', methods=['POST'])
+@api.route('/api/generate-image', methods=['POST'])
 def api_generate_image():
     try:
         data = request.json
@@ -358,33 +1129,410 @@ def api_generate_image():
         highlight = data.get('highlight', '')
         style = data.get('style', '사진')
         background_color = data.get('backgroundColor', '')
+        try:
+            tier = requested_image_tier(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        logger.info(f"Image generation requested for title: '{title[:30]}...' with prompt: {prompt[:100]}...")
+        logger.info("Image generation requested (tier: %s)", tier)
+        if should_log_payload(logger):
+            logger.debug("Image request title: '%s', prompt: %s", preview(title, 30), preview(prompt))
+
+        # 비동기 요청이면 작업만 등록하고 바로 작업 ID 반환
+        if data.get('async'):
+            return job_accepted("image", {
+                "prompt": prompt,
+                "title": title,
+                "content": content,
+                "highlight": highlight,
+                "style": style,
+                "backgroundColor": background_color,
+                "noCache": wants_cache_bypass(data),
+                "tier": tier,
+                "deckId": data.get('deckId'),
+                "cardIndex": data.get('cardIndex'),
+            })
         
-        image_url = generate_image(
+        image_url, cached = cached_generate_image(
             prompt, 
             title, 
             content, 
             highlight,
             style, 
-            background_color
+            background_color,
+            bypass_cache=wants_cache_bypass(data),
+            tier=tier,
         )
         
         if not image_url:
             logger.error("Image generation failed - empty URL returned")
             return jsonify({"error": "이미지 생성에 실패했습니다."}), 500
+
+        # 덱 카드의 이미지이면 덱에도 저장 (서버 측 내보내기에서 사용)
+        attach_deck_image(data.get('deckId'), data.get('cardIndex'), image_url, tier)
             
-        logger.info("Image generated successfully")
-        return jsonify({"image_url": image_url})
+        logger.info("Image generated successfully (cached: %s)", cached)
+        return jsonify({"image_url": absolute_image_url(image_url), "cached": cached, "tier": tier})
     except Exception as e:
-        logger.error(f"Error in generate_image API: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        logger.error("Error in generate_image API: %s", e)
+        return jsonify({"error": str(e)}), error_status(e)
+
+# 이미지 일괄 생성 엔드포인트
+@api.route('/api/generate-images', methods=['POST'])
+def api_generate_images():
+    try:
+        data = request.json
+
+        if not data or not isinstance(data.get('cards'), list):
+            return jsonify({"error": "No cards provided"}), 400
+
+        cards = data['cards']
+        if not cards:
+            return jsonify({"error": "No cards provided"}), 400
+        if len(cards) > IMAGE_BATCH_MAX_CARDS:
+            return jsonify({"error": f"Too many cards (max {IMAGE_BATCH_MAX_CARDS})"}), 400
+
+        style = data.get('style', '사진')
+        background_color = data.get('backgroundColor', '')
+        try:
+            concurrency = int(data.get('concurrency', IMAGE_BATCH_DECK_CONCURRENCY))
+        except (TypeError, ValueError):
+            concurrency = IMAGE_BATCH_DECK_CONCURRENCY
+        concurrency = max(1, min(IMAGE_BATCH_DECK_CONCURRENCY, concurrency))
+        try:
+            tier = requested_image_tier(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        logger.info("Batch image generation requested for %s cards (concurrency: %s, tier: %s)", len(cards), concurrency, tier)
+
+        if data.get('async'):
+            return job_accepted("deck_images", {
+                "cards": cards,
+                "style": style,
+                "backgroundColor": background_color,
+                "concurrency": concurrency,
+                "noCache": wants_cache_bypass(data),
+                "tier": tier,
+            })
+
+        results = generate_images(cards, style, background_color, concurrency, wants_cache_bypass(data), tier)
+        for result in results:
+            result["image_url"] = absolute_image_url(result["image_url"])
+        succeeded = sum(1 for r in results if r["image_url"])
+        failed = len(results) - succeeded
+
+        logger.info("Batch image generation finished: %s succeeded, %s failed", succeeded, failed)
+
+        body = {"results": results, "succeeded": succeeded, "failed": failed}
+        if not succeeded:
+            return jsonify({**body, "error": "이미지 생성에 실패했습니다."}), error_status()
+        return jsonify(body)
+    except Exception as e:
+        logger.error("Error in generate_images API: %s", e)
+        return jsonify({"error": str(e)}), error_status(e)
+
+# 덱 목록 엔드포인트 (최신순, cursor로 다음 페이지, text 지정 시 같은 원문으로 만든 덱만)
+@api.route('/api/decks')
+def api_list_decks():
+    try:
+        decks, next_cursor = deck_store.list_decks(
+            request.args.get('limit', 20, type=int),
+            request.args.get('cursor'),
+            request.args.get('text'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    for deck in decks:
+        deck["image"] = absolute_image_url(deck["image"])
+    return jsonify({"decks": decks, "next_cursor": next_cursor})
+
+# 덱 조회 엔드포인트
+@api.route('/api/decks/<deck_id>')
+def api_get_deck(deck_id):
+    deck = deck_store.get(deck_id)
+    if deck is None:
+        return jsonify({"error": "Deck not found"}), 404
+    return jsonify(deck_response(deck))
+
+# 덱 이미지 스타일 변경 엔드포인트 (모든 카드 이미지가 갱신 대상이 됨)
+@api.route('/api/decks/<deck_id>', methods=['PATCH'])
+def api_update_deck(deck_id):
+    data = request.json or {}
+    deck = deck_store.get(deck_id)
+    if deck is None:
+        return jsonify({"error": "Deck not found"}), 404
+    deck_store.set_style(deck_id, data.get('style', deck["style"]), data.get('backgroundColor', deck["backgroundColor"]))
+    return jsonify(deck_response(deck_store.get(deck_id)))
+
+# 카드 한 장 수정 엔드포인트 (바뀐 항목만 전달, revision 지정 시 동시 수정 충돌 검사)
+@api.route('/api/decks/<deck_id>/cards/<int:index>', methods=['PATCH'])
+def api_update_deck_card(deck_id, index):
+    data = request.json or {}
+    if not any(field in data for field in EDITABLE_FIELDS):
+        return jsonify({"error": f"No card fields provided ({', '.join(EDITABLE_FIELDS)})"}), 400
+    try:
+        revision = requested_revision(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        deck, changed = deck_store.update_card(deck_id, index, data, revision)
+    except DeckNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except DeckConflictError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({"deck": deck_response(deck), "card": deck["cards"][index], "changed": changed})
+
+# 카드 한 장 재생성 엔드포인트 (나머지 카드를 문맥으로 사용, generateImage 지정 시 해당 카드 이미지도 생성)
+@api.route('/api/decks/<deck_id>/cards/<int:index>/regenerate', methods=['POST'])
+def api_regenerate_deck_card(deck_id, index):
+    data = request.json or {}
+    try:
+        tier = requested_image_tier(data)
+        revision = requested_revision(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        deck = deck_store.get(deck_id, include_source=True)
+        if deck is None or not 0 <= index < len(deck["cards"]):
+            return jsonify({"error": "Card not found"}), 404
+        if revision is not None and revision != deck["revision"]:
+            return jsonify({"error": f"Deck {deck_id} was modified (revision {deck['revision']})"}), 409
+
+        logger.info("Regenerating card %s of deck %s", index, deck_id)
+        card = regenerate_card(deck["source_text"], deck["cards"], index, data.get('instruction', ''))
+        deck, changed = deck_store.update_card(deck_id, index, card, deck["revision"])
+
+        image_result = None
+        if data.get('generateImage'):
+            image_result = refresh_deck_images(deck_id, [index], 1, wants_cache_bypass(data), tier)[0]
+            image_result["image_url"] = absolute_image_url(image_result["image_url"])
+            deck = deck_store.get(deck_id)
+
+        return jsonify({"deck": deck_response(deck), "card": deck["cards"][index], "changed": changed, "image": image_result})
+    except DeckNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except DeckConflictError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        logger.error("Error in regenerate_deck_card API: %s", e)
+        return jsonify({"error": str(e)}), error_status(e)
+
+# 덱 이미지 일괄 갱신 요청 처리 (갱신/완성 엔드포인트 공용)
+def deck_refresh_response(deck_id, data, indexes, tier):
+    try:
+        concurrency = int(data.get('concurrency', IMAGE_BATCH_DECK_CONCURRENCY))
+    except (TypeError, ValueError):
+        concurrency = IMAGE_BATCH_DECK_CONCURRENCY
+    concurrency = max(1, min(IMAGE_BATCH_DECK_CONCURRENCY, concurrency))
+
+    if data.get('async'):
+        return job_accepted("deck_refresh", {
+            "deck_id": deck_id,
+            "indexes": indexes,
+            "concurrency": concurrency,
+            "noCache": wants_cache_bypass(data),
+            "tier": tier,
+        })
+
+    try:
+        results = refresh_deck_images(deck_id, indexes, concurrency, wants_cache_bypass(data), tier)
+    except DeckNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        logger.error("Error in refresh_deck_images API: %s", e)
+        return jsonify({"error": str(e)}), error_status(e)
+
+    for result in results:
+        result["image_url"] = absolute_image_url(result["image_url"])
+    succeeded = sum(1 for r in results if r["image_url"])
+    body = {
+        "results": results,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "deck": deck_response(deck_store.get(deck_id)),
+    }
+    if results and not succeeded:
+        return jsonify({**body, "error": "이미지 생성에 실패했습니다."}), error_status()
+    return jsonify(body)
+
+# 덱 이미지 갱신 엔드포인트 (이미지가 없거나 내용이 바뀐 카드만 생성, indexes로 대상 지정 가능)
+# tier=draft로 빠르게 시안을 만든 뒤 finalize 엔드포인트로 확정한 카드만 고품질로 다시 생성
+@api.route('/api/decks/<deck_id>/images', methods=['POST'])
+def api_refresh_deck_images(deck_id):
+    data = request.json or {}
+    indexes = data.get('indexes')
+    if indexes is not None and (not isinstance(indexes, list) or not all(isinstance(i, int) for i in indexes)):
+        return jsonify({"error": "indexes must be a list of card indexes"}), 400
+    try:
+        tier = requested_image_tier(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if deck_store.get(deck_id) is None:
+        return jsonify({"error": "Deck not found"}), 404
+    return deck_refresh_response(deck_id, data, indexes, tier)
+
+# 덱 이미지 완성 엔드포인트 (확정한 카드 중 아직 최종 품질 이미지가 없는 카드만 final 등급으로 생성)
+@api.route('/api/decks/<deck_id>/finalize', methods=['POST'])
+def api_finalize_deck(deck_id):
+    data = request.json or {}
+    indexes = data.get('indexes')
+    if indexes is not None and (not isinstance(indexes, list) or not all(isinstance(i, int) for i in indexes)):
+        return jsonify({"error": "indexes must be a list of card indexes"}), 400
+
+    deck = deck_store.get(deck_id)
+    if deck is None:
+        return jsonify({"error": "Deck not found"}), 404
+
+    targets = [
+        card["index"] for card in deck["cards"]
+        if (indexes is None or card["index"] in indexes) and card["image_tier"] != IMAGE_TIER_FINAL
+    ]
+    logger.info("Finalizing %s card images for deck %s", len(targets), deck_id)
+    return deck_refresh_response(deck_id, data, targets, IMAGE_TIER_FINAL)
+
+# 덱 내보내기 엔드포인트 (카드 이미지 + manifest.json ZIP 또는 카드당 한 페이지 PDF를 스트리밍)
+@api.route('/api/decks/<deck_id>/export')
+def api_export_deck(deck_id):
+    export_format = request.args.get('format', 'zip').lower()
+    if export_format not in ('zip', 'pdf'):
+        return jsonify({"error": "format must be zip or pdf"}), 400
+    if export_format == 'pdf' and not pdf_available():
+        return jsonify({"error": "PDF export requires Pillow"}), 501
+
+    deck = deck_store.get(deck_id)
+    if deck is None:
+        return jsonify({"error": "Deck not found"}), 404
+
+    logger.info("Exporting deck %s as %s (%s cards)", deck_id, export_format, len(deck["cards"]))
+    if export_format == 'pdf':
+        chunks, mimetype = iter_deck_pdf(deck, blob_store), 'application/pdf'
+    else:
+        chunks, mimetype = iter_deck_zip(deck, blob_store), 'application/zip'
+
+    # 크기를 미리 알 수 없으므로 Content-Length 없이 조각 단위로 전송
+    return Response(
+        stream_with_context(chunk for chunk in chunks if chunk),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f'attachment; filename="cardnews-{deck_id[:8]}.{export_format}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+# 요청한 렌디션의 블롭 키 반환 (format을 생략하면 Accept 헤더로 형식 선택)
+def resolve_rendition(key, rendition, image_format):
+    if not renditions.enabled:
+        # Pillow가 없으면 원본 제공
+        return key
+    if not image_format or image_format == 'auto':
+        image_format = negotiate_format(request.headers.get('Accept'), renditions.formats)
+    if not renditions.supports(rendition, image_format):
+        abort(400, description=f"Unsupported rendition {rendition}/{image_format}")
+    try:
+        with time_stage("image_rendition"):
+            return renditions.get(key, rendition, image_format)
+    except (OSError, KeyError) as e:
+        logger.warning("Rendition source %s not available: %s", key, e)
+        abort(404)
+
+# 생성된 이미지 제공 엔드포인트 (ETag, Cache-Control, Range 요청 지원)
+# rendition=thumb|preview|full, format=webp|avif|jpg|auto로 축소/압축된 렌디션 요청 가능
+@api.route('/api/images/<key>')
+def api_get_image(key):
+    if not is_valid_key(key):
+        abort(404)
+
+    rendition = request.args.get('rendition')
+    image_format = request.args.get('format')
+    negotiated = bool(rendition or image_format) and image_format in (None, '', 'auto')
+    if rendition or image_format:
+        key = resolve_rendition(key, rendition or 'full', image_format)
+
+    if not isinstance(blob_store, LocalBlobStore):
+        # S3 저장소는 presigned URL로 리다이렉트
+        response = redirect(blob_store.presigned_url(key))
+        if negotiated:
+            response.vary.add('Accept')
+        return response
+
+    if not blob_store.exists(key):
+        abort(404)
+
+    # 콘텐츠 해시가 곧 키이므로 ETag로 사용하고 영구 캐시 허용
+    response = send_file(
+        blob_store.path(key),
+        mimetype=content_type_for_key(key),
+        conditional=True,
+        etag=key,
+        max_age=31536000,
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    if negotiated:
+        response.vary.add('Accept')
+    return response
+
+# 작업 큐 상태 엔드포인트 (워커 수, 대기열 길이, 평균 처리 시간)
+@api.route('/api/jobs/stats')
+def api_job_stats():
+    return jsonify(job_queue.stats())
+
+# 작업 상태 조회 엔드포인트 (?wait=초 지정 시 완료될 때까지 최대 해당 시간 대기)
+@api.route('/api/jobs/<job_id>')
+def api_get_job(job_id):
+    try:
+        wait_seconds = min(60.0, max(0.0, float(request.args.get('wait', 0))))
+    except ValueError:
+        wait_seconds = 0.0
+
+    job = job_queue.wait(job_id, wait_seconds) if wait_seconds else job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job_response(job))
+
+# 캐시 통계 엔드포인트
+@api.route('/api/cache/stats')
+def api_cache_stats():
+    return jsonify({**result_cache.stats(), "singleflight": singleflight.stats()})
+
+# OpenAI 호출 스케줄러 상태 엔드포인트 (재시도, 속도 제한 대기, 회로 차단기)
+@api.route('/api/openai/stats')
+def api_openai_stats():
+    return jsonify({name: scheduler.stats() for name, scheduler in openai_schedulers.items()})
+
+# 요청 본문 크기 초과
+@api.app_errorhandler(413)
+def request_too_large(e):
+    return jsonify({"error": f"Request is too large (max {UPLOAD_MAX_BYTES} bytes)"}), 413
 
 # 에코 엔드포인트 (테스트용)
-@app.route('/api/echo', methods=['POST'])
+@api.route('/api/echo', methods=['POST'])
 def echo():
     return jsonify({"received": request.json})
 
+# 애플리케이션 팩토리
+# 무거운 초기화(설정, 저장소, 스케줄러)는 모듈 import 시 한 번만 수행되고, 스레드와 연결은 워커마다 만들어지므로
+# gunicorn --preload로 마스터에서 한 번 import한 뒤 워커를 fork해도 안전합니다.
+def build_app():
+    """
+    Flask 애플리케이션을 만들고 API 블루프린트와 JSON/업로드 설정을 연결
+    캐시, 스케줄러, 덱 저장소, 작업 큐, 스레드 풀 등 서비스는 이 모듈을 import할 때 만든 전역 객체이므로
+    여러 번 호출해도 모든 앱이 같은 서비스를 공유합니다 (앱마다 독립된 상태를 만드는 팩토리가 아님).
+    워커 스레드는 init_worker에서 시작합니다.
+    """
+    app = Flask(__name__)
+    app.json = TimedJSONProvider(app)
+    # 요청 본문 크기 제한 (멀티파트 오버헤드 여유 포함)
+    app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_BYTES + 1024 * 1024
+    CORS(app)  # CORS 설정
+    app.register_blueprint(api)
+    return app
+
+app = build_app()
+
 # 애플리케이션 직접 실행 시에만 서버 시작
 if __name__ == '__main__':
+    init_worker()
     app.run(debug=True, host='0.0.0.0', port=8000) 
\ No newline at end of file
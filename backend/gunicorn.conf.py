@@ -0,0 +1,24 @@
+"""
+gunicorn 설정 - backend 디렉토리에서 `gunicorn flask_app:app`으로 실행하면 자동으로 읽힙니다.
+
+preload_app이 켜져 있으면 마스터가 앱을 한 번만 import하고 워커는 fork로 시작하므로,
+워커를 늘리거나 재시작할 때 import 비용 없이 바로 요청을 받을 수 있습니다.
+"""
+import os
+
+# 주소(PORT)와 워커 수(WEB_CONCURRENCY)는 gunicorn 기본 환경 변수를 그대로 사용
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() in ("1", "true")
+
+
+def on_starting(server):
+    # preload 시 첫 OpenAI 호출 때 로드할 SDK도 마스터에서 미리 import하여 워커가 공유
+    if server.cfg.preload_app:
+        import openai  # noqa: F401
+
+
+def post_fork(server, worker):
+    # 연결과 스레드는 워커마다 새로 만듦 (Flask 앱의 작업 큐 스레드 시작)
+    if (getattr(server.app, "app_uri", None) or "").split(":")[0] == "flask_app":
+        from flask_app import init_worker
+        init_worker()
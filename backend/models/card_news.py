@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+
+class Card(BaseModel):
+    """카드뉴스 한 장"""
+    title: str
+    content: str = ""
+    highlight: str = ""
+    image: str = ""
+    prompt: str = ""
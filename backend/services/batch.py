@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_SKIPPED = "skipped"
+
+
+def article_id(text):
+    """id가 없는 기사의 식별자 (본문 해시, 재시작 시 같은 기사를 건너뛰는 데 사용)"""
+    return "sha256:" + hashlib.sha256((text or "").encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_article(raw, index):
+    """
+    입력 항목을 {"id", "index", "text"} 형식으로 변환
+    문자열은 본문으로, 객체는 text(또는 content) 필드를 본문으로 사용하며 잘못된 항목은 error를 포함합니다.
+    """
+    if isinstance(raw, str):
+        article = {"id": article_id(raw), "index": index, "text": raw}
+    elif isinstance(raw, dict):
+        text = raw.get("text") or raw.get("content") or ""
+        article = {"id": str(raw.get("id") or article_id(str(text))), "index": index, "text": text}
+    else:
+        return {"id": f"item-{index}", "index": index, "text": "", "error": "Article must be a string or an object"}
+    if not isinstance(article["text"], str) or not article["text"].strip():
+        article["error"] = "Empty text"
+    return article
+
+
+def iter_jsonl_articles(lines):
+    """JSONL 줄 단위로 기사를 읽어 정규화 (빈 줄은 건너뛰고, 잘못된 줄은 항목 오류로 기록)"""
+    index = 0
+    for number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError as e:
+            yield {"id": f"line-{number}", "index": index, "text": "", "error": f"Invalid JSON on line {number}: {e}"}
+        else:
+            yield normalize_article(raw, index)
+        index += 1
+
+
+def load_completed_ids(path):
+    """이전 실행 결과 파일에서 성공한 기사 id 목록 (중간에 끊긴 마지막 줄은 무시)"""
+    completed = set()
+    if not path or not os.path.exists(path):
+        return completed
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") == STATUS_OK and record.get("id") is not None:
+                completed.add(record["id"])
+    return completed
+
+
+class JsonlWriter:
+    """
+    결과를 한 줄씩 추가하는 JSONL 파일 (여러 스레드에서 호출 가능)
+    줄마다 fsync하여 프로세스가 죽어도 기록된 결과는 남고, 다시 실행하면 그 이후부터 이어서 처리합니다.
+    """
+
+    def __init__(self, path, sync=True):
+        self.path = path
+        self.sync = sync
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.sync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _process_article(article, process, writer):
+    started = time.perf_counter()
+    record = {"id": article["id"], "index": article["index"]}
+    if article.get("error"):
+        record.update(status=STATUS_ERROR, error=article["error"])
+    else:
+        try:
+            record.update(status=STATUS_OK, **process(article))
+        except Exception as e:
+            logger.warning("Batch item %s failed: %s", article["id"], e)
+            record.update(status=STATUS_ERROR, error=str(e))
+    record["elapsed"] = round(time.perf_counter() - started, 3)
+    # 작업 스레드에서 바로 기록하여 요청이 끊겨도 끝난 항목은 남김
+    if writer is not None:
+        writer.write(record)
+    return record
+
+
+def run_batch(articles, process, executor, concurrency, writer=None, completed=frozenset(), heartbeat=None):
+    """
+    기사들을 최대 concurrency개씩 동시에 처리하고 끝나는 순서대로 결과 레코드 반환 (제너레이터)
+    입력은 필요한 만큼만 읽으므로 기사 수와 관계없이 메모리 사용량이 일정하며,
+    completed에 있는 id는 처리하지 않고 skipped 레코드로 알려주며(결과 파일에는 기록하지 않음),
+    제너레이터가 닫히면 새 항목은 더 시작하지 않습니다.
+    heartbeat(초)를 지정하면 그동안 끝난 항목이 없을 때 None을 반환합니다 (스트리밍 응답의 연결 확인용).
+    """
+    pending = set()
+    skipped = []
+    queue = iter(articles)
+
+    def submit_next():
+        for article in queue:
+            if article["id"] in completed:
+                skipped.append({"id": article["id"], "index": article["index"], "status": STATUS_SKIPPED})
+                continue
+            pending.add(executor.submit(_process_article, article, process, writer))
+            return True
+        return False
+
+    for _ in range(max(1, concurrency)):
+        if not submit_next():
+            break
+
+    try:
+        while pending or skipped:
+            while skipped:
+                yield skipped.pop(0)
+            if not pending:
+                break
+            done, _ = wait(pending, timeout=heartbeat, return_when=FIRST_COMPLETED)
+            if not done:
+                yield None
+                continue
+            for future in done:
+                pending.discard(future)
+                submit_next()
+                yield future.result()
+    finally:
+        # 중단되더라도 이미 시작한 항목은 끝까지 처리하여 결과 파일에 남김
+        wait(pending)
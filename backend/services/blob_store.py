@@ -0,0 +1,186 @@
+import base64
+import hashlib
+import logging
+import os
+import re
+import tempfile
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 블롭 키 형식: <sha256>.<확장자> 또는 원본에서 파생된 <sha256>.<렌디션>.<확장자>
+_KEY_PATTERN = re.compile(r'^[0-9a-f]{64}(\.[a-z]+)?\.[a-z0-9]+$')
+
+_EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/webp": "webp",
+    "image/avif": "avif",
+}
+
+_CONTENT_TYPES = {ext: content_type for content_type, ext in _EXTENSIONS.items()}
+
+
+def is_valid_key(key):
+    return bool(key) and bool(_KEY_PATTERN.match(key))
+
+
+def content_type_for_key(key):
+    return _CONTENT_TYPES.get(key.rsplit(".", 1)[-1], "application/octet-stream")
+
+
+def make_key(data, content_type="image/png"):
+    """콘텐츠 해시 기반 블롭 키 생성"""
+    return f"{hashlib.sha256(data).hexdigest()}.{_EXTENSIONS.get(content_type, 'bin')}"
+
+
+class LocalBlobStore:
+    """로컬 디렉터리에 콘텐츠 해시 이름으로 파일을 저장하는 블롭 저장소"""
+
+    def __init__(self, root, url_prefix="/api/images/"):
+        self.root = root
+        self.url_prefix = url_prefix
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        if not is_valid_key(key):
+            raise ValueError(f"Invalid blob key: {key}")
+        # 한 디렉터리에 파일이 몰리지 않도록 해시 앞 2자리로 분산
+        return os.path.join(self.root, key[:2], key)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def put(self, data, content_type="image/png", key=None):
+        key = key or make_key(data, content_type)
+        path = self.path(key)
+        if os.path.exists(path):
+            return key
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 임시 파일에 쓴 뒤 교체하여 다른 워커가 불완전한 파일을 읽지 않도록 함
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info("Stored blob %s (%s bytes)", key, len(data))
+        return key
+
+    def open(self, key):
+        return open(self.path(key), "rb")
+
+    def url_for(self, key):
+        return f"{self.url_prefix}{key}"
+
+    def key_for_url(self, url):
+        """저장소가 발급한 URL에서 블롭 키 추출 (다른 URL이면 None)"""
+        if not url:
+            return None
+        key = url.split("?", 1)[0].rsplit("/", 1)[-1]
+        return key if is_valid_key(key) and self.url_prefix in url else None
+
+
+class S3BlobStore:
+    """S3 호환 저장소 (boto3 필요)"""
+
+    def __init__(self, bucket, prefix="", public_base_url="", url_prefix="/api/images/", **client_kwargs):
+        import boto3
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_base_url = public_base_url.rstrip("/")
+        self.url_prefix = url_prefix
+        self.client = boto3.client("s3", **client_kwargs)
+
+    def _object_key(self, key):
+        if not is_valid_key(key):
+            raise ValueError(f"Invalid blob key: {key}")
+        return f"{self.prefix}{key}"
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except ClientError:
+            return False
+
+    def put(self, data, content_type="image/png", key=None):
+        key = key or make_key(data, content_type)
+        if self.exists(key):
+            return key
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._object_key(key),
+            Body=data,
+            ContentType=content_type,
+            CacheControl="public, max-age=31536000, immutable",
+        )
+        logger.info("Stored blob %s in s3://%s/%s (%s bytes)", key, self.bucket, self.prefix, len(data))
+        return key
+
+    def open(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))["Body"]
+
+    def presigned_url(self, key, expires_in=3600):
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._object_key(key)},
+            ExpiresIn=expires_in,
+        )
+
+    def url_for(self, key):
+        # 공개 버킷/CDN 주소가 있으면 직접 제공, 없으면 API 서버가 presigned URL로 리다이렉트
+        if self.public_base_url:
+            return f"{self.public_base_url}/{self._object_key(key)}"
+        return f"{self.url_prefix}{key}"
+
+    def key_for_url(self, url):
+        if not url:
+            return None
+        key = url.split("?", 1)[0].rsplit("/", 1)[-1]
+        if not is_valid_key(key):
+            return None
+        if self.url_prefix in url or (self.public_base_url and url.startswith(self.public_base_url)):
+            return key
+        return None
+
+
+def store_generated_image(store, image):
+    """
+    이미지 생성 API 응답 항목을 저장하고 제공용 URL 반환
+    base64 데이터는 한 번만 디코딩하여 저장하며, URL만 있는 응답은 그대로 반환합니다.
+    """
+    if getattr(image, 'b64_json', None):
+        key = store.put(base64.b64decode(image.b64_json), "image/png")
+        return store.url_for(key)
+    if getattr(image, 'url', None):
+        # 이전 모델 호환성을 위해 url이 있는 경우 url 반환
+        return image.url
+    return ""
+
+
+def create_blob_store():
+    """환경 변수(BLOB_STORE=local|s3)에 따라 블롭 저장소 생성"""
+    backend = os.getenv("BLOB_STORE", "local").lower()
+    if backend == "s3":
+        client_kwargs = {}
+        if os.getenv("S3_ENDPOINT_URL"):
+            client_kwargs["endpoint_url"] = os.getenv("S3_ENDPOINT_URL")
+        return S3BlobStore(
+            bucket=os.environ["S3_BUCKET"],
+            prefix=os.getenv("S3_PREFIX", "images/"),
+            public_base_url=os.getenv("S3_PUBLIC_BASE_URL", ""),
+            **client_kwargs,
+        )
+
+    root = os.getenv("BLOB_STORE_DIR") or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "images"
+    )
+    return LocalBlobStore(root)
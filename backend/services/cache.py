@@ -0,0 +1,228 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(value):
+    """캐시 키 계산용 텍스트 정규화 (유니코드 NFC, 공백 축약)"""
+    if value is None:
+        return ""
+    value = unicodedata.normalize("NFC", str(value))
+    return _WHITESPACE.sub(" ", value).strip()
+
+
+def make_cache_key(namespace, **params):
+    """
+    네임스페이스와 파라미터로 콘텐츠 기반 캐시 키 생성
+    문자열 파라미터는 정규화한 뒤 정렬된 JSON으로 직렬화하여 해시합니다.
+    """
+    normalized = {
+        name: normalize_text(value) if isinstance(value, str) else value
+        for name, value in params.items()
+    }
+    payload = json.dumps(normalized, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class _DiskTier:
+    """여러 gunicorn 워커가 공유하는 SQLite 기반 캐시 저장소"""
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        # fork된 워커는 부모의 SQLite 연결을 쓰지 않고 새로 엶
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._forget_connections)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache (expires_at)")
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def _forget_connections(self):
+        self._local = threading.local()
+
+    def get(self, key):
+        """(직렬화된 값, 만료 시각) 반환 (없거나 만료되었으면 None)"""
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0], row[1]
+
+    def set(self, key, serialized, expires_at):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, serialized, expires_at),
+        )
+        self._writes += 1
+        # 쓰기 100회마다 만료 항목 정리 및 최대 항목 수 유지
+        if self._writes % 100 == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                " SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        conn.commit()
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM cache")
+        conn.commit()
+
+
+class ResultCache:
+    """
+    크기/TTL 제한이 있는 프로세스 내 LRU 캐시와 선택적 디스크 캐시의 2단 구성
+    값은 JSON 직렬화가 가능해야 합니다.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, ttl=3600,
+                 disk_path=None, disk_max_entries=10000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0, "bypasses": 0}
+        self._disk = None
+        if disk_path:
+            try:
+                self._disk = _DiskTier(disk_path, disk_max_entries)
+            except Exception as e:
+                logger.warning("Disk cache disabled, failed to open %s: %s", disk_path, e)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _remember(self, key, value, size, expires_at):
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._counters["evictions"] += 1
+
+    def get(self, key):
+        """(hit 여부, 값) 반환"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, size, expires_at = entry
+                if expires_at >= now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return True, value
+                del self._entries[key]
+                self._bytes -= size
+
+        if self._disk is not None:
+            try:
+                stored = self._disk.get(key)
+            except Exception as e:
+                logger.warning("Disk cache read failed: %s", e)
+                stored = None
+            if stored is not None:
+                # 메모리로 올릴 때도 디스크에 저장된 만료 시각을 그대로 사용 (읽을 때마다 TTL이 늘어나지 않도록)
+                serialized, expires_at = stored
+                value = json.loads(serialized)
+                self._remember(key, value, len(serialized), expires_at)
+                self._count("disk_hits")
+                return True, value
+
+        self._count("misses")
+        return False, None
+
+    def set(self, key, value):
+        serialized = json.dumps(value, ensure_ascii=False)
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, len(serialized), expires_at)
+        self._count("sets")
+        if self._disk is not None:
+            try:
+                self._disk.set(key, serialized, expires_at)
+            except Exception as e:
+                logger.warning("Disk cache write failed: %s", e)
+
+    def get_or_compute(self, key, compute, bypass=False, should_store=bool):
+        """
+        캐시에서 값을 찾고 없으면 compute()로 계산하여 저장
+        bypass가 참이면 조회를 건너뛰고 새로 계산한 값으로 캐시를 갱신합니다.
+        (값, 캐시 적중 여부)를 반환합니다.
+        """
+        if bypass:
+            self._count("bypasses")
+        else:
+            hit, value = self.get(key)
+            if hit:
+                return value, True
+
+        value = compute()
+        if should_store(value):
+            self.set(key, value)
+        return value, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        stats["disk_enabled"] = self._disk is not None
+        return stats
+
+
+def create_result_cache():
+    """환경 변수 설정으로 결과 캐시 생성 (RESULT_CACHE_DB 지정 시 디스크 캐시 사용)"""
+    return ResultCache(
+        max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256")),
+        max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        ttl=int(os.getenv("RESULT_CACHE_TTL", "86400")),
+        disk_path=os.getenv("RESULT_CACHE_DB") or None,
+    )
@@ -0,0 +1,221 @@
+import json
+import logging
+import re
+
+from pydantic import ValidationError
+from models.card_news import Card
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 줄 머리의 '카드 1:', '카드 2:' 등의 카드 구분 패턴 (나머지는 같은 줄의 내용)
+# 콜론이 있어야 헤더로 보므로 '카드 5장으로 구성된 ...' 같은 설명 줄은 카드를 시작하지 않음
+CARD_HEADER_PATTERN = re.compile(r'^카드\s*\d+\s*:\s*(.*)$')
+
+# 항목 이름 -> 카드 필드
+_FIELDS = {"제목": "title", "내용": "content", "강조": "highlight", "이미지": "prompt"}
+_FIELD_PATTERN = re.compile(r'^(제목|내용|강조|이미지)\s*:\s*(.*)$')
+
+# 파싱 경로 (structured: JSON 출력, text_fallback: JSON 실패 후 텍스트 파서, text: 텍스트 출력, sample: 샘플 카드)
+PARSE_STRUCTURED = "structured"
+PARSE_TEXT_FALLBACK = "text_fallback"
+PARSE_TEXT = "text"
+PARSE_SAMPLE = "sample"
+
+
+def make_card(title, content, highlight, image="", prompt=""):
+    return {
+        "title": title,
+        "content": content,
+        "highlight": highlight,
+        "image": image,
+        "prompt": prompt
+    }
+
+
+def is_sample_cards(cards):
+    """오류 시 반환되는 샘플 카드인지 확인 (샘플 카드는 캐시하지 않음)"""
+    return not cards or all(card.get("title", "").startswith("샘플 카드") for card in cards)
+
+
+def parse_structured_cards(content):
+    """
+    구조화 출력(JSON) 응답을 Card 형식으로 검증하여 카드 목록 반환
+    JSON이 아니거나 유효한 카드가 없으면 빈 목록을 반환합니다.
+    """
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        logger.warning("Structured response is not valid JSON")
+        return []
+
+    items = data.get("cards", []) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return []
+
+    cards = []
+    for i, item in enumerate(items):
+        try:
+            card = Card.parse_obj(item)
+        except ValidationError as e:
+            logger.warning("Skipping invalid card %s: %s", i+1, e)
+            continue
+        if card.title.strip():
+            cards.append(make_card(card.title.strip(), card.content.strip(), card.highlight.strip(), "", card.prompt.strip()))
+    return cards
+
+
+def parse_cards(content):
+    """
+    LLM 텍스트 응답을 카드 목록으로 한 번에 파싱 (카드를 찾지 못하면 빈 목록)
+    """
+    parser = CardStreamParser()
+    cards = parser.feed(content or "")
+    cards.extend(parser.close())
+    return cards
+
+
+def parse_analysis_response(content, structured=False):
+    """
+    분석 응답 파싱 - 구조화 출력이면 JSON 검증, 실패하거나 텍스트 응답이면 텍스트 파서 사용
+    """
+    return parse_analysis_response_with_outcome(content, structured)[0]
+
+
+def parse_analysis_response_with_outcome(content, structured=False):
+    """분석 응답을 파싱하여 (카드 목록, 파싱 경로) 반환"""
+    if structured:
+        cards = parse_structured_cards(content)
+        if cards:
+            return cards, PARSE_STRUCTURED
+        logger.warning("Structured parsing failed, falling back to text parser")
+        return parse_cards(content), PARSE_TEXT_FALLBACK
+    return parse_cards(content), PARSE_TEXT
+
+
+class CardStreamParser:
+    """
+    텍스트 응답을 한 줄씩 처리하는 카드 파서 (상태 기계)
+    스트리밍 응답 조각을 받아 완성된 카드를 반환하며, 다음 카드가 시작되거나
+    스트림이 끝나면(close) 해당 카드를 완성된 것으로 봅니다. 항목 순서는 자유입니다.
+
+    - '카드 N:' 줄은 새 카드를 시작하고, 같은 줄의 나머지가 항목이 아니면 제목 후보로 사용
+    - '카드 N:' 없이 '제목:'이 다시 나오면 새 카드로 처리
+    - 항목 이름이 없는 줄은 이미지 항목 뒤면 이미지 프롬프트에, 그 외에는 내용에 이어 붙임
+    - 제목이 없는 카드는 버림
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._buffer = ""
+        self._emitted = 0
+        self._reset_card()
+
+    @property
+    def text(self):
+        """지금까지 받은 전체 응답"""
+        return "".join(self._chunks)
+
+    @property
+    def emitted(self):
+        return self._emitted
+
+    def _reset_card(self):
+        self._title = ""
+        self._header_title = ""
+        self._content = []
+        self._highlight = ""
+        self._prompt = ""
+        self._field = None
+        self._done = False
+
+    def _finish_card(self):
+        card = None
+        title = self._title or self._header_title
+        if title and not self._done:
+            card = make_card(title, "\n".join(self._content).strip(), self._highlight, "", self._prompt)
+            self._emitted += 1
+        self._done = True
+        return card
+
+    def _start_card(self, cards):
+        card = self._finish_card()
+        if card:
+            cards.append(card)
+        self._reset_card()
+
+    def _process_line(self, line):
+        cards = []
+        line = line.strip()
+        if not line:
+            return cards
+
+        header = CARD_HEADER_PATTERN.match(line)
+        if header:
+            # 새 카드 시작 - 이전 카드 마무리
+            self._start_card(cards)
+            line = header.group(1).strip()
+            if not line:
+                return cards
+            if not _FIELD_PATTERN.match(line):
+                self._header_title = line.rstrip(":").strip()
+                return cards
+
+        field = _FIELD_PATTERN.match(line)
+        if field is None:
+            # '카드'로 시작하는 설명 줄은 기존 파서와 같이 무시
+            if self._done or line.startswith("카드"):
+                return cards
+            if self._field == "prompt":
+                # 여러 줄로 이어지는 이미지 프롬프트
+                self._prompt = f"{self._prompt} {line}".strip()
+            else:
+                self._content.append(line)
+            return cards
+
+        name, value = _FIELDS[field.group(1)], field.group(2).strip()
+        if name == "title" and (self._title or self._done):
+            # 헤더 없이 다음 카드의 제목이 나온 경우
+            self._start_card(cards)
+        if self._done:
+            return cards
+
+        self._field = name
+        if name == "title":
+            self._title = value
+        elif name == "content":
+            self._content.append(value)
+        elif name == "highlight":
+            self._highlight = value
+        else:
+            self._prompt = value
+        return cards
+
+    def feed(self, chunk):
+        """응답 조각을 추가하고 새로 완성된 카드 목록을 반환"""
+        if not chunk:
+            return []
+        self._chunks.append(chunk)
+        self._buffer += chunk
+
+        cards = []
+        start = 0
+        end = self._buffer.find("\n")
+        while end != -1:
+            cards.extend(self._process_line(self._buffer[start:end]))
+            start = end + 1
+            end = self._buffer.find("\n", start)
+        self._buffer = self._buffer[start:]
+        return cards
+
+    def close(self):
+        """스트림 종료 시 남은 카드를 반환"""
+        cards = []
+        if self._buffer:
+            cards.extend(self._process_line(self._buffer))
+            self._buffer = ""
+
+        card = self._finish_card()
+        if card:
+            cards.append(card)
+        return cards
@@ -0,0 +1,175 @@
+import codecs
+import hashlib
+import logging
+import re
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from services.prompts import estimate_tokens
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 인코딩 판별에 사용할 앞부분 크기
+SNIFF_BYTES = 64 * 1024
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# 빈 줄 기준 문단 구분
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+
+class UploadTooLargeError(Exception):
+    """업로드 크기가 제한을 넘은 경우"""
+
+
+def detect_encoding(sample):
+    """
+    파일 앞부분으로 인코딩 판별
+    BOM이 있으면 그에 따르고, UTF-8로 해석되지 않으면 한국어 문서에 흔한 CP949(EUC-KR 상위 호환)로 간주합니다.
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    try:
+        sample.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        # 샘플 끝에서 멀티바이트 문자가 잘린 경우는 UTF-8로 인정
+        if e.reason == "unexpected end of data" and e.start >= len(sample) - 3:
+            return "utf-8"
+    return "cp949"
+
+
+def hash_stream(stream, max_bytes, chunk_size=SNIFF_BYTES):
+    """
+    스트림 전체의 SHA-256과 앞부분 샘플을 일정한 메모리로 계산 (크기 제한 검사 포함)
+    계산 후 스트림을 처음 위치로 되돌립니다.
+    """
+    digest = hashlib.sha256()
+    sample = b""
+    total = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadTooLargeError(f"File is too large (max {max_bytes} bytes)")
+        if len(sample) < SNIFF_BYTES:
+            sample += chunk[:SNIFF_BYTES - len(sample)]
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest(), sample, total
+
+
+def iter_decoded_text(stream, encoding, chunk_size=SNIFF_BYTES):
+    """바이트 스트림을 조각 단위로 디코딩하여 텍스트 조각을 반환"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    carry = ""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        text = carry + decoder.decode(chunk)
+        # 조각 끝의 \r은 다음 조각의 \n과 이어질 수 있으므로 보류
+        carry = "\r" if text.endswith("\r") else ""
+        text = text[:len(text) - len(carry)]
+        if text:
+            yield text.replace("\r\n", "\n")
+    tail = carry + decoder.decode(b"", final=True)
+    if tail:
+        yield tail.replace("\r\n", "\n")
+
+
+def _split_oversized(paragraph, max_tokens):
+    """한 문단이 섹션 크기를 넘으면 문장/글자 단위로 나눔"""
+    pieces = []
+    current = ""
+    for sentence in re.split(r'(?<=[.!?。])\s+|\n', paragraph):
+        if not sentence:
+            continue
+        while estimate_tokens(sentence) > max_tokens:
+            # 문장 하나가 너무 길면 글자 수로 자름 (한글 1자 ≈ 1토큰으로 보수적으로 계산)
+            pieces.append(sentence[:max_tokens])
+            sentence = sentence[max_tokens:]
+        if current and estimate_tokens(current) + estimate_tokens(sentence) > max_tokens:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def iter_sections(text_chunks, max_tokens):
+    """
+    텍스트 조각 스트림을 문단 경계를 기준으로 토큰 수 제한 이내의 섹션으로 묶어 반환
+    한 번에 최대 한 섹션 분량만 메모리에 유지합니다.
+    """
+    pending = ""
+    section = []
+    section_tokens = 0
+
+    def add(paragraph):
+        nonlocal section, section_tokens
+        paragraph = paragraph.strip()
+        if not paragraph:
+            return
+        tokens = estimate_tokens(paragraph)
+        parts = [paragraph] if tokens <= max_tokens else _split_oversized(paragraph, max_tokens)
+        for part in parts:
+            part_tokens = estimate_tokens(part)
+            if section and section_tokens + part_tokens > max_tokens:
+                yield "\n\n".join(section)
+                section, section_tokens = [], 0
+            section.append(part)
+            section_tokens += part_tokens
+
+    for chunk in text_chunks:
+        pending += chunk
+        paragraphs = _PARAGRAPH_BREAK.split(pending)
+        # 마지막 문단은 다음 조각과 이어질 수 있으므로 보류
+        pending = paragraphs.pop()
+        for paragraph in paragraphs:
+            yield from add(paragraph)
+        # 문단 구분 없이 계속 이어지는 텍스트가 무한히 쌓이지 않도록 제한
+        if estimate_tokens(pending) > max_tokens * 2:
+            yield from add(pending)
+            pending = ""
+
+    yield from add(pending)
+    if section:
+        yield "\n\n".join(section)
+
+
+def map_sections(sections, fn, executor, max_in_flight):
+    """
+    섹션마다 fn을 병렬로 실행하고 결과를 섹션 순서대로 반환
+    진행 중인 작업 수를 max_in_flight로 제한하여 메모리 사용량을 일정하게 유지합니다.
+    """
+    results = {}
+    pending = {}
+    count = 0
+
+    try:
+        for index, section in enumerate(sections):
+            pending[executor.submit(fn, section, index)] = index
+            count += 1
+            if len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+
+        while pending:
+            future = next(iter(pending))
+            results[pending.pop(future)] = future.result()
+    finally:
+        # 한 섹션이 실패하면 아직 시작하지 않은 섹션은 취소 (실패한 요청에 OpenAI 호출을 쓰지 않도록)
+        for future in pending:
+            future.cancel()
+
+    return [results[index] for index in range(count)]
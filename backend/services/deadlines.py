@@ -0,0 +1,145 @@
+import contextvars
+import functools
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from services.metrics import DEADLINE_MISSES
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 클라이언트가 남은 처리 시간(초)을 보내는 헤더
+DEADLINE_HEADER = "X-Request-Timeout"
+
+REASON_TIMEOUT = "timeout"
+REASON_DISCONNECT = "disconnect"
+
+# 현재 요청의 기한 (요청 스레드/태스크에서 설정, 스레드 풀 작업에는 bind_deadline으로 전달)
+_current_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceededError(RuntimeError):
+    """요청 기한이 지났거나 클라이언트 연결이 끊겨 작업을 중단한 경우"""
+
+    def __init__(self, message, reason=REASON_TIMEOUT):
+        super().__init__(message)
+        self.reason = reason
+
+
+class Deadline:
+    """
+    요청 하나의 처리 기한
+    timeout이 None이면 시간 제한 없이 취소(cancel)만 가능하며,
+    같은 객체를 여러 스레드가 공유하므로 요청 스레드에서 취소하면 스레드 풀의 작업도 다음 확인 시점에 멈춥니다.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout if timeout is not None else None
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """클라이언트 연결이 끊긴 경우 호출"""
+        self._cancelled.set()
+
+    def wait_cancelled(self, seconds):
+        """최대 seconds 동안 기다리며 그 사이에 취소되면 바로 True 반환"""
+        return self._cancelled.wait(seconds)
+
+    def remaining(self):
+        """남은 시간 (초, 제한이 없으면 None, 취소되었으면 0)"""
+        if self.cancelled:
+            return 0.0
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def error(self, stage):
+        """기한 초과를 지표에 기록하고 던질 예외 반환"""
+        reason = REASON_DISCONNECT if self.cancelled else REASON_TIMEOUT
+        DEADLINE_MISSES.inc(stage=stage, reason=reason)
+        if reason == REASON_DISCONNECT:
+            return DeadlineExceededError(f"Client disconnected, {stage} cancelled", reason)
+        return DeadlineExceededError(f"Request deadline of {self.timeout:g}s exceeded ({stage})", reason)
+
+    def check(self, stage):
+        if self.expired:
+            raise self.error(stage)
+
+
+def current_deadline():
+    return _current_deadline.get()
+
+
+def set_deadline(deadline):
+    """현재 컨텍스트의 기한 설정 (반환한 토큰을 reset_deadline에 넘겨 복원)"""
+    return _current_deadline.set(deadline)
+
+
+def reset_deadline(token):
+    _current_deadline.reset(token)
+
+
+@contextmanager
+def request_deadline(deadline):
+    """블록 안의 OpenAI 호출에 기한 적용"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def bind_deadline(fn):
+    """현재 기한을 다른 스레드에서도 적용하도록 감싼 함수 (스레드 풀에는 컨텍스트가 전달되지 않음)"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        with request_deadline(deadline):
+            return fn(*args, **kwargs)
+    return run
+
+
+def parse_timeout(value, maximum=None):
+    """클라이언트가 보낸 제한 시간 헤더 값 (초, 잘못되었거나 없으면 None, maximum으로 상한 적용)"""
+    if value is None or value == "":
+        return None
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        logger.warning("Ignoring invalid %s header: %r", DEADLINE_HEADER, value)
+        return None
+    if not math.isfinite(timeout) or timeout <= 0:
+        return None
+    return min(timeout, maximum) if maximum else timeout
+
+
+def with_deadline(client, stage="openai"):
+    """
+    현재 요청의 남은 시간을 HTTP 타임아웃으로 적용한 OpenAI 클라이언트
+    기한이 이미 지났으면 호출하지 않고 DeadlineExceededError를 던집니다.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return client
+    remaining = deadline.remaining()
+    if remaining is None:
+        return client
+    if remaining <= 0:
+        raise deadline.error(stage)
+    return client.with_options(timeout=remaining)
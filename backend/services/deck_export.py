@@ -0,0 +1,200 @@
+import io
+import json
+import logging
+import os
+import time
+import zipfile
+from contextlib import closing
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow가 없으면 PDF 내보내기를 사용하지 않음
+    Image = None
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 이미지 복사 단위
+EXPORT_CHUNK_SIZE = 64 * 1024
+# PDF 페이지 크기 계산용 해상도 (1024px 이미지 -> 512pt 페이지)
+PDF_DPI = 144
+PDF_JPEG_QUALITY = int(os.getenv("EXPORT_PDF_JPEG_QUALITY", "88"))
+
+
+def pdf_available():
+    return Image is not None
+
+
+class _StreamSink(io.RawIOBase):
+    """
+    쓰인 바이트를 모아 두었다가 drain()으로 꺼내는 탐색 불가능한 출력 스트림
+    zipfile은 탐색할 수 없는 스트림에는 데이터 디스크립터 방식으로 기록하므로 한 번에 한 조각만 메모리에 둡니다.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _image_key(blob_store, card):
+    # 저장소 밖의 URL(만료되는 OpenAI URL 등)은 내보낼 수 없으므로 None
+    return blob_store.key_for_url(card.get("image"))
+
+
+def _card_entry(index, card):
+    return {
+        "index": index,
+        "title": card.get("title", ""),
+        "content": card.get("content", ""),
+        "highlight": card.get("highlight", ""),
+        "prompt": card.get("prompt", ""),
+    }
+
+
+def build_manifest(deck, blob_store):
+    """덱 카드 정보와 ZIP 안의 이미지 파일 이름 목록"""
+    cards = []
+    for index, card in enumerate(deck["cards"]):
+        entry = _card_entry(index, card)
+        key = _image_key(blob_store, card)
+        entry["image_file"] = f"card_{index + 1:02d}{os.path.splitext(key)[1]}" if key else None
+        cards.append(entry)
+    return {"deck_id": deck.get("deck_id"), "exported_at": time.time(), "cards": cards}
+
+
+def iter_deck_zip(deck, blob_store):
+    """
+    manifest.json과 카드 이미지를 담은 ZIP을 조각 단위로 생성
+    이미지는 이미 압축된 형식이므로 무압축(STORED)으로 복사하며, 메모리 사용량은 덱 크기와 무관합니다.
+    """
+    manifest = build_manifest(deck, blob_store)
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        manifest_bytes = json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+        archive.writestr("manifest.json", manifest_bytes, compress_type=zipfile.ZIP_DEFLATED)
+        yield sink.drain()
+
+        for card, entry in zip(deck["cards"], manifest["cards"]):
+            if not entry["image_file"]:
+                continue
+            info = zipfile.ZipInfo(entry["image_file"], date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            try:
+                with closing(blob_store.open(_image_key(blob_store, card))) as source, \
+                        archive.open(info, "w", force_zip64=True) as target:
+                    while True:
+                        chunk = source.read(EXPORT_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        yield sink.drain()
+            except Exception as e:
+                # 저장소에서 사라진 이미지는 건너뜀 (manifest에는 남음)
+                logger.warning("Skipping missing image %s: %s", entry["image_file"], e)
+            yield sink.drain()
+    yield sink.drain()
+
+
+class _PdfWriter:
+    """객체를 순서대로 내보내며 xref용 위치만 기억하는 최소 PDF 작성기"""
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets = {}
+        self.next_id = 1
+
+    def reserve(self):
+        object_id = self.next_id
+        self.next_id += 1
+        return object_id
+
+    def emit(self, data):
+        self.offset += len(data)
+        return data
+
+    def object(self, object_id, body, stream=None):
+        self.offsets[object_id] = self.offset
+        if stream is None:
+            return self.emit(f"{object_id} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+        return self.emit(
+            f"{object_id} 0 obj\n{body}\nstream\n".encode("latin-1") + stream + b"\nendstream\nendobj\n"
+        )
+
+    def trailer(self, root_id):
+        xref_offset = self.offset
+        lines = [f"xref\n0 {self.next_id}\n", "0000000000 65535 f \n"]
+        for object_id in range(1, self.next_id):
+            lines.append(f"{self.offsets.get(object_id, 0):010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {self.next_id} /Root {root_id} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        return self.emit("".join(lines).encode("latin-1"))
+
+
+def _load_jpeg(blob_store, key):
+    """저장된 이미지를 JPEG로 변환하여 (바이트, 너비, 높이) 반환"""
+    with closing(blob_store.open(key)) as source:
+        image = Image.open(io.BytesIO(source.read()))
+        image = image.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=PDF_JPEG_QUALITY)
+    return output.getvalue(), image.width, image.height
+
+
+def iter_deck_pdf(deck, blob_store):
+    """
+    카드 이미지를 한 페이지에 한 장씩 담은 PDF를 조각 단위로 생성
+    한 번에 이미지 한 장만 메모리에 올리며, 페이지 목록 객체는 마지막에 기록합니다.
+    """
+    if Image is None:
+        raise RuntimeError("PDF export requires Pillow")
+
+    writer = _PdfWriter()
+    catalog_id = writer.reserve()
+    pages_id = writer.reserve()
+    page_ids = []
+    yield writer.emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    for index, card in enumerate(deck["cards"]):
+        key = _image_key(blob_store, card)
+        if not key:
+            continue
+        try:
+            jpeg, width, height = _load_jpeg(blob_store, key)
+        except Exception as e:
+            logger.warning("Skipping image of card %s in PDF export: %s", index + 1, e)
+            continue
+
+        page_width = round(width * 72 / PDF_DPI, 2)
+        page_height = round(height * 72 / PDF_DPI, 2)
+        image_id, content_id, page_id = writer.reserve(), writer.reserve(), writer.reserve()
+        content = f"q {page_width} 0 0 {page_height} 0 0 cm /Im0 Do Q".encode("latin-1")
+
+        yield writer.object(
+            image_id,
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceRGB"
+            f" /BitsPerComponent 8 /Filter /DCTDecode /Length {len(jpeg)} >>",
+            jpeg,
+        )
+        yield writer.object(content_id, f"<< /Length {len(content)} >>", content)
+        yield writer.object(
+            page_id,
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {page_width} {page_height}]"
+            f" /Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>",
+        )
+        page_ids.append(page_id)
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    yield writer.object(pages_id, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>")
+    yield writer.object(catalog_id, f"<< /Type /Catalog /Pages {pages_id} 0 R >>")
+    yield writer.trailer(catalog_id)
@@ -0,0 +1,418 @@
+import hashlib
+import logging
+import os
+import time
+import uuid
+
+from sqlalchemy import (
+    Column, Float, ForeignKey, Index, Integer, LargeBinary, String, Text, and_, case, create_engine, event, func,
+    inspect, or_, select, update,
+)
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+
+from services.cache import make_cache_key
+from services.prompts import image_cache_key, IMAGE_TIERS, IMAGE_TIER_FINAL
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 사용자가 수정할 수 있는 카드 항목
+EDITABLE_FIELDS = ("title", "content", "highlight", "prompt")
+
+# 덱 목록 한 페이지의 최대 크기
+MAX_PAGE_SIZE = 100
+
+Base = declarative_base()
+
+
+class Deck(Base):
+    """생성된 카드뉴스 덱 (원문과 이미지 스타일)"""
+
+    __tablename__ = "decks"
+
+    id = Column(String(32), primary_key=True)
+    source_text = Column(Text, nullable=False)
+    source_hash = Column(String(64), nullable=False)
+    style = Column(Text, nullable=False, default="", server_default="")
+    background_color = Column(Text, nullable=False, default="", server_default="")
+    revision = Column(Integer, nullable=False, default=1, server_default="1")
+    created_at = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)
+    # 원문 MinHash 시그니처 (비슷한 기사 검출용, services.similarity)
+    fingerprint = Column(LargeBinary)
+
+    cards = relationship(
+        "DeckCard", order_by="DeckCard.position", lazy="selectin", cascade="all, delete-orphan",
+    )
+
+    __table_args__ = (
+        # 같은 원문으로 만든 덱 조회, 최신순 목록 페이지 조회
+        Index("ix_decks_source_hash", "source_hash"),
+        Index("ix_decks_created_at", "created_at", "id"),
+    )
+
+
+class DeckCard(Base):
+    """덱의 카드 한 장 (내용 버전, 이미지 URL과 블롭 키, 이미지 입력 해시)"""
+
+    __tablename__ = "deck_cards"
+
+    deck_id = Column(String(32), ForeignKey("decks.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    title = Column(Text, nullable=False)
+    content = Column(Text, nullable=False)
+    highlight = Column(Text, nullable=False)
+    prompt = Column(Text, nullable=False)
+    image = Column(Text, nullable=False, default="", server_default="")
+    image_blob = Column(String(128))
+    version = Column(String(16), nullable=False)
+    image_key = Column(String(128))
+    updated_at = Column(Float, nullable=False)
+
+    __table_args__ = (
+        # 블롭을 참조하는 카드 조회 (저장소 정리 시 사용 중인 이미지 확인)
+        Index("ix_deck_cards_image_blob", "image_blob"),
+    )
+
+
+class DeckNotFoundError(Exception):
+    """덱 또는 카드가 없는 경우"""
+
+
+class DeckConflictError(Exception):
+    """다른 요청이 먼저 덱을 수정하여 revision이 맞지 않는 경우"""
+
+
+def source_hash(source_text):
+    """덱 원문의 SHA-256 해시 (같은 원문으로 만든 덱 조회용)"""
+    return hashlib.sha256((source_text or "").encode("utf-8")).hexdigest()
+
+
+def card_version(card):
+    """카드 내용(제목/내용/강조/이미지 프롬프트) 기반 버전 해시"""
+    key = make_cache_key("card", **{field: card.get(field, "") for field in EDITABLE_FIELDS})
+    return key.split(":", 1)[1][:16]
+
+
+def card_image_key(card, style="", background_color="", tier=IMAGE_TIER_FINAL):
+    """카드 이미지가 의존하는 입력의 해시 (이미지 캐시 키와 동일)"""
+    return image_cache_key(
+        card.get("prompt", ""), card.get("title", ""), card.get("content", ""),
+        card.get("highlight", ""), style, background_color, tier,
+    )
+
+
+def card_image_tier(card, image_key, style="", background_color=""):
+    """저장된 이미지가 현재 카드 내용으로 만든 것이면 그 품질 등급, 아니면 None"""
+    for tier in IMAGE_TIERS:
+        if image_key == card_image_key(card, style, background_color, tier):
+            return tier
+    return None
+
+
+def encode_cursor(created_at, deck_id):
+    """목록 다음 페이지 커서 (마지막 덱의 생성 시각과 ID)"""
+    return f"{created_at!r}:{deck_id}"
+
+
+def decode_cursor(cursor):
+    """커서를 (생성 시각, 덱 ID)로 변환 (형식이 잘못되면 ValueError)"""
+    created_at, _, deck_id = cursor.partition(":")
+    if not deck_id:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return float(created_at), deck_id
+
+
+def _sqlite_engine_setup(engine):
+    """
+    SQLite 연결 설정: WAL 모드, 그리고 쓰기 트랜잭션은 BEGIN IMMEDIATE로 시작
+    pysqlite는 첫 쓰기 때까지 트랜잭션 시작을 미루므로, 읽은 revision을 확인하고 쓰는 사이에
+    다른 워커가 끼어들지 않도록 트랜잭션을 직접 시작합니다.
+    """
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, _):
+        dbapi_connection.isolation_level = None
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE" if connection.get_execution_options().get("immediate") else "BEGIN")
+
+
+class DeckStore:
+    """
+    생성된 카드뉴스 덱을 SQLAlchemy로 카드 단위 저장 (기본 SQLite, DECK_STORE_URL로 다른 DB 사용 가능)
+    카드마다 내용 버전과 이미지가 만들어진 입력 해시(image_key), 이미지 블롭 키를 보관하여
+    수정된 카드만 다시 생성하고, 새로고침이나 워커 재시작 후에도 덱을 다시 불러올 수 있게 합니다.
+    """
+
+    def __init__(self, url, blob_store=None, echo=False):
+        self.url = url
+        self.blob_store = blob_store
+        connect_args = {"timeout": 10} if url.startswith("sqlite") else {}
+        self.engine = create_engine(url, echo=echo, pool_pre_ping=True, connect_args=connect_args)
+        if self.engine.dialect.name == "sqlite":
+            _sqlite_engine_setup(self.engine)
+
+        # 읽기 세션과 revision을 확인하고 쓰는 세션 (쓰기 세션은 행 잠금/BEGIN IMMEDIATE)
+        self._reader = sessionmaker(self.engine, expire_on_commit=False)
+        self._writer = sessionmaker(self.engine.execution_options(immediate=True), expire_on_commit=False)
+
+        self._create_schema()
+        # 스키마 생성에 쓴 연결은 닫고, fork된 워커는 부모의 연결 풀을 버리고 새로 연결
+        self.engine.dispose()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=lambda: self.engine.dispose(close=False))
+
+    def _create_schema(self):
+        """테이블과 인덱스 생성 (이전 버전 DB 파일에는 없는 열과 인덱스 추가, 추가되는 열은 모두 NULL 허용)"""
+        Base.metadata.create_all(self.engine)
+        inspector = inspect(self.engine)
+        with self.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                existing = {column["name"] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing:
+                        column_type = column.type.compile(dialect=self.engine.dialect)
+                        connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                        logger.info("Added %s.%s column", table.name, column.name)
+                for index in table.indexes:
+                    index.create(connection, checkfirst=True)
+
+    def ping(self):
+        """DB 연결 확인 (준비 상태 검사용)"""
+        with self.engine.connect() as connection:
+            connection.exec_driver_sql("SELECT 1")
+
+    def _blob_key(self, image_url):
+        # 저장소가 발급한 이미지 URL이면 블롭 키 (외부 URL이면 None)
+        if not image_url or self.blob_store is None:
+            return None
+        return self.blob_store.key_for_url(image_url)
+
+    def create(self, source_text, cards, style="", background_color="", fingerprint=None):
+        deck_id = uuid.uuid4().hex
+        now = time.time()
+        deck = Deck(
+            id=deck_id, source_text=source_text or "", source_hash=source_hash(source_text),
+            style=style, background_color=background_color, revision=1, created_at=now, updated_at=now,
+            fingerprint=fingerprint,
+            cards=[
+                DeckCard(
+                    position=position, title=card.get("title", ""), content=card.get("content", ""),
+                    highlight=card.get("highlight", ""), prompt=card.get("prompt", ""),
+                    image=card.get("image", ""), image_blob=self._blob_key(card.get("image")),
+                    version=card_version(card),
+                    image_key=card_image_key(card, style, background_color, card.get("image_tier") or IMAGE_TIER_FINAL)
+                    if card.get("image") else None,
+                    updated_at=now,
+                )
+                for position, card in enumerate(cards)
+            ],
+        )
+        with self._writer.begin() as session:
+            session.add(deck)
+        logger.info("Created deck %s with %s cards", deck_id, len(cards))
+        return deck_id
+
+    def get(self, deck_id, include_source=False):
+        with self._reader() as session:
+            deck = session.get(Deck, deck_id)
+            if deck is None:
+                return None
+            result = {
+                "deck_id": deck.id,
+                "revision": deck.revision,
+                "style": deck.style,
+                "backgroundColor": deck.background_color,
+                "source_hash": deck.source_hash,
+                "created_at": deck.created_at,
+                "updated_at": deck.updated_at,
+                "cards": [self._card(row, deck.style, deck.background_color) for row in deck.cards],
+            }
+            if include_source:
+                result["source_text"] = deck.source_text
+        return result
+
+    @staticmethod
+    def _card(row, style, background_color):
+        card = {field: getattr(row, field) for field in EDITABLE_FIELDS}
+        card["index"] = row.position
+        card["image"] = row.image
+        card["version"] = row.version
+        card["image_tier"] = card_image_tier(card, row.image_key, style, background_color) if row.image else None
+        # 이미지가 없거나 이미지 생성 이후 내용/스타일이 바뀐 카드 (draft 이미지는 최신이면 stale 아님)
+        card["image_stale"] = card["image_tier"] is None
+        return card
+
+    def list_decks(self, limit=20, cursor=None, source_text=None):
+        """
+        최신순 덱 목록 한 페이지와 다음 페이지 커서 반환 (마지막 페이지면 커서는 None)
+        생성 시각 인덱스를 따라 커서 이후만 읽으므로 페이지 깊이와 관계없이 일정한 시간이 걸리며,
+        source_text를 지정하면 같은 원문으로 만든 덱만 조회합니다.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        query = select(
+            Deck.id, Deck.revision, Deck.style, Deck.background_color, Deck.created_at, Deck.updated_at,
+        ).order_by(Deck.created_at.desc(), Deck.id.desc()).limit(limit + 1)
+        if cursor:
+            created_at, deck_id = decode_cursor(cursor)
+            query = query.where(or_(
+                Deck.created_at < created_at, and_(Deck.created_at == created_at, Deck.id < deck_id),
+            ))
+        if source_text is not None:
+            query = query.where(Deck.source_hash == source_hash(source_text))
+
+        with self._reader() as session:
+            rows = session.execute(query).all()
+            page = rows[:limit]
+            deck_ids = [row.id for row in page]
+            counts = dict(session.execute(
+                select(DeckCard.deck_id, func.count()).where(DeckCard.deck_id.in_(deck_ids)).group_by(DeckCard.deck_id)
+            ).all()) if deck_ids else {}
+            covers = {
+                row.deck_id: row for row in session.execute(
+                    select(DeckCard.deck_id, DeckCard.title, DeckCard.image)
+                    .where(DeckCard.deck_id.in_(deck_ids), DeckCard.position == 0)
+                )
+            } if deck_ids else {}
+
+        decks = []
+        for row in page:
+            cover = covers.get(row.id)
+            decks.append({
+                "deck_id": row.id,
+                "revision": row.revision,
+                "style": row.style,
+                "backgroundColor": row.background_color,
+                "created_at": row.created_at,
+                "updated_at": row.updated_at,
+                "card_count": counts.get(row.id, 0),
+                "title": cover.title if cover else "",
+                "image": cover.image if cover else "",
+            })
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id) if len(rows) > limit else None
+        return decks, next_cursor
+
+    def list_fingerprints(self, since):
+        """
+        since 이후 생성된 덱의 (ID, 생성 시각, 시그니처, 원문) 목록 (생성 순서)
+        원문은 시그니처가 아직 없는 덱에만 채워 반환합니다.
+        """
+        query = (
+            select(
+                Deck.id, Deck.created_at, Deck.fingerprint,
+                case((Deck.fingerprint.is_(None), Deck.source_text), else_=None),
+            )
+            .where(Deck.created_at > since)
+            .order_by(Deck.created_at, Deck.id)
+        )
+        with self._reader() as session:
+            return [tuple(row) for row in session.execute(query)]
+
+    def set_fingerprints(self, fingerprints):
+        """덱 ID별 원문 시그니처 저장 (시그니처 저장 이전에 만든 덱 보완)"""
+        with self._writer.begin() as session:
+            for deck_id, fingerprint in fingerprints.items():
+                session.execute(update(Deck).where(Deck.id == deck_id).values(fingerprint=fingerprint))
+
+    def update_card(self, deck_id, index, fields, expected_revision=None):
+        """
+        카드 항목 수정 후 (덱, 카드 내용 변경 여부) 반환
+        expected_revision을 지정하면 그 사이 다른 수정이 있었을 때 DeckConflictError를 발생시킵니다.
+        """
+        updates = {field: str(fields[field]) for field in EDITABLE_FIELDS if fields.get(field) is not None}
+        with self._writer.begin() as session:
+            deck = session.get(Deck, deck_id, with_for_update=True)
+            row = session.get(DeckCard, (deck_id, index))
+            if deck is None or row is None:
+                raise DeckNotFoundError(f"Card {index} of deck {deck_id} not found")
+            if expected_revision is not None and int(expected_revision) != deck.revision:
+                raise DeckConflictError(f"Deck {deck_id} was modified (revision {deck.revision})")
+
+            card = {field: getattr(row, field) for field in EDITABLE_FIELDS}
+            card.update(updates)
+            version = card_version(card)
+            changed = version != row.version
+            if changed:
+                now = time.time()
+                for field in EDITABLE_FIELDS:
+                    setattr(row, field, card[field])
+                row.version = version
+                row.updated_at = now
+                deck.revision += 1
+                deck.updated_at = now
+        return self.get(deck_id), changed
+
+    def set_card_image(self, deck_id, index, image_url, version, tier=IMAGE_TIER_FINAL):
+        """
+        카드 이미지 저장 (이미지 생성 중 카드가 수정되었으면 저장하지 않고 False 반환)
+        """
+        with self._writer.begin() as session:
+            deck = session.get(Deck, deck_id, with_for_update=True)
+            row = session.get(DeckCard, (deck_id, index))
+            if deck is None or row is None:
+                raise DeckNotFoundError(f"Card {index} of deck {deck_id} not found")
+            if row.version != version:
+                return False
+
+            card = {field: getattr(row, field) for field in EDITABLE_FIELDS}
+            now = time.time()
+            row.image = image_url
+            row.image_blob = self._blob_key(image_url)
+            row.image_key = card_image_key(card, deck.style, deck.background_color, tier)
+            row.updated_at = now
+            deck.revision += 1
+            deck.updated_at = now
+            return True
+
+    def attach_image(self, deck_id, index, image_url, tier=IMAGE_TIER_FINAL):
+        """
+        덱 밖에서 생성한 카드 이미지를 현재 카드의 tier 등급 이미지로 연결
+        클라이언트는 추가 요청사항을 덧붙인 내용으로 이미지를 만들므로 요청 값 대신 저장된 카드 내용과
+        덱 스타일로 image_key를 계산하며, 이후 카드나 스타일이 바뀌면 image_stale로 표시됩니다.
+        """
+        now = time.time()
+        with self._writer.begin() as session:
+            deck = session.get(Deck, deck_id)
+            row = session.get(DeckCard, (deck_id, index))
+            if deck is None or row is None:
+                raise DeckNotFoundError(f"Card {index} of deck {deck_id} not found")
+
+            card = {field: getattr(row, field) for field in EDITABLE_FIELDS}
+            row.image = image_url
+            row.image_blob = self._blob_key(image_url)
+            row.image_key = card_image_key(card, deck.style, deck.background_color, tier)
+            row.updated_at = now
+            deck.revision += 1
+            deck.updated_at = now
+
+    def set_style(self, deck_id, style, background_color):
+        """덱 이미지 스타일 변경 (모든 카드 이미지가 다시 생성 대상이 됨)"""
+        with self._writer.begin() as session:
+            result = session.execute(
+                update(Deck)
+                .where(Deck.id == deck_id, or_(Deck.style != style, Deck.background_color != background_color))
+                .values(
+                    style=style, background_color=background_color,
+                    revision=Deck.revision + 1, updated_at=time.time(),
+                )
+            )
+        return result.rowcount > 0
+
+
+def create_deck_store(blob_store=None):
+    """
+    환경 변수 설정으로 덱 저장소 생성
+    DECK_STORE_URL(SQLAlchemy URL)이 없으면 DECK_STORE_DB 경로(기본 data/decks.db)의 SQLite를 사용합니다.
+    """
+    url = os.getenv("DECK_STORE_URL")
+    if not url:
+        db_path = os.getenv("DECK_STORE_DB") or os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "decks.db"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        url = f"sqlite:///{os.path.abspath(db_path)}"
+    return DeckStore(url, blob_store=blob_store, echo=os.getenv("DECK_STORE_ECHO", "").lower() in ("1", "true"))
@@ -0,0 +1,344 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 작업 상태
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+
+class QueueFullError(Exception):
+    """대기 중인 작업 수가 최대치를 넘은 경우"""
+
+
+class JobQueue:
+    """
+    SQLite에 작업을 저장하는 로컬 작업 큐
+    작업은 스레드 워커가 처리하며, 프로세스가 재시작되어도 대기/실행 중이던 작업을 다시 처리합니다.
+    여러 gunicorn 워커가 같은 DB 파일을 공유하면 작업은 한 워커에서만 실행됩니다.
+
+    실행 중인 작업에는 처리하는 프로세스의 pid와 주기적인 heartbeat를 기록하며, 워커는 대기 중에
+    pid가 종료된 작업, heartbeat가 끊긴 작업, 같은 pid의 이전 프로세스가 남긴 작업을 다시 대기열에 넣습니다.
+    """
+
+    def __init__(self, db_path, workers=2, max_depth=100, poll_interval=1.0, stale_after=60, heartbeat_interval=10):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_depth = max_depth
+        self.poll_interval = poll_interval
+        # 이 시간 이상 heartbeat가 없는 running 작업은 중단된 것으로 보고 다시 대기열에 넣음
+        self.stale_after = stale_after
+        self.heartbeat_interval = heartbeat_interval
+        self._handlers = {}
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._started_at = None
+        self._requeued_at = 0.0
+        self._start_lock = threading.Lock()
+        self._requeue_lock = threading.Lock()
+        # fork된 워커에는 부모의 스레드와 SQLite 연결을 쓰지 않도록 새로 시작
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " result TEXT,"
+            " error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL,"
+            " owner_pid INTEGER,"
+            " heartbeat_at REAL)"
+        )
+        # 이전 버전에서 만든 DB에 작업 소유자 컬럼 추가
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in (("owner_pid", "INTEGER"), ("heartbeat_at", "REAL")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)")
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def register(self, kind, handler):
+        """작업 종류별 처리 함수 등록 (handler(payload) -> JSON 직렬화 가능한 결과)"""
+        self._handlers[kind] = handler
+
+    def start(self):
+        """워커 스레드 시작 (fork 이후 호출되어도 해당 프로세스에서 새로 시작)"""
+        if self._pid == os.getpid() and self._threads:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._threads:
+                return
+            self._pid = os.getpid()
+            self._started_at = time.time()
+            self._local = threading.local()
+            self._threads = []
+            self._requeue_stale()
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            heartbeat.start()
+            logger.info("Job queue started with %s workers (pid %s)", self.workers, self._pid)
+
+    def _after_fork(self):
+        self._local = threading.local()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._requeue_lock = threading.Lock()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def _is_orphaned(self, row, now):
+        """실행 중으로 기록되었지만 처리하는 프로세스가 없는 작업인지"""
+        seen_at = row["heartbeat_at"] or row["started_at"]
+        if seen_at is None or seen_at < now - self.stale_after:
+            return True
+        owner = row["owner_pid"]
+        if owner is None:
+            return False
+        if owner == os.getpid():
+            # 같은 pid로 다시 시작된 프로세스(컨테이너 재시작 등)는 이전 실행이 남긴 작업을 이어받음
+            return row["started_at"] < self._started_at
+        return not _process_alive(owner)
+
+    def _requeue_stale(self):
+        """중단된 running 작업을 다시 대기열에 넣고 넣은 작업 수 반환"""
+        conn = self._connect()
+        now = time.time()
+        rows = conn.execute(
+            "SELECT id, owner_pid, started_at, heartbeat_at FROM jobs WHERE status = ?", (RUNNING,)
+        ).fetchall()
+        requeued = 0
+        for row in rows:
+            if not self._is_orphaned(row, now):
+                continue
+            # 확인하는 사이에 끝났거나 다른 워커가 가져간 작업은 건드리지 않음
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL, owner_pid = NULL, heartbeat_at = NULL"
+                " WHERE id = ? AND status = ? AND owner_pid IS ? AND started_at IS ?",
+                (QUEUED, row["id"], RUNNING, row["owner_pid"], row["started_at"]),
+            )
+            requeued += cursor.rowcount
+        if requeued:
+            logger.warning("Requeued %s interrupted jobs", requeued)
+            self._wakeup.set()
+        return requeued
+
+    def _maybe_requeue_stale(self):
+        """대기 중인 워커 중 하나가 heartbeat 주기마다 중단된 작업 확인"""
+        now = time.time()
+        if now - self._requeued_at < self.heartbeat_interval or not self._requeue_lock.acquire(blocking=False):
+            return
+        try:
+            self._requeued_at = now
+            self._requeue_stale()
+        except Exception as e:
+            logger.error("Failed to requeue interrupted jobs: %s", e)
+        finally:
+            self._requeue_lock.release()
+
+    def _heartbeat(self):
+        """이 프로세스가 실행 중인 작업의 heartbeat 갱신"""
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self._connect().execute(
+                    "UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND owner_pid = ? AND started_at >= ?",
+                    (time.time(), RUNNING, os.getpid(), self._started_at),
+                )
+            except Exception as e:
+                logger.error("Failed to record job heartbeat: %s", e)
+
+    def depth(self):
+        row = self._connect().execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()
+        return row[0]
+
+    def enqueue(self, kind, payload):
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self.depth() >= self.max_depth:
+            raise QueueFullError(f"Job queue is full (max {self.max_depth})")
+
+        job_id = uuid.uuid4().hex
+        self._connect().execute(
+            "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload, ensure_ascii=False), QUEUED, time.time()),
+        )
+        self.start()
+        self._wakeup.set()
+        logger.info("Enqueued %s job %s", kind, job_id)
+        return job_id
+
+    def _claim(self):
+        """대기 중인 가장 오래된 작업을 원자적으로 가져옴"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                now = time.time()
+                conn.execute(
+                    "UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ?, owner_pid = ?,"
+                    " attempts = attempts + 1 WHERE id = ?",
+                    (RUNNING, now, now, os.getpid(), row["id"]),
+                )
+            conn.execute("COMMIT")
+            return row
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _finish(self, job_id, attempt, status, result=None, error=None):
+        """
+        실행 결과 기록 (attempt번째 실행이 아직 작업을 가지고 있을 때만)
+        실행 중에 중단된 작업으로 판단되어 다시 대기열에 들어간 뒤 다른 워커가 가져갔다면 결과를 버립니다.
+        """
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?"
+            " WHERE id = ? AND status = ? AND attempts = ?",
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error, time.time(),
+             job_id, RUNNING, attempt),
+        )
+        if cursor.rowcount == 0:
+            logger.warning("Job %s was requeued while attempt %s was running, discarding its result", job_id, attempt)
+        return cursor.rowcount > 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                row = self._claim()
+            except Exception as e:
+                logger.error("Failed to claim job: %s", e)
+                row = None
+
+            if row is None:
+                self._maybe_requeue_stale()
+                # 새 작업 알림 또는 다른 프로세스가 넣은 작업을 위해 주기적으로 확인
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            # _claim은 갱신 전 행을 반환하므로 이번 실행의 시도 번호는 attempts + 1
+            job_id, kind, attempt = row["id"], row["kind"], row["attempts"] + 1
+            logger.info("Running %s job %s", kind, job_id)
+            try:
+                result = self._handlers[kind](json.loads(row["payload"]))
+                if self._finish(job_id, attempt, SUCCEEDED, result=result):
+                    logger.info("Job %s succeeded", job_id)
+            except Exception as e:
+                logger.error("Job %s failed: %s", job_id, e)
+                self._finish(job_id, attempt, FAILED, error=str(e))
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job = {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+        # 작업별 소요 시간 (대기 시간, 실행 시간)
+        if row["started_at"]:
+            job["queue_seconds"] = round(row["started_at"] - row["created_at"], 3)
+        if row["finished_at"] and row["started_at"]:
+            job["run_seconds"] = round(row["finished_at"] - row["started_at"], 3)
+        return job
+
+    def wait(self, job_id, timeout):
+        """작업이 끝나거나 timeout이 지날 때까지 대기 (long polling용)"""
+        deadline = time.time() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in FINISHED_STATES or time.time() >= deadline:
+                return job
+            time.sleep(min(0.5, max(0.0, deadline - time.time())))
+
+    def stats(self):
+        conn = self._connect()
+        counts = {status: 0 for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+        for row in conn.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status"):
+            counts[row["status"]] = row["count"]
+
+        # 최근 완료된 작업 100개의 평균 대기/실행 시간
+        timing = conn.execute(
+            "SELECT AVG(started_at - created_at), AVG(finished_at - started_at), MAX(finished_at - started_at)"
+            " FROM (SELECT * FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT 100)"
+        ).fetchone()
+
+        return {
+            "workers": self.workers,
+            "alive_workers": sum(1 for t in self._threads if t.is_alive()) if self._pid == os.getpid() else 0,
+            "max_depth": self.max_depth,
+            "depth": counts[QUEUED],
+            "counts": counts,
+            "avg_queue_seconds": round(timing[0], 3) if timing[0] is not None else None,
+            "avg_run_seconds": round(timing[1], 3) if timing[1] is not None else None,
+            "max_run_seconds": round(timing[2], 3) if timing[2] is not None else None,
+        }
+
+
+def _process_alive(pid):
+    """같은 호스트에서 pid의 프로세스가 실행 중인지 (권한이 없어 확인할 수 없으면 실행 중으로 봄)"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def create_job_queue():
+    """환경 변수 설정으로 작업 큐 생성"""
+    db_path = os.getenv("JOB_QUEUE_DB") or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "jobs.db"
+    )
+    return JobQueue(
+        db_path,
+        workers=int(os.getenv("JOB_WORKERS", "2")),
+        max_depth=int(os.getenv("JOB_MAX_DEPTH", "100")),
+        stale_after=float(os.getenv("JOB_STALE_SECONDS", "60")),
+        heartbeat_interval=float(os.getenv("JOB_HEARTBEAT_SECONDS", "10")),
+    )
@@ -0,0 +1,156 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# 로그 모드 (development: 사람이 읽는 형식 + DEBUG, production: 큐 기반 비동기 JSON 로그 + INFO)
+LOG_MODE = os.getenv("LOG_MODE", "development").lower()
+IS_PRODUCTION = LOG_MODE == "production"
+# 지정하지 않으면 production은 INFO, development는 각 앱의 기본 레벨 사용
+LOG_LEVEL = os.getenv("LOG_LEVEL", "").upper() or None
+# 큰 페이로드(입력 텍스트, LLM 응답, 프롬프트)를 기록할 비율
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01" if IS_PRODUCTION else "1.0"))
+# 미리보기/페이로드 로그의 최대 길이
+LOG_PREVIEW_CHARS = int(os.getenv("LOG_PREVIEW_CHARS", "100"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+# 로그 큐 최대 길이 (가득 차면 요청 스레드를 막지 않고 버림)
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# 기본 LogRecord 속성 (그 외 속성은 extra로 전달된 값으로 보고 JSON에 포함)
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+_dropped = 0
+
+
+class JsonFormatter(logging.Formatter):
+    """한 줄에 하나의 JSON 객체로 로그 기록"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+# 리스너 스레드에서 나중에 포맷팅해도 값이 바뀌지 않는 로그 인자 타입
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    요청 스레드에서는 레코드를 큐에 넣기만 하는 핸들러
+    같은 프로세스 안의 큐이므로 메시지 포맷팅(%-인자 병합)과 JSON 직렬화를 리스너 스레드로 미룹니다.
+    다만 dict/list 같은 변경 가능한 인자는 그 사이 값이 바뀔 수 있으므로 큐에 넣기 전에 병합합니다.
+    """
+
+    def prepare(self, record):
+        args = record.args
+        mutable_args = args and not (isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args))
+        if mutable_args or not isinstance(record.msg, str):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped += 1
+
+
+def configure_logging(default_level="DEBUG"):
+    """LOG_MODE에 따라 루트 로거 설정 (여러 번 호출해도 한 번만 적용)"""
+    global _listener
+    root = logging.getLogger()
+    if getattr(root, "_newscard_configured", False):
+        return
+    root._newscard_configured = True
+    level = LOG_LEVEL or ("INFO" if IS_PRODUCTION else default_level)
+    root.setLevel(level)
+
+    if not IS_PRODUCTION:
+        logging.basicConfig(level=level, format=TEXT_FORMAT)
+        return
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+    root.addHandler(NonBlockingQueueHandler(log_queue))
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    # gunicorn --preload 등으로 fork된 워커에는 리스너 스레드가 없으므로 새로 시작
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_listener)
+
+
+def _restart_listener():
+    if _listener is not None:
+        _listener._thread = None
+        _listener.start()
+
+
+def stop_logging():
+    """남은 로그를 모두 기록하고 리스너 종료"""
+    global _listener
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+    _listener = None
+
+
+def dropped_log_records():
+    return _dropped
+
+
+def preview(text, limit=None):
+    """로그용 텍스트 미리보기 (길이 제한, 줄바꿈 제거)"""
+    if text is None:
+        return ""
+    limit = limit or LOG_PREVIEW_CHARS
+    text = str(text)
+    if len(text) <= limit:
+        return text.replace("\n", " ")
+    return f"{text[:limit].replace(chr(10), ' ')}...(+{len(text) - limit} chars)"
+
+
+def should_log_payload(logger, level=logging.DEBUG):
+    """큰 페이로드 로그를 남길지 결정 (레벨 확인 후 샘플링)"""
+    return logger.isEnabledFor(level) and (LOG_PAYLOAD_SAMPLE_RATE >= 1 or random.random() < LOG_PAYLOAD_SAMPLE_RATE)
+
+
+def summarize_payload(data):
+    """요청 본문을 로그용으로 요약 (긴 문자열은 길이만, 목록은 개수만 기록)"""
+    if not isinstance(data, dict):
+        return type(data).__name__
+    summary = {}
+    for key, value in data.items():
+        if isinstance(value, str):
+            summary[key] = value if len(value) <= 40 else f"<{len(value)} chars>"
+        elif isinstance(value, (list, dict)):
+            summary[key] = f"<{type(value).__name__} of {len(value)}>"
+        else:
+            summary[key] = value
+    return summary
+
@@ -0,0 +1,224 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 기본 지연 시간 버킷 (초) - OpenAI 호출은 수십 초까지 걸리므로 상한을 넉넉히 둠
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return str(int(value))
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """라벨별로 누적되는 카운터"""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, "") for name in self.labelnames), 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram:
+    """라벨별 누적 버킷 히스토그램"""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {}  # key -> [버킷별 개수..., 합계, 개수]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """with 블록의 실행 시간을 기록"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for index, bound in enumerate(self.buckets):
+                cumulative += state[index]
+                le = 'le="' + _format_value(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+
+class Gauge:
+    """스크레이프 시점에 콜백으로 값을 읽는 게이지 (콜백은 숫자 또는 {라벨 값: 숫자} 반환)"""
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, callback, labelname=None):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelname = labelname
+
+    def render(self):
+        try:
+            value = self.callback()
+        except Exception as e:
+            logger.warning("Failed to collect gauge %s: %s", self.name, e)
+            return []
+        if isinstance(value, dict):
+            return [
+                f"{self.name}{_format_labels((self.labelname,), (label,))} {_format_value(v)}"
+                for label, v in sorted(value.items())
+                if isinstance(v, (int, float))
+            ]
+        return [f"{self.name} {_format_value(value)}"] if isinstance(value, (int, float)) else []
+
+
+class Registry:
+    """
+    Prometheus 텍스트 형식으로 내보내는 프로세스 내 지표 저장소
+    gunicorn 워커마다 별도의 값을 가지므로 스크레이프한 워커의 값만 보입니다.
+    """
+
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(self.prefix + name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self.prefix + name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback, labelname=None):
+        return self._add(Gauge(self.prefix + name, documentation, callback, labelname))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 애플리케이션 공통 지표
+registry = Registry(prefix="newscard_")
+
+STAGE_SECONDS = registry.histogram(
+    "stage_duration_seconds", "Time spent in each processing stage", ("stage",)
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+OPENAI_TOKENS = registry.counter(
+    "openai_tokens_total", "Tokens reported by the OpenAI API", ("operation", "model", "type")
+)
+DECK_TOKENS = registry.histogram(
+    "deck_tokens", "Total tokens spent per analysis call", ("operation",),
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+IMAGES_GENERATED = registry.counter(
+    "images_generated_total", "Images generated by the OpenAI API", ("model", "quality", "tier")
+)
+IMAGE_SECONDS = registry.histogram(
+    "image_generation_seconds", "OpenAI image generation latency by tier", ("tier", "quality")
+)
+PARSE_OUTCOMES = registry.counter(
+    "card_parse_total", "Analysis responses by parse path", ("outcome",)
+)
+CARDS_GENERATED = registry.counter(
+    "cards_generated_total", "Cards returned from analysis", ("outcome",)
+)
+DEADLINE_MISSES = registry.counter(
+    "deadline_exceeded_total", "Work abandoned because the request deadline passed or the client disconnected",
+    ("stage", "reason"),
+)
+ERRORS = registry.counter(
+    "errors_total", "Errors by operation and exception type", ("operation", "error")
+)
+
+
+def time_stage(stage):
+    """처리 단계 시간 측정 컨텍스트"""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+def record_usage(operation, model, usage):
+    """응답의 usage에서 토큰 수를 기록하고 총 토큰 수를 반환"""
+    if usage is None:
+        return 0
+    # 채팅 응답은 prompt/completion, 이미지 응답은 input/output 토큰 이름을 사용
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or getattr(usage, "input_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or getattr(usage, "output_tokens", None) or 0
+    OPENAI_TOKENS.inc(prompt_tokens, operation=operation, model=model, type="prompt")
+    OPENAI_TOKENS.inc(completion_tokens, operation=operation, model=model, type="completion")
+    return prompt_tokens + completion_tokens
+
+
+def record_error(operation, error):
+    ERRORS.inc(operation=operation, error=type(error).__name__)
@@ -0,0 +1,527 @@
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from services.deadlines import current_deadline, DeadlineExceededError
+from services.prompts import estimate_tokens
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 우선순위 레인 (숫자가 작을수록 먼저 처리)
+LANE_INTERACTIVE = 0
+LANE_BATCH = 1
+LANE_NAMES = {LANE_INTERACTIVE: "interactive", LANE_BATCH: "batch"}
+
+# 현재 호출이 속한 레인 (일괄 작업은 openai_lane(LANE_BATCH) 안에서 호출)
+_current_lane = contextvars.ContextVar("openai_lane", default=LANE_INTERACTIVE)
+
+# 재시도할 상태 코드 (요청 시간 초과, 충돌, 속도 제한, 서버 오류)
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# 요청 기한이 있는 호출이 대기 중 클라이언트 연결 끊김(취소)을 확인하는 간격 (초)
+_CANCEL_POLL_INTERVAL = 0.5
+
+
+class CircuitOpenError(RuntimeError):
+    """연속 실패로 회로가 열려 OpenAI 호출을 바로 거절한 경우"""
+
+
+class SchedulerTimeoutError(RuntimeError):
+    """속도 제한 대기열에서 max_wait 이상 기다린 경우"""
+
+
+@contextmanager
+def openai_lane(lane):
+    """블록 안의 OpenAI 호출을 지정한 레인으로 예약"""
+    token = _current_lane.set(lane)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def current_lane():
+    return _current_lane.get()
+
+
+def bind_lane(fn):
+    """현재 레인을 다른 스레드에서도 적용하도록 감싼 함수 (스레드 풀에는 컨텍스트가 전달되지 않음)"""
+    lane = _current_lane.get()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        with openai_lane(lane):
+            return fn(*args, **kwargs)
+    return run
+
+
+def estimate_request_tokens(messages, max_tokens=0):
+    """채팅 요청이 분당 토큰 한도에서 차지할 토큰 수 추정 (입력 + 최대 출력)"""
+    # 템플릿으로 렌더링한 메시지는 렌더링 때 계산한 입력 토큰 수를 그대로 사용
+    prompt_tokens = getattr(messages, "prompt_tokens", None)
+    if prompt_tokens is not None:
+        return prompt_tokens + (max_tokens or 0)
+    return sum(estimate_tokens(message.get("content") or "") for message in messages) + (max_tokens or 0)
+
+
+class TokenBucket:
+    """
+    분당 한도를 초 단위로 채우는 토큰 버킷 (rate_per_minute가 0이면 제한 없음)
+    버스트는 burst_seconds 동안 채워지는 양으로 제한하며, 버스트보다 큰 요청도 버킷이 가득 차면 통과시킵니다.
+    """
+
+    def __init__(self, rate_per_minute, burst_seconds=10):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds) if rate_per_minute else 0.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self):
+        return self.rate <= 0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        if self.unlimited or amount <= 0:
+            return 0.0
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    def take(self, amount):
+        # 잔량이 음수가 될 수 있으며, 빌린 만큼 다음 요청이 기다림
+        if not self.unlimited:
+            self.tokens -= amount
+
+    def adjust(self, delta):
+        """실제 사용량이 예상과 달랐을 때 차이만큼 보정"""
+        if not self.unlimited:
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class CircuitBreaker:
+    """
+    연속 실패가 threshold에 이르면 cooldown 동안 호출을 거절하는 회로 차단기
+    cooldown이 지나면 한 번의 시험 호출만 허용하고, 성공하면 닫고 실패하면 다시 엽니다.
+    """
+
+    def __init__(self, threshold=5, cooldown=30):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half_open" if self.probing or time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def before_call(self):
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.cooldown - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self.probing:
+                raise CircuitOpenError(f"OpenAI circuit is open, retry in {max(remaining, 0):.0f}s")
+            self.probing = True
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("OpenAI circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or (self.threshold > 0 and self.failures >= self.threshold and self.opened_at is None):
+                logger.warning("OpenAI circuit opened after %s consecutive failures", self.failures)
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def release_probe(self):
+        """시험 호출이 결과 판정 없이 끝난 경우 (재시도 불가 오류 등)"""
+        with self._lock:
+            self.probing = False
+
+
+class OpenAIScheduler:
+    """
+    OpenAI 호출 스케줄러
+    분당 요청 수(RPM)/토큰 수(TPM) 토큰 버킷으로 호출 속도를 맞추고, 대기 중인 호출은 레인 우선순위와 도착 순서대로 처리합니다.
+    429/5xx/연결 오류는 지터를 준 지수 백오프로 재시도하며, Retry-After를 받으면 그동안 모든 호출을 멈춰
+    한꺼번에 재시도가 몰리지 않게 합니다. 재시도해도 실패가 이어지면 회로 차단기가 호출을 바로 거절합니다.
+    """
+
+    def __init__(self, name, rpm=0, tpm=0, max_retries=4, backoff_base=0.5, backoff_max=30,
+                 breaker_threshold=5, breaker_cooldown=30, max_wait=120):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_wait = max_wait
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._counters = {
+            "calls": 0, "retries": 0, "rate_limited": 0, "failures": 0,
+            "circuit_rejections": 0, "queue_timeouts": 0, "deadline_exceeded": 0, "throttled_seconds": 0.0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._cond:
+            self._counters[name] += amount
+
+    # 대기열
+
+    def _enqueue(self, lane):
+        ticket = (lane, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+        return ticket
+
+    def _leave(self, ticket):
+        with self._cond:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+            self._cond.notify_all()
+
+    def _try_acquire(self, ticket, tokens):
+        """대기열 맨 앞이고 버킷에 여유가 있으면 차감 후 0, 아니면 기다릴 시간 반환 (잠금 안에서 호출)"""
+        now = time.monotonic()
+        if self._paused_until > now:
+            return self._paused_until - now
+        if self._waiting[0] != ticket:
+            # 앞선 호출이 처리되면 notify로 깨어남 (비동기 호출은 짧게 다시 확인)
+            return 0.05
+        wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        heapq.heappop(self._waiting)
+        self._cond.notify_all()
+        return 0.0
+
+    def _wait_limit(self, wait, max_wait, started, request_deadline):
+        """대기 시간을 대기열 최대 대기 시간과 요청 기한으로 제한 (둘 중 하나가 지났으면 예외)"""
+        if max_wait:
+            remaining = started + max_wait - time.monotonic()
+            if remaining <= 0:
+                raise SchedulerTimeoutError(f"Waited more than {max_wait}s for OpenAI {self.name} quota")
+            wait = min(wait, remaining)
+        if request_deadline is not None:
+            remaining = request_deadline.remaining()
+            if remaining is not None and remaining <= 0:
+                raise request_deadline.error("queue")
+            # 취소는 알림 없이 확인하므로 짧은 간격으로 나눠 기다림
+            wait = min(wait, _CANCEL_POLL_INTERVAL, wait if remaining is None else remaining)
+        return wait
+
+    def _acquire(self, tokens, lane, max_wait, request_deadline=None):
+        ticket = self._enqueue(lane)
+        started = time.monotonic()
+        try:
+            with self._cond:
+                while True:
+                    wait = self._try_acquire(ticket, tokens)
+                    if wait <= 0:
+                        break
+                    self._cond.wait(self._wait_limit(wait, max_wait, started, request_deadline))
+        except BaseException:
+            self._leave(ticket)
+            raise
+        self._throttled(started)
+
+    async def _aacquire(self, tokens, lane, max_wait, request_deadline=None):
+        ticket = self._enqueue(lane)
+        started = time.monotonic()
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire(ticket, tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(self._wait_limit(wait, max_wait, started, request_deadline))
+        except BaseException:
+            self._leave(ticket)
+            raise
+        self._throttled(started)
+
+    def _throttled(self, started):
+        waited = time.monotonic() - started
+        if waited > 0.01:
+            self._count("throttled_seconds", waited)
+
+    # 오류 처리
+
+    @staticmethod
+    def _retry_after(error):
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000
+            if headers.get("retry-after"):
+                return float(headers["retry-after"])
+        except (TypeError, ValueError):
+            pass
+        return None
+
+    @staticmethod
+    def _is_retryable(error):
+        import openai  # SDK는 첫 호출 때 로드 (워커 시작 시간 단축)
+
+        if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            # 크레딧 소진은 기다려도 해결되지 않음
+            if getattr(error, "code", None) == "insufficient_quota":
+                return False
+            return error.status_code in _RETRYABLE_STATUS
+        return False
+
+    def _retry_delay(self, error, attempt):
+        """재시도 전 대기 시간 (재시도하지 않을 오류면 None)"""
+        if not self._is_retryable(error):
+            self.breaker.release_probe()
+            return None
+
+        import openai
+
+        retry_after = self._retry_after(error)
+        if isinstance(error, openai.RateLimitError):
+            self._count("rate_limited")
+            self.breaker.release_probe()
+            if retry_after:
+                # 서버가 알려준 시간 동안 같은 스케줄러의 모든 호출을 멈춤
+                with self._cond:
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        else:
+            # 속도 제한은 대기열로 조절하고, 서버/연결 오류만 회로 차단기에 반영
+            self.breaker.record_failure()
+
+        if attempt >= self.max_retries:
+            return None
+        backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        return max(backoff, retry_after or 0)
+
+    def _before_attempt(self):
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self._count("circuit_rejections")
+            raise
+
+    def _after_success(self, result, tokens, usage):
+        self.breaker.record_success()
+        if usage is not None:
+            try:
+                actual = usage(result)
+            except Exception:
+                actual = None
+            if actual is not None:
+                with self._cond:
+                    self.tokens.adjust(actual - tokens)
+
+    def _check_deadline(self, request_deadline, attempt):
+        if request_deadline is not None and request_deadline.expired:
+            self._count("deadline_exceeded")
+            raise request_deadline.error("queue" if attempt == 0 else "retry")
+
+    def _deadline_error(self, request_deadline, error, delay):
+        """
+        요청 기한 안에 결과를 돌려줄 수 없으면 던질 예외 (기한이 없거나 여유가 있으면 None)
+        기한 때문에 끊긴 호출은 OpenAI 장애가 아니므로 회로 차단기에 실패로 반영하지 않습니다.
+        """
+        if request_deadline is None:
+            return None
+        remaining = request_deadline.remaining()
+        if remaining is None:
+            return None
+        if remaining <= 0:
+            stage = "openai"
+        elif delay is not None and delay >= remaining:
+            stage = "retry"
+        else:
+            return None
+        self.breaker.release_probe()
+        self._count("deadline_exceeded")
+        return request_deadline.error(stage)
+
+    def _log_retry(self, error, attempt, delay):
+        self._count("retries")
+        logger.warning(
+            "OpenAI %s call failed (%s), retry %s/%s in %.2fs",
+            self.name, type(error).__name__, attempt + 1, self.max_retries, delay,
+        )
+
+    # 호출
+
+    def call(self, fn, tokens=0, lane=None, usage=None, max_wait=None):
+        """
+        fn()을 속도 제한과 재시도를 적용하여 실행
+        tokens는 분당 토큰 한도에서 미리 차감할 양이며, usage(결과)가 실제 사용량을 반환하면 차이를 보정합니다.
+        현재 요청에 기한이 있으면 그 안에 끝낼 수 없는 대기나 재시도는 하지 않고 DeadlineExceededError를 던집니다.
+        """
+        lane = current_lane() if lane is None else lane
+        max_wait = self.max_wait if max_wait is None else max_wait
+        request_deadline = current_deadline()
+        self._count("calls")
+        for attempt in itertools.count():
+            self._check_deadline(request_deadline, attempt)
+            self._before_attempt()
+            try:
+                self._acquire(tokens, lane, max_wait, request_deadline)
+            except SchedulerTimeoutError:
+                self.breaker.release_probe()
+                self._count("queue_timeouts")
+                raise
+            except DeadlineExceededError:
+                self.breaker.release_probe()
+                self._count("deadline_exceeded")
+                raise
+            except BaseException:
+                # 취소(CancelledError)나 인터럽트로 끝난 시험 호출이 회로를 계속 열어 두지 않도록 해제
+                self.breaker.release_probe()
+                raise
+            try:
+                result = fn()
+            except Exception as e:
+                deadline_error = self._deadline_error(request_deadline, e, None)
+                if deadline_error is not None:
+                    raise deadline_error from e
+                delay = self._retry_delay(e, attempt)
+                deadline_error = self._deadline_error(request_deadline, e, delay)
+                if deadline_error is not None:
+                    raise deadline_error from e
+                if delay is None:
+                    self._count("failures")
+                    raise
+                self._log_retry(e, attempt, delay)
+                if request_deadline is not None:
+                    # 클라이언트 연결이 끊기면 바로 깨어나 다음 시도 전에 중단
+                    request_deadline.wait_cancelled(delay)
+                else:
+                    time.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+            self._after_success(result, tokens, usage)
+            return result
+
+    async def acall(self, fn, tokens=0, lane=None, usage=None, max_wait=None):
+        """call()의 비동기 버전 (fn은 코루틴을 반환하는 함수)"""
+        lane = current_lane() if lane is None else lane
+        max_wait = self.max_wait if max_wait is None else max_wait
+        request_deadline = current_deadline()
+        self._count("calls")
+        for attempt in itertools.count():
+            self._check_deadline(request_deadline, attempt)
+            self._before_attempt()
+            try:
+                await self._aacquire(tokens, lane, max_wait, request_deadline)
+            except SchedulerTimeoutError:
+                self.breaker.release_probe()
+                self._count("queue_timeouts")
+                raise
+            except DeadlineExceededError:
+                self.breaker.release_probe()
+                self._count("deadline_exceeded")
+                raise
+            except BaseException:
+                # 취소(CancelledError)나 인터럽트로 끝난 시험 호출이 회로를 계속 열어 두지 않도록 해제
+                self.breaker.release_probe()
+                raise
+            try:
+                result = await fn()
+            except Exception as e:
+                deadline_error = self._deadline_error(request_deadline, e, None)
+                if deadline_error is not None:
+                    raise deadline_error from e
+                delay = self._retry_delay(e, attempt)
+                deadline_error = self._deadline_error(request_deadline, e, delay)
+                if deadline_error is not None:
+                    raise deadline_error from e
+                if delay is None:
+                    self._count("failures")
+                    raise
+                self._log_retry(e, attempt, delay)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+            self._after_success(result, tokens, usage)
+            return result
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._counters)
+            stats["throttled_seconds"] = round(stats["throttled_seconds"], 3)
+            for lane, lane_name in LANE_NAMES.items():
+                stats[f"waiting_{lane_name}"] = sum(1 for ticket in self._waiting if ticket[0] == lane)
+            stats["paused"] = self._paused_until > time.monotonic()
+        stats["circuit_open"] = self.breaker.state != "closed"
+        return stats
+
+
+def usage_total_tokens(response):
+    """응답의 총 토큰 수 (usage가 없으면 None)"""
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+
+def _per_process(name):
+    # 한도는 계정 전체 기준이므로 워커 프로세스 수(WEB_CONCURRENCY)로 나눠 사용
+    quota = int(os.getenv(name, "0"))
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    return quota / workers
+
+
+def create_openai_schedulers():
+    """
+    환경 변수 설정으로 채팅/이미지 스케줄러 생성
+    OPENAI_CHAT_RPM, OPENAI_CHAT_TPM, OPENAI_IMAGE_RPM (0이면 제한 없음), OPENAI_MAX_RETRIES,
+    OPENAI_BREAKER_THRESHOLD, OPENAI_BREAKER_COOLDOWN, OPENAI_MAX_QUEUE_WAIT
+    """
+    common = {
+        "max_retries": int(os.getenv("OPENAI_MAX_RETRIES", "4")),
+        "backoff_base": float(os.getenv("OPENAI_BACKOFF_BASE", "0.5")),
+        "backoff_max": float(os.getenv("OPENAI_BACKOFF_MAX", "30")),
+        "breaker_threshold": int(os.getenv("OPENAI_BREAKER_THRESHOLD", "5")),
+        "breaker_cooldown": float(os.getenv("OPENAI_BREAKER_COOLDOWN", "30")),
+        "max_wait": float(os.getenv("OPENAI_MAX_QUEUE_WAIT", "120")),
+    }
+    return {
+        "chat": OpenAIScheduler(
+            "chat", rpm=_per_process("OPENAI_CHAT_RPM"), tpm=_per_process("OPENAI_CHAT_TPM"), **common
+        ),
+        "image": OpenAIScheduler("image", rpm=_per_process("OPENAI_IMAGE_RPM"), **common),
+    }
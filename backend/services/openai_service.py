@@ -1,8 +1,22 @@
-import openai
 import os
-from typing import List
+from typing import AsyncIterator, List, Optional
+
+import anyio
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from dotenv import load_dotenv
 from models.card_news import Card
+from services.logging_config import preview, should_log_payload, LOG_PAYLOAD_MAX_CHARS
+from services.blob_store import create_blob_store, store_generated_image
+from services.card_parser import parse_analysis_response, CardStreamParser
+from services.chunking import iter_sections
+from services.deadlines import DeadlineExceededError, current_deadline, with_deadline
+from services.openai_scheduler import create_openai_schedulers, estimate_request_tokens, usage_total_tokens
+from services.prompts import (
+    ANALYSIS_OUTPUT_MODE, IMAGE_MODEL, IMAGE_TIERS, IMAGE_TIER_FINAL, SUMMARY_MODEL, SUMMARY_MAX_TOKENS,
+    build_analysis_request, build_image_prompt, build_summary_messages, estimate_tokens, find_card_count_directive,
+    analysis_retry_max_tokens,
+)
 import logging
 
 # 로깅 설정
@@ -15,8 +29,56 @@ api_key = os.getenv("OPENAI_API_KEY")
 if not api_key:
     logger.warning("WARNING: OPENAI_API_KEY is not set in .env file")
 
-# OpenAI API 키 설정
-openai.api_key = api_key
+# 프로세스당 동시에 유지할 최대 HTTP 연결 수 (LLM/이미지 호출 동시 처리량)
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "500"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "100"))
+
+# 긴 문서 처리 설정 (flask_app과 동일한 환경 변수)
+LONG_TEXT_TOKEN_LIMIT = int(os.getenv("LONG_TEXT_TOKEN_LIMIT", "8000"))
+CHUNK_SECTION_TOKENS = int(os.getenv("CHUNK_SECTION_TOKENS", "4000"))
+CHUNK_SUMMARY_WORKERS = int(os.getenv("CHUNK_SUMMARY_WORKERS", "4"))
+
+_client: Optional[AsyncOpenAI] = None
+_blob_store = None
+_schedulers = None
+
+
+def get_async_client() -> AsyncOpenAI:
+    """연결 풀을 공유하는 AsyncOpenAI 클라이언트 (프로세스당 하나)"""
+    global _client
+    if _client is None:
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            ),
+        )
+        # 재시도는 스케줄러가 담당하므로 SDK 자체 재시도는 끔
+        _client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+    return _client
+
+
+async def close_async_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def get_schedulers():
+    """OpenAI 호출 스케줄러 (chat, image / 프로세스당 하나)"""
+    global _schedulers
+    if _schedulers is None:
+        _schedulers = create_openai_schedulers()
+    return _schedulers
+
+
+def get_blob_store():
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = create_blob_store()
+    return _blob_store
+
 
 class OpenAIService:
     @staticmethod
@@ -28,155 +90,227 @@ class OpenAIService:
             if not text or len(text.strip()) == 0:
                 logger.error("Empty text provided for analysis")
                 return OpenAIService._get_sample_cards()
-                
-            logger.info(f"Starting text analysis with OpenAI API, text length: {len(text)}")
-            
+
+            logger.info("Starting text analysis with OpenAI API, text length: %s", len(text))
+
             # OpenAI API 키 확인
-            if not openai.api_key:
+            if not api_key:
                 logger.error("OpenAI API key is not set")
                 return OpenAIService._get_sample_cards("API 키가 설정되지 않았습니다")
-            
-            messages = [
-                {"role": "system", "content": """당신은 고품질 카드뉴스를 생성하는 AI입니다. 
-                주어진 텍스트를 분석하여 3-5장 분량의 카드뉴스 구성을 제안하세요.
-                각 카드에는 제목, 본문 내용, 강조 문구를 포함해야 합니다.
-                또한 각 카드의 이미지에 대한 프롬프트도 제안하세요."""},
-                {"role": "user", "content": f"""다음 텍스트를 바탕으로 SNS용 카드뉴스를 만들어주세요.
-                - 각 페이지마다 주제와 설명을 포함하고,
-                - 총 5장으로 구성되게 하며, 강조 문구는 따로 구분해주세요.
-                - 주제와 설명을 강조하기 위한 이미지 제안을 해주세요.
-                
-                텍스트: {text}"""}
-            ]
-            
+
+            structured = ANALYSIS_OUTPUT_MODE == "json"
+            params = build_analysis_request(text, structured)
+
             logger.info("Calling OpenAI API...")
-            
+
             try:
-                response = openai.chat.completions.create(
-                    model="gpt-4.1", # 최신 GPT 모델 사용
-                    messages=messages,
-                    temperature=0.7,
-                    max_tokens=1500,
-                )
-                
+                retry_tokens = analysis_retry_max_tokens(params["max_tokens"])
+                while True:
+                    response = await get_schedulers()["chat"].acall(
+                        lambda: with_deadline(get_async_client()).chat.completions.create(**params),
+                        tokens=estimate_request_tokens(params["messages"], params["max_tokens"]),
+                        usage=usage_total_tokens,
+                    )
+                    if response.choices[0].finish_reason != "length":
+                        break
+                    # 응답이 잘리면 더 큰 예산으로 한 번만 다시 요청
+                    if retry_tokens is None:
+                        logger.warning("Analysis response hit max_tokens=%s and may be missing cards", params["max_tokens"])
+                        break
+                    logger.warning(
+                        "Analysis response hit max_tokens=%s, retrying with max_tokens=%s", params["max_tokens"], retry_tokens
+                    )
+                    params = {**params, "max_tokens": retry_tokens}
+                    retry_tokens = None
+
                 content = response.choices[0].message.content
-                logger.info(f"OpenAI API response received, content length: {len(content)}")
-                
+                logger.info("OpenAI API response received, content length: %s", len(content))
+
                 # 응답 파싱
-                cards = []
-                sections = content.split("카드 ")
-                
-                for i, section in enumerate(sections[1:]):  # 첫 번째는 비어있을 수 있으므로 건너뜀
-                    logger.debug(f"Processing section {i+1}: {section[:100]}...")
-                    lines = section.strip().split("\n")
-                    if len(lines) >= 3:
-                        title = lines[0].replace(":", "").strip()
-                        content = "\n".join([l for l in lines[1:] if not (l.startswith("강조:") or l.startswith("이미지:"))]).strip()
-                        
-                        # 강조 문구 추출
-                        highlight = next((l.replace("강조:", "").strip() for l in lines if l.startswith("강조:")), "")
-                        
-                        # 이미지 프롬프트 추출
-                        prompt = next((l.replace("이미지:", "").strip() for l in lines if l.startswith("이미지:")), "")
-                        
-                        cards.append(Card(
-                            title=title,
-                            content=content,
-                            highlight=highlight,
-                            prompt=prompt
-                        ))
-                
+                cards = [Card(**card) for card in parse_analysis_response(content, structured)]
+
                 # 카드가 없으면 샘플 카드 제공
                 if not cards:
                     logger.warning("No cards generated from API response")
                     return OpenAIService._get_sample_cards()
-                    
-                logger.info(f"Successfully generated {len(cards)} cards")
+
+                logger.info("Successfully generated %s cards", len(cards))
                 return cards
-                
+
+            except DeadlineExceededError:
+                # 기다리는 클라이언트가 없으므로 샘플 카드 대신 그대로 전달
+                raise
             except Exception as api_error:
-                logger.error(f"OpenAI API call failed: {str(api_error)}")
+                logger.error("OpenAI API call failed: %s", api_error)
                 # API 호출 실패 시 샘플 카드 반환
                 return OpenAIService._get_sample_cards(f"API 오류: {str(api_error)}")
-                
+
+        except DeadlineExceededError:
+            raise
         except Exception as e:
-            logger.error(f"Error in analyze_text: {str(e)}")
+            logger.error("Error in analyze_text: %s", e)
             # 오류 발생 시 샘플 카드 반환
             return OpenAIService._get_sample_cards(f"처리 오류: {str(e)}")
-    
+
+    @staticmethod
+    async def summarize_section(section: str, index: int) -> str:
+        """긴 문서의 섹션 하나 요약"""
+        logger.info("Summarizing section %s, estimated tokens: %s", index + 1, estimate_tokens(section))
+        messages = build_summary_messages(section, index)
+        response = await get_schedulers()["chat"].acall(
+            lambda: with_deadline(get_async_client()).chat.completions.create(
+                model=SUMMARY_MODEL,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=SUMMARY_MAX_TOKENS,
+            ),
+            tokens=estimate_request_tokens(messages, SUMMARY_MAX_TOKENS),
+            usage=usage_total_tokens,
+        )
+        return response.choices[0].message.content.strip()
+
+    @staticmethod
+    async def analyze_sections(sections: List[str], depth: int = 0) -> List[Card]:
+        """
+        긴 문서 분석 - 섹션을 동시에 요약한 뒤 요약본으로 카드 구성 (flask_app.analyze_sections와 같은 방식)
+        """
+        try:
+            text = "\n\n".join(sections)
+            if estimate_tokens(text) <= LONG_TEXT_TOKEN_LIMIT:
+                return await OpenAIService.analyze_text(text)
+
+            summaries = [None] * len(sections)
+            errors = []
+            limiter = anyio.CapacityLimiter(CHUNK_SUMMARY_WORKERS)
+
+            async def summarize(index, section):
+                try:
+                    async with limiter:
+                        summaries[index] = await OpenAIService.summarize_section(section, index)
+                except Exception as e:
+                    # 하나라도 실패하면 나머지 요약도 중단
+                    errors.append(e)
+                    task_group.cancel_scope.cancel()
+
+            async with anyio.create_task_group() as task_group:
+                for index, section in enumerate(sections):
+                    task_group.start_soon(summarize, index, section)
+            if errors:
+                raise errors[0]
+            logger.info("Summarized %s sections (depth %s)", len(summaries), depth)
+
+            composed = "\n\n".join(summaries)
+            directive = next(filter(None, map(find_card_count_directive, sections)), None)
+            if directive:
+                # 카드 수 지시문은 요약 과정에서 사라질 수 있으므로 다시 붙임
+                composed = f"{directive}\n\n{composed}"
+
+            # 요약본도 제한을 넘으면 한 단계 더 요약
+            if estimate_tokens(composed) > LONG_TEXT_TOKEN_LIMIT and depth < 2:
+                return await OpenAIService.analyze_sections(list(iter_sections([composed], CHUNK_SECTION_TOKENS)), depth + 1)
+            return await OpenAIService.analyze_text(composed)
+        except DeadlineExceededError:
+            raise
+        except Exception as e:
+            logger.error("Error in analyze_sections: %s", e)
+            return OpenAIService._get_sample_cards(f"처리 오류: {str(e)}")
+
+    @staticmethod
+    async def analyze_document(text: str) -> List[Card]:
+        """
+        입력 길이에 따라 단일 분석 또는 섹션 요약 파이프라인 선택 (flask_app.analyze_document와 같은 기준)
+        """
+        if estimate_tokens(text or "") <= LONG_TEXT_TOKEN_LIMIT:
+            return await OpenAIService.analyze_text(text)
+        logger.info("Long text detected (%s chars), using chunked analysis", len(text))
+        sections = await anyio.to_thread.run_sync(lambda: list(iter_sections([text], CHUNK_SECTION_TOKENS)))
+        return await OpenAIService.analyze_sections(sections)
+
+    @staticmethod
+    async def stream_analyze_text(text: str) -> AsyncIterator[Card]:
+        """
+        스트리밍 응답을 증분 파싱하여 완성된 카드를 하나씩 반환
+        """
+        if not text or len(text.strip()) == 0:
+            raise ValueError("Empty text provided for analysis")
+        if not api_key:
+            raise RuntimeError("API 키가 설정되지 않았습니다")
+
+        params = build_analysis_request(text)
+        # 스트림 연결까지만 재시도 (카드를 보내기 시작한 뒤에는 재시도하지 않음)
+        stream = await get_schedulers()["chat"].acall(
+            lambda: with_deadline(get_async_client()).chat.completions.create(**params, stream=True),
+            tokens=estimate_request_tokens(params["messages"], params["max_tokens"]),
+        )
+        parser = CardStreamParser()
+        deadline = current_deadline()
+        try:
+            async for chunk in stream:
+                # 읽기 타임아웃은 조각 사이 간격에만 적용되므로 전체 기한은 직접 확인
+                if deadline is not None:
+                    deadline.check("stream")
+                if not chunk.choices:
+                    continue
+                for card in parser.feed(chunk.choices[0].delta.content or ""):
+                    yield Card(**card)
+            for card in parser.close():
+                yield Card(**card)
+        finally:
+            await stream.close()
+
     @staticmethod
     async def generate_image(
-        prompt: str, 
-        title: str = "", 
-        content: str = "", 
+        prompt: str,
+        title: str = "",
+        content: str = "",
         highlight: str = "",
         style: str = "사진",
-        background_color: str = ""
+        background_color: str = "",
+        tier: str = IMAGE_TIER_FINAL
     ) -> str:
         """
-        이미지 생성 API 호출
+        이미지 생성 API 호출 (tier: draft는 빠른 시안용 저품질, final은 최종본)
         """
         try:
             if not prompt or len(prompt.strip()) == 0:
                 logger.error("Empty prompt provided for image generation")
                 return ""
-                
-            # 스타일 정보
-            style_str = f"스타일: {style}" if style else ""
-            
-            # 배경색 정보
-            bg_color_str = f"배경색: {background_color}" if background_color else ""
-            
-            # 추가 스타일 정보 결합
-            additional_styles = ""
-            if style_str or bg_color_str:
-                additional_styles = f"\n\n[스타일 옵션]\n{style_str}\n{bg_color_str}".strip()
-            
-            # 카드 정보를 조합하여 풍부한 프롬프트 구성
-            enhanced_prompt = f"""당신은 카드뉴스 생성 전문가 입니다. 아래 조건에 맞는 바로 매체에 등록가능한 수준의 카드뉴스 이미지를 생성해주세요.
-
-[이미지 프롬프트]
-{prompt}
-
-[이미지 안에 다음 문구를 포함]
-메인문구: {title}
-강조: {highlight}
-내용: {content}{additional_styles}"""
-                
-            logger.info(f"Starting image generation with OpenAI API, prompt length: {len(enhanced_prompt)}")
-            logger.debug(f"Enhanced prompt: {enhanced_prompt}")
-            
+
+            enhanced_prompt = build_image_prompt(prompt, title, content, highlight, style, background_color)
+
+            logger.info("Starting image generation with OpenAI API, prompt length: %s", len(enhanced_prompt))
+            if should_log_payload(logger):
+                logger.debug("Enhanced prompt: %s", preview(enhanced_prompt, LOG_PAYLOAD_MAX_CHARS))
+
             # OpenAI API 키 확인
-            if not openai.api_key:
+            if not api_key:
                 logger.error("OpenAI API key is not set")
                 return ""
-                
-            response = openai.images.generate(
-                model="gpt-image-1",  # 최신 이미지 생성 모델
-                prompt=enhanced_prompt,
-                size="1024x1024",
-                quality="high",
-                n=1,
+
+            response = await get_schedulers()["image"].acall(
+                lambda: with_deadline(get_async_client()).images.generate(
+                    model=IMAGE_MODEL,  # 최신 이미지 생성 모델
+                    prompt=enhanced_prompt,
+                    size=IMAGE_TIERS[tier]["size"],
+                    quality=IMAGE_TIERS[tier]["quality"],
+                    n=1,
+                )
             )
-            
+
             logger.info("Image generated successfully")
-            
-            # gpt-image-1 모델은 항상 base64 형식으로 이미지를 반환합니다
-            # 이전: return response.data[0].url
-            if hasattr(response.data[0], 'b64_json'):
-                # base64 이미지 데이터 형식: "data:image/png;base64,{base64_encoded_data}"
-                return f"data:image/png;base64,{response.data[0].b64_json}"
-            elif hasattr(response.data[0], 'url'):
-                # 이전 모델 호환성을 위해 url이 있는 경우 url 반환
-                return response.data[0].url
-            else:
+
+            # base64 디코딩과 파일 쓰기는 이벤트 루프를 막지 않도록 스레드에서 처리
+            image_url = await anyio.to_thread.run_sync(store_generated_image, get_blob_store(), response.data[0])
+            if not image_url:
                 logger.error("No image data found in API response")
-                return ""
-            
+            return image_url
+
+        except DeadlineExceededError:
+            raise
         except Exception as e:
-            logger.error(f"Image generation error: {str(e)}")
+            logger.error("Image generation error: %s", e)
             return ""
-            
+
     @staticmethod
     def _get_sample_cards(error_message="API 호출 중 오류가 발생했습니다") -> List[Card]:
         """샘플 카드 데이터 반환"""
@@ -184,4 +318,4 @@ class OpenAIService:
             Card(title="샘플 카드 1", content=f"첫 번째 카드 내용입니다. {error_message}", highlight="강조 문구 1"),
             Card(title="샘플 카드 2", content="두 번째 카드 내용입니다.", highlight="강조 문구 2"),
             Card(title="샘플 카드 3", content="세 번째 카드 내용입니다.", highlight="강조 문구 3"),
-        ] 
\ No newline at end of file
+        ]
@@ -0,0 +1,165 @@
+import inspect
+import logging
+import re
+from string import Formatter
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 잘라낸 입력의 끝을 문단/문장 경계로 맞출 때 되돌아갈 수 있는 최대 비율
+_BOUNDARY_LOOKBACK = 0.2
+_BOUNDARIES = ("\n\n", "\n", ". ", "? ", "! ")
+_FIELD_NAME = re.compile(r"^[A-Za-z_]\w*$")
+
+
+# 토큰 수 추정 함수 (토크나이저 없이 빠르게 계산)
+# 한글 등 비ASCII 문자는 약 1자당 1토큰, ASCII는 약 4자당 1토큰으로 계산
+def estimate_tokens(text):
+    if not text:
+        return 0
+    # ASCII 문자 수는 인코딩으로 C 수준에서 계산 (문자마다 ord를 비교하는 것보다 훨씬 빠름)
+    ascii_count = len(text.encode("ascii", "ignore"))
+    return len(text) - ascii_count + (ascii_count + 3) // 4
+
+
+# 토큰 예산에 맞게 텍스트 뒷부분을 잘라냄 - (잘라낸 텍스트, 추정 토큰 수, 잘렸는지 여부)
+def trim_to_tokens(text, budget):
+    tokens = estimate_tokens(text)
+    if tokens <= budget:
+        return text, tokens, False
+
+    # 예산 이내인 가장 긴 앞부분 길이를 이진 탐색
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+
+    # 문장 중간에서 끊기지 않도록 가까운 문단/문장 경계까지 되돌림
+    floor = int(low * (1 - _BOUNDARY_LOOKBACK))
+    for boundary in _BOUNDARIES:
+        position = text.rfind(boundary, floor, low)
+        if position > 0:
+            low = position + len(boundary.rstrip(" "))
+            break
+    trimmed = text[:low].rstrip()
+    return trimmed, estimate_tokens(trimmed), True
+
+
+class PromptTemplate:
+    """
+    미리 컴파일한 프롬프트 템플릿
+    생성 시 들여쓰기를 정리하고 {이름} 자리를 분리해 두므로 렌더링은 문자열 결합만 하며,
+    고정 문구의 토큰 수도 미리 계산해 두어 값 부분만 세면 전체 토큰 수를 알 수 있습니다.
+    """
+
+    def __init__(self, source):
+        self.source = inspect.cleandoc(source)
+        self._literals = []
+        self._fields = []
+        for literal, field, spec, conversion in Formatter().parse(self.source):
+            if field is not None and (spec or conversion or not _FIELD_NAME.match(field)):
+                raise ValueError(f"Unsupported template field: {{{field}}}")
+            self._literals.append(literal)
+            self._fields.append(field)
+        self.fields = frozenset(field for field in self._fields if field is not None)
+        self.static_tokens = sum(estimate_tokens(literal) for literal in self._literals)
+
+    def render(self, values):
+        parts = []
+        for literal, field in zip(self._literals, self._fields):
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(values[field]))
+        return "".join(parts)
+
+    def estimate_tokens(self, values):
+        """렌더링하지 않고 결과의 토큰 수 추정 (고정 문구 + 값)"""
+        return self.static_tokens + sum(
+            estimate_tokens(str(values[field])) for field in self._fields if field is not None
+        )
+
+
+class PromptMessages(list):
+    """렌더링된 채팅 메시지 목록 (렌더링 시 추정한 입력 토큰 수를 함께 보관)"""
+
+    def __init__(self, messages, prompt_tokens, template_id):
+        super().__init__(messages)
+        self.prompt_tokens = prompt_tokens
+        self.template_id = template_id
+
+
+class ChatTemplate:
+    """이름과 버전이 있는 system/user 메시지 템플릿 (문구를 바꾸면 버전을 올려 캐시 키가 달라지게 함)"""
+
+    def __init__(self, name, version, system, user):
+        self.name = name
+        self.version = version
+        self.system = PromptTemplate(system)
+        self.user = PromptTemplate(user)
+
+    @property
+    def id(self):
+        return f"{self.name}@v{self.version}"
+
+    def estimate_tokens(self, values):
+        return self.system.estimate_tokens(values) + self.user.estimate_tokens(values)
+
+    def render(self, budget_field=None, budget=None, **values):
+        """
+        메시지 목록 렌더링
+        budget이 있으면 전체 입력이 예산 안에 들도록 budget_field 값(원문)의 뒷부분을 잘라냅니다.
+        """
+        if budget is not None and budget_field is not None:
+            others = dict(values, **{budget_field: ""})
+            available = max(0, budget - self.estimate_tokens(others))
+            text, _, trimmed = trim_to_tokens(values[budget_field], available)
+            if trimmed:
+                logger.warning(
+                    "Trimmed %s input from %s to %s chars to fit %s prompt tokens",
+                    self.id, len(values[budget_field]), len(text), budget,
+                )
+                values[budget_field] = text
+        messages = [
+            {"role": "system", "content": self.system.render(values)},
+            {"role": "user", "content": self.user.render(values)},
+        ]
+        return PromptMessages(messages, self.estimate_tokens(values), self.id)
+
+
+class TextTemplate:
+    """이름과 버전이 있는 단일 텍스트 템플릿 (이미지 프롬프트 등)"""
+
+    def __init__(self, name, version, source):
+        self.name = name
+        self.version = version
+        self.template = PromptTemplate(source)
+
+    @property
+    def id(self):
+        return f"{self.name}@v{self.version}"
+
+    def render(self, **values):
+        return self.template.render(values)
+
+
+# 등록된 템플릿 (이름 -> 템플릿)
+_registry = {}
+
+
+def register_template(template):
+    if template.name in _registry:
+        raise ValueError(f"Prompt template already registered: {template.name}")
+    _registry[template.name] = template
+    return template
+
+
+def get_template(name):
+    return _registry[name]
+
+
+def template_versions():
+    """등록된 템플릿의 이름별 버전 (캐시 키와 상태 조회용)"""
+    return {name: template.version for name, template in sorted(_registry.items())}
@@ -0,0 +1,348 @@
+import logging
+import os
+import re
+
+from services.cache import make_cache_key
+from services.prompt_templates import ChatTemplate, TextTemplate, register_template, template_versions, estimate_tokens  # noqa: F401
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 모델 파라미터 (캐시 키에도 사용)
+ANALYSIS_MODEL = "gpt-4.1"
+ANALYSIS_TEMPERATURE = 0.7
+# 분석 응답 최대 토큰 수는 카드 수에 비례 (기본 + 카드당), ANALYSIS_MIN_TOKENS는 하한, ANALYSIS_MAX_TOKENS는 상한
+# 한국어 본문과 영문 이미지 프롬프트를 합치면 카드 한 장에 400토큰 이상 나오는 경우가 많음
+ANALYSIS_MAX_TOKENS = int(os.getenv("ANALYSIS_MAX_TOKENS", "6000"))
+ANALYSIS_MIN_TOKENS = int(os.getenv("ANALYSIS_MIN_TOKENS", "1200"))
+ANALYSIS_BASE_TOKENS = int(os.getenv("ANALYSIS_BASE_TOKENS", "300"))
+ANALYSIS_TOKENS_PER_CARD = int(os.getenv("ANALYSIS_TOKENS_PER_CARD", "500"))
+# 응답이 max_tokens에서 잘리면 한 번 더 요청할 때의 최대 토큰 수 (원래 예산의 2배, 이 값이 상한)
+ANALYSIS_RETRY_MAX_TOKENS = int(os.getenv("ANALYSIS_RETRY_MAX_TOKENS", "12000"))
+# 분석 요청의 입력 토큰 예산 (넘으면 원문 뒷부분을 잘라냄, 긴 문서는 Flask 앱에서 먼저 섹션 요약)
+ANALYSIS_INPUT_TOKENS = int(os.getenv("ANALYSIS_INPUT_TOKENS", "12000"))
+DEFAULT_CARD_COUNT = 5
+IMAGE_MODEL = "gpt-image-1"
+IMAGE_SIZE = "1024x1024"
+IMAGE_QUALITY = "high"
+
+# 이미지 품질 등급 (draft: 빠른 시안용 저품질, final: 최종본)
+# gpt-image-1은 1024x1024보다 작은 크기를 지원하지 않으므로 draft도 기본 크기는 같고 품질만 낮춤
+IMAGE_TIER_DRAFT = "draft"
+IMAGE_TIER_FINAL = "final"
+IMAGE_TIERS = {
+    IMAGE_TIER_DRAFT: {
+        "size": os.getenv("IMAGE_DRAFT_SIZE", IMAGE_SIZE),
+        "quality": os.getenv("IMAGE_DRAFT_QUALITY", "low"),
+    },
+    IMAGE_TIER_FINAL: {"size": IMAGE_SIZE, "quality": IMAGE_QUALITY},
+}
+DEFAULT_IMAGE_TIER = os.getenv("IMAGE_DEFAULT_TIER", IMAGE_TIER_FINAL)
+
+# 카드 한 장 재생성 파라미터 (원문은 앞부분만 문맥으로 사용)
+REGENERATE_MAX_TOKENS = 500
+REGENERATE_SOURCE_CHARS = int(os.getenv("REGENERATE_SOURCE_CHARS", "3000"))
+
+# 긴 문서 요약 파라미터
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", ANALYSIS_MODEL)
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "500"))
+
+# 분석 응답 형식 (json: 구조화 출력, text: 기존 '카드 N:' 텍스트 형식)
+ANALYSIS_OUTPUT_MODE = os.getenv("ANALYSIS_OUTPUT_MODE", "json").lower()
+
+# 구조화 출력용 카드 목록 JSON 스키마 (models.card_news.Card 필드와 동일)
+CARD_LIST_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "cards": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string", "description": "카드 제목"},
+                    "content": {"type": "string", "description": "카드 내용"},
+                    "highlight": {"type": "string", "description": "강조 문구"},
+                    "prompt": {"type": "string", "description": "이미지 프롬프트"},
+                },
+                "required": ["title", "content", "highlight", "prompt"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["cards"],
+    "additionalProperties": False,
+}
+
+# 프롬프트 템플릿 (문구를 바꾸면 버전을 올려 이전 분석 결과 캐시를 쓰지 않게 함)
+_ANALYSIS_REQUEST = """
+    다음 텍스트를 바탕으로 SNS용 카드뉴스를 만들어주세요.
+    - 각 페이지마다 주제와 설명을 포함하고,
+    - 총 {card_count}장으로 구성되게 하며, 강조 문구는 따로 구분해주세요.
+    - 주제와 설명을 강조하기 위한 이미지 제안을 해주세요.
+
+    텍스트: {text}
+"""
+
+ANALYSIS_JSON_TEMPLATE = register_template(ChatTemplate(
+    "analysis_json", 1,
+    system="""
+        당신은 고품질 카드뉴스를 생성하는 AI입니다.
+        주어진 텍스트를 분석하여 카드뉴스 구성을 제안하세요.
+        각 카드는 title(카드 제목), content(카드 내용), highlight(강조 문구), prompt(이미지 프롬프트)로 구성하고
+        지정된 JSON 형식으로만 응답해주세요.
+    """,
+    user=_ANALYSIS_REQUEST,
+))
+
+ANALYSIS_TEXT_TEMPLATE = register_template(ChatTemplate(
+    "analysis_text", 1,
+    system="""
+        당신은 고품질 카드뉴스를 생성하는 AI입니다.
+        주어진 텍스트를 분석하여 카드뉴스 구성을 제안하세요.
+        각 카드는 다음 형식으로 작성해주세요:
+
+        카드 1:
+        제목: [카드 제목]
+        내용: [카드 내용]
+        강조: [강조 문구]
+        이미지: [이미지 프롬프트]
+
+        카드 2:
+        제목: [카드 제목]
+        내용: [카드 내용]
+        강조: [강조 문구]
+        이미지: [이미지 프롬프트]
+
+        이런 식으로 각 카드를 명확히 구분해서 작성해주세요.
+    """,
+    user=_ANALYSIS_REQUEST,
+))
+
+_REGENERATION_REQUEST = """
+    전체 {card_total}장 중 {card_number}번째 카드만 다시 작성해주세요.
+    다른 카드와 내용이 겹치지 않게 하고, 흐름에 맞게 작성하세요.
+    {instruction}
+
+    [다른 카드]
+    {context}
+
+    [현재 {card_number}번째 카드]
+    제목: {title}
+    내용: {content}
+    강조: {highlight}
+    이미지: {prompt}
+
+    [원문]
+    {source}
+"""
+
+REGENERATION_JSON_TEMPLATE = register_template(ChatTemplate(
+    "card_regeneration_json", 1,
+    system="""
+        당신은 고품질 카드뉴스를 생성하는 AI입니다.
+        카드뉴스의 카드 한 장을 title(카드 제목), content(카드 내용), highlight(강조 문구), prompt(이미지 프롬프트)로 구성하여
+        cards 배열에 한 장만 담아 지정된 JSON 형식으로만 응답해주세요.
+    """,
+    user=_REGENERATION_REQUEST,
+))
+
+REGENERATION_TEXT_TEMPLATE = register_template(ChatTemplate(
+    "card_regeneration_text", 1,
+    system="""
+        당신은 고품질 카드뉴스를 생성하는 AI입니다.
+        카드뉴스의 카드 한 장을 다음 형식으로만 작성해주세요:
+
+        카드 1:
+        제목: [카드 제목]
+        내용: [카드 내용]
+        강조: [강조 문구]
+        이미지: [이미지 프롬프트]
+    """,
+    user=_REGENERATION_REQUEST,
+))
+
+SUMMARY_TEMPLATE = register_template(ChatTemplate(
+    "section_summary", 1,
+    system="""
+        당신은 뉴스 편집자입니다.
+        긴 문서의 일부분이 주어지면 카드뉴스 제작에 필요한 핵심 사실, 수치, 인용을 빠짐없이 간결하게 요약하세요.
+    """,
+    user="""
+        다음은 문서의 {section_number}번째 부분입니다. 핵심 내용을 요약해주세요.
+
+        텍스트: {section}
+    """,
+))
+
+IMAGE_TEMPLATE = register_template(TextTemplate(
+    "image", 1,
+    """
+    당신은 카드뉴스 생성 전문가 입니다. 아래 조건에 맞는 바로 매체에 등록가능한 수준의 카드뉴스 이미지를 생성해주세요.
+
+    [이미지 프롬프트]
+    {prompt}
+
+    [이미지 안에 다음 문구를 포함]
+    메인문구: {title}
+    강조: {highlight}
+    내용: {content}{additional_styles}
+    """,
+))
+
+_CARD_COUNT = re.compile(r'카드수:\s*(\d+)')
+
+# 카드 수 지시문 추출 ('카드수: N' 문구, 없으면 None)
+def find_card_count_directive(text):
+    match = _CARD_COUNT.search(text or "")
+    return match.group(0) if match else None
+
+# 카드 수 추출 함수 (기본값: 5)
+def extract_card_count(text):
+    card_count = DEFAULT_CARD_COUNT
+    try:
+        card_count_match = _CARD_COUNT.search(text)
+        if card_count_match:
+            extracted_count = int(card_count_match.group(1))
+            # 1-10 사이의 유효한 값으로 제한
+            card_count = max(1, min(10, extracted_count))
+            logger.info("Extracted card count: %s", card_count)
+    except Exception as count_error:
+        logger.warning("Failed to extract card count, using default: %s", count_error)
+    return card_count
+
+# 분석 결과를 바꾸는 요청 지시문 (본문이 거의 같아도 지시문이 다르면 이전 덱을 재사용하지 않음)
+# 지시문 줄은 본문 대비 몇 글자뿐이라 MinHash 유사도에는 거의 반영되지 않으므로 따로 비교
+def analysis_directives(text):
+    return {"card_count": extract_card_count(text or "")}
+
+# 카드 수에 맞춘 분석 응답 최대 토큰 수 (카드가 적으면 출력 예산도 작게 잡아 분당 토큰 한도를 아낌)
+def analysis_max_tokens(card_count):
+    budget = max(ANALYSIS_MIN_TOKENS, ANALYSIS_BASE_TOKENS + card_count * ANALYSIS_TOKENS_PER_CARD)
+    return min(ANALYSIS_MAX_TOKENS, budget)
+
+# 응답이 잘렸을 때 다시 요청할 최대 토큰 수 (더 늘릴 수 없으면 None)
+def analysis_retry_max_tokens(max_tokens):
+    retry_tokens = min(ANALYSIS_RETRY_MAX_TOKENS, max_tokens * 2)
+    return retry_tokens if retry_tokens > max_tokens else None
+
+# 구조화 출력 응답 형식
+def analysis_response_format():
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "card_news", "strict": True, "schema": CARD_LIST_SCHEMA},
+    }
+
+# 카드뉴스 분석 요청 메시지 구성 함수 (원문은 입력 토큰 예산에 맞게 뒷부분을 잘라냄)
+def build_analysis_messages(text, card_count, structured=False):
+    template = ANALYSIS_JSON_TEMPLATE if structured else ANALYSIS_TEXT_TEMPLATE
+    return template.render("text", ANALYSIS_INPUT_TOKENS, text=text, card_count=card_count)
+
+# 카드뉴스 분석 요청 파라미터 (chat.completions.create 인자, Flask/ASGI 앱 공통)
+def build_analysis_request(text, structured=False):
+    card_count = extract_card_count(text)
+    params = {
+        "model": ANALYSIS_MODEL,
+        "messages": build_analysis_messages(text, card_count, structured),
+        "temperature": ANALYSIS_TEMPERATURE,
+        "max_tokens": analysis_max_tokens(card_count),
+    }
+    if structured:
+        # 구조화 출력 모드에서는 JSON 스키마로 카드 형식을 강제
+        params["response_format"] = analysis_response_format()
+    return params
+
+# 카드 한 장 재생성 요청 메시지 구성 함수 (나머지 카드는 제목/강조만 문맥으로 전달)
+def build_card_regeneration_messages(source_text, cards, index, instruction="", structured=False):
+    context = "\n".join(
+        f"카드 {i + 1}: {card.get('title', '')} / {card.get('highlight', '')}"
+        for i, card in enumerate(cards) if i != index
+    )
+    current = cards[index]
+    template = REGENERATION_JSON_TEMPLATE if structured else REGENERATION_TEXT_TEMPLATE
+    return template.render(
+        card_total=len(cards),
+        card_number=index + 1,
+        instruction=f"수정 요청: {instruction}" if instruction else "",
+        context=context or "없음",
+        title=current.get('title', ''),
+        content=current.get('content', ''),
+        highlight=current.get('highlight', ''),
+        prompt=current.get('prompt', ''),
+        source=source_text[:REGENERATE_SOURCE_CHARS] if source_text else "",
+    )
+
+# 긴 문서 섹션 요약 요청 메시지 구성 함수
+def build_summary_messages(section, index):
+    return SUMMARY_TEMPLATE.render(section_number=index + 1, section=section)
+
+# 이미지 생성용 프롬프트 구성 함수
+def build_image_prompt(prompt, title="", content="", highlight="", style="", background_color=""):
+    # 추가 스타일 정보는 사용자가 명시적으로 지정한 경우에만 포함
+    style_parts = []
+    if style:
+        style_parts.append(f"스타일: {style}")
+    if background_color:
+        style_parts.append(f"배경색: {background_color}")
+    additional_styles = "\n\n" + "\n".join(style_parts) if style_parts else ""
+
+    # 카드 정보를 조합하여 풍부한 프롬프트 구성 (스타일 옵션 제외)
+    return IMAGE_TEMPLATE.render(
+        prompt=prompt, title=title, highlight=highlight, content=content, additional_styles=additional_styles,
+    )
+
+# 텍스트 분석 결과 캐시 키
+# structured를 생략하면 ANALYSIS_OUTPUT_MODE를 따르며, 스트리밍은 항상 텍스트 템플릿이므로 False를 넘김
+def analysis_cache_key(text, structured=None):
+    if structured is None:
+        structured = ANALYSIS_OUTPUT_MODE == "json"
+    card_count = extract_card_count(text or "")
+    template = ANALYSIS_JSON_TEMPLATE if structured else ANALYSIS_TEXT_TEMPLATE
+    return make_cache_key(
+        "analyze",
+        text=text,
+        card_count=card_count,
+        output_mode="json" if structured else "text",
+        prompt=template.id,
+        model=ANALYSIS_MODEL,
+        temperature=ANALYSIS_TEMPERATURE,
+        max_tokens=analysis_max_tokens(card_count),
+        input_tokens=ANALYSIS_INPUT_TOKENS,
+    )
+
+# 업로드 파일 분석 결과 캐시 키 (파일 전체를 메모리에 올리지 않도록 파일 해시 사용)
+def upload_cache_key(file_digest, encoding):
+    return make_cache_key(
+        "analyze_file",
+        file_sha256=file_digest,
+        encoding=encoding,
+        output_mode=ANALYSIS_OUTPUT_MODE,
+        prompts=template_versions(),
+        model=ANALYSIS_MODEL,
+        temperature=ANALYSIS_TEMPERATURE,
+        max_tokens=[ANALYSIS_BASE_TOKENS, ANALYSIS_TOKENS_PER_CARD, ANALYSIS_MIN_TOKENS, ANALYSIS_MAX_TOKENS],
+        input_tokens=ANALYSIS_INPUT_TOKENS,
+        summary_model=SUMMARY_MODEL,
+    )
+
+# 요청의 이미지 품질 등급 확인 (지정하지 않으면 기본 등급)
+def resolve_image_tier(tier=None):
+    tier = DEFAULT_IMAGE_TIER if tier is None or tier == "" else tier
+    if not isinstance(tier, str):
+        # JSON 요청의 숫자/객체 값도 잘못된 요청(400)으로 처리
+        raise ValueError(f"Image tier must be a string (expected {', '.join(IMAGE_TIERS)})")
+    tier = tier.lower()
+    if tier not in IMAGE_TIERS:
+        raise ValueError(f"Unknown image tier: {tier} (expected {', '.join(IMAGE_TIERS)})")
+    return tier
+
+# 이미지 생성 결과 캐시 키 (등급별 크기/품질이 키에 포함되어 draft와 final이 따로 캐시됨)
+def image_cache_key(prompt, title="", content="", highlight="", style="", background_color="", tier=IMAGE_TIER_FINAL):
+    return make_cache_key(
+        "image",
+        enhanced_prompt=build_image_prompt(prompt, title, content, highlight, style, background_color),
+        style=style,
+        background_color=background_color,
+        model=IMAGE_MODEL,
+        size=IMAGE_TIERS[tier]["size"],
+        quality=IMAGE_TIERS[tier]["quality"],
+    )
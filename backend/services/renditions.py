@@ -0,0 +1,161 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow가 없으면 원본 이미지만 제공
+    Image = None
+
+try:
+    import pillow_avif  # noqa: F401  AVIF 인코더 플러그인 (선택)
+except ImportError:
+    pass
+
+from services.blob_store import is_valid_key
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 렌디션 이름별 최대 변 길이 (None은 원본 크기 유지, 형식만 변환)
+RENDITIONS = {
+    "thumb": int(os.getenv("RENDITION_THUMB_SIZE", "256")),
+    "preview": int(os.getenv("RENDITION_PREVIEW_SIZE", "512")),
+    "full": None,
+}
+# 형식별 Pillow 저장 옵션
+_FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": int(os.getenv("RENDITION_WEBP_QUALITY", "80")), "method": 4}),
+    "avif": ("AVIF", "image/avif", {"quality": int(os.getenv("RENDITION_AVIF_QUALITY", "60"))}),
+    "jpg": ("JPEG", "image/jpeg", {"quality": int(os.getenv("RENDITION_JPEG_QUALITY", "85")), "optimize": True}),
+}
+# 이미지 생성 직후 미리 만들어 둘 렌디션
+PREWARM_RENDITIONS = ("thumb", "preview")
+
+
+def available_formats():
+    """현재 Pillow 빌드에서 인코딩할 수 있는 렌디션 형식 (AVIF는 플러그인 필요)"""
+    if Image is None:
+        return []
+    Image.init()
+    return [name for name, (pil_format, _, _) in _FORMATS.items() if pil_format in Image.SAVE]
+
+
+def rendition_key(source_key, name, image_format):
+    """원본 콘텐츠 해시에서 파생된 렌디션 키 (<sha256>.<렌디션>.<형식>)"""
+    return f"{source_key.split('.', 1)[0]}.{name}.{image_format}"
+
+
+def negotiate_format(accept_header, formats):
+    """Accept 헤더에서 클라이언트가 디코딩할 수 있는 가장 작은 형식 선택 (AVIF > WebP > JPEG)"""
+    accept = (accept_header or "").lower()
+    for image_format in ("avif", "webp"):
+        if image_format in formats and f"image/{image_format}" in accept:
+            return image_format
+    return "jpg"
+
+
+def render(data, max_size, image_format):
+    """원본 이미지 바이트를 지정한 크기/형식으로 변환"""
+    pil_format, _, options = _FORMATS[image_format]
+    image = Image.open(io.BytesIO(data))
+    image.draft("RGB", (max_size, max_size) if max_size else image.size)
+    image = image.convert("RGB")
+    if max_size and max(image.size) > max_size:
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, format=pil_format, **options)
+    return output.getvalue()
+
+
+class RenditionService:
+    """
+    원본 카드 이미지에서 썸네일/미리보기/압축 형식 렌디션을 만들어 블롭 저장소에 저장
+    렌디션 키가 원본 해시에서 파생되므로 한 번 만든 렌디션은 모든 워커가 재사용하며,
+    같은 렌디션을 동시에 요청하면 한 번만 변환합니다.
+    """
+
+    def __init__(self, blob_store, max_workers=2):
+        self.blob_store = blob_store
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rendition")
+        self.formats = available_formats()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._counters = {"rendered": 0, "reused": 0, "errors": 0, "bytes_in": 0, "bytes_out": 0}
+
+    @property
+    def enabled(self):
+        return bool(self.formats)
+
+    def _count(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                self._counters[name] += amount
+
+    def supports(self, name, image_format):
+        return name in RENDITIONS and image_format in self.formats
+
+    def get(self, source_key, name, image_format, timeout=30):
+        """렌디션 키 반환 (없으면 작업자 풀에서 만들고 끝날 때까지 기다림)"""
+        return self.submit(source_key, name, image_format).result(timeout=timeout)
+
+    def submit(self, source_key, name, image_format):
+        """렌디션 생성 예약 후 future 반환 (이미 진행 중이면 같은 future 공유)"""
+        if not is_valid_key(source_key) or not self.supports(name, image_format):
+            raise ValueError(f"Unsupported rendition {name}/{image_format} for {source_key}")
+
+        key = rendition_key(source_key, name, image_format)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self.executor.submit(self._ensure, source_key, key, name, image_format)
+                self._pending[key] = future
+                future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def _forget(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _ensure(self, source_key, key, name, image_format):
+        if self.blob_store.exists(key):
+            self._count(reused=1)
+            return key
+        try:
+            with closing(self.blob_store.open(source_key)) as source:
+                data = source.read()
+            output = render(data, RENDITIONS[name], image_format)
+            self.blob_store.put(output, _FORMATS[image_format][1], key=key)
+        except Exception as e:
+            self._count(errors=1)
+            logger.error("Failed to render %s: %s", key, e)
+            raise
+        self._count(rendered=1, bytes_in=len(data), bytes_out=len(output))
+        logger.info("Rendered %s (%s -> %s bytes)", key, len(data), len(output))
+        return key
+
+    def prewarm(self, source_key):
+        """이미지 생성 직후 자주 쓰는 렌디션을 백그라운드에서 미리 생성"""
+        if not self.enabled or not is_valid_key(source_key):
+            return
+        for name in PREWARM_RENDITIONS:
+            for image_format in self.formats:
+                if image_format != "jpg":
+                    self.submit(source_key, name, image_format)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["pending"] = len(self._pending)
+        return stats
+
+
+def create_rendition_service(blob_store):
+    """환경 변수 설정으로 렌디션 서비스 생성 (RENDITION_WORKERS)"""
+    service = RenditionService(blob_store, max_workers=int(os.getenv("RENDITION_WORKERS", "2")))
+    if not service.enabled:
+        logger.warning("Pillow is not installed (or has no WebP/JPEG encoder), image renditions disabled")
+    return service
@@ -0,0 +1,307 @@
+import logging
+import os
+import re
+import struct
+import threading
+import time
+import unicodedata
+import zlib
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 시그니처 크기 (버킷 수)와 LSH 밴드 구성 (16밴드 x 8행: 유사도 약 0.7 이상부터 후보가 됨)
+SIGNATURE_BINS = 128
+LSH_BANDS = 16
+LSH_ROWS = SIGNATURE_BINS // LSH_BANDS
+# 문자 shingle 길이 (띄어쓰기를 제거한 정규화 텍스트 기준)
+SHINGLE_SIZE = 5
+
+_BIN_BITS = 7
+_VALUE_BITS = 32 - _BIN_BITS
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+_SIGNATURE_FORMAT = f"<{SIGNATURE_BINS}I"
+
+# 같은 기사의 다른 판본에서 달라지는 부분 (바이라인, 통신사 표기, 저작권 문구, 연락처, 링크)
+_NOISE_PATTERNS = [
+    re.compile(p) for p in (
+        r"https?://\S+",
+        r"[\w.+-]+@[\w-]+\.[\w.]+",
+        r"\([^()]{1,20}=[^()]{1,20}\)",
+        r"[가-힣]{2,4}\s*(?:선임|수석|인턴)?\s*기자(?![가-힣])",
+        r"(?:©|\(c\)|copyright).*$",
+        r"무단\s*전재.*$",
+        r"재배포\s*금지.*$",
+        r"\d{4}[.\-/]\s*\d{1,2}[.\-/]\s*\d{1,2}\.?(?:\s*\d{1,2}:\d{2})?",
+    )
+]
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_text(text):
+    """
+    유사도 비교용 본문 정규화
+    NFKC로 전각/호환 문자를 통일하고 소문자화한 뒤 바이라인·날짜·저작권 문구를 지우고,
+    문장부호와 공백을 모두 제거합니다 (띄어쓰기만 다른 판본도 같은 텍스트가 됨).
+    """
+    # NFKC는 ⓒ를 일반 문자 c로 바꾸므로 저작권 표시는 먼저 통일
+    text = unicodedata.normalize("NFKC", (text or "").replace("ⓒ", "©")).lower()
+    lines = []
+    for line in text.splitlines():
+        for pattern in _NOISE_PATTERNS:
+            line = pattern.sub(" ", line)
+        lines.append(line)
+    return _NON_WORD.sub("", " ".join(lines))
+
+
+def shingles(normalized, size=SHINGLE_SIZE):
+    """정규화된 텍스트의 문자 n-gram 집합"""
+    if len(normalized) <= size:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def minhash(normalized):
+    """
+    정규화된 텍스트의 MinHash 시그니처 (SIGNATURE_BINS개의 32비트 값을 담은 bytes, 비교할 내용이 없으면 None)
+    shingle마다 해시를 한 번만 계산하여 상위 비트로 버킷을 고르고 버킷별 최솟값을 남기는
+    one-permutation 방식이며, 빈 버킷은 오른쪽 버킷 값을 빌려 채웁니다(rotation densification).
+    """
+    mins = [None] * SIGNATURE_BINS
+    for shingle in shingles(normalized):
+        value = (zlib.crc32(shingle.encode("utf-8")) * 0x9E3779B1) & 0xFFFFFFFF
+        index = value >> _VALUE_BITS
+        value &= _VALUE_MASK
+        current = mins[index]
+        if current is None or value < current:
+            mins[index] = value
+    if all(value is None for value in mins):
+        return None
+
+    signature = []
+    for index in range(SIGNATURE_BINS):
+        distance = 0
+        while mins[(index + distance) % SIGNATURE_BINS] is None:
+            distance += 1
+        # 빌려온 거리를 상위 비트에 기록하여 직접 채워진 값과 구분
+        signature.append(mins[(index + distance) % SIGNATURE_BINS] | (distance << _VALUE_BITS))
+    return struct.pack(_SIGNATURE_FORMAT, *signature)
+
+
+def fingerprint(text):
+    """본문의 MinHash 시그니처"""
+    return minhash(normalize_text(text))
+
+
+def similarity(signature_a, signature_b):
+    """두 시그니처로 추정한 Jaccard 유사도 (0~1)"""
+    a = struct.unpack(_SIGNATURE_FORMAT, signature_a)
+    b = struct.unpack(_SIGNATURE_FORMAT, signature_b)
+    return sum(1 for x, y in zip(a, b) if x == y) / SIGNATURE_BINS
+
+
+def _band_keys(signature):
+    # 밴드 번호를 앞에 붙인 밴드 값의 해시 (프로세스 안에서만 사용하므로 내장 hash 사용)
+    width = LSH_ROWS * 4
+    return [hash(bytes((band,)) + signature[band * width:(band + 1) * width]) for band in range(LSH_BANDS)]
+
+
+class SimilarityIndex:
+    """
+    MinHash 시그니처의 LSH 색인 (프로세스 메모리)
+    밴드 값이 하나라도 같은 문서만 후보로 꺼내 시그니처를 비교하므로 조회 시간이 문서 수와 거의 무관하며,
+    max_entries를 넘으면 가장 오래된 문서부터 제거합니다.
+    """
+
+    def __init__(self, max_entries=20000):
+        self.max_entries = max_entries
+        self._signatures = {}
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._signatures
+
+    def add(self, doc_id, signature):
+        if doc_id in self._signatures:
+            return
+        self._signatures[doc_id] = signature
+        for key in _band_keys(signature):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # 대부분의 밴드 값은 문서 하나에만 있으므로 리스트 대신 ID를 그대로 저장
+                self._buckets[key] = doc_id
+            elif isinstance(bucket, list):
+                bucket.append(doc_id)
+            else:
+                self._buckets[key] = [bucket, doc_id]
+        while len(self._signatures) > self.max_entries:
+            self.remove(next(iter(self._signatures)))
+
+    def remove(self, doc_id):
+        signature = self._signatures.pop(doc_id, None)
+        if signature is None:
+            return
+        for key in _band_keys(signature):
+            bucket = self._buckets.get(key)
+            if isinstance(bucket, list):
+                bucket.remove(doc_id)
+                if len(bucket) == 1:
+                    self._buckets[key] = bucket[0]
+            elif bucket == doc_id:
+                del self._buckets[key]
+
+    def query(self, signature, threshold):
+        """유사도가 threshold 이상인 (문서 ID, 유사도) 목록 (유사도 내림차순)"""
+        candidates = set()
+        for key in _band_keys(signature):
+            bucket = self._buckets.get(key)
+            if isinstance(bucket, list):
+                candidates.update(bucket)
+            elif bucket is not None:
+                candidates.add(bucket)
+        matches = []
+        for doc_id in candidates:
+            score = similarity(signature, self._signatures[doc_id])
+            if score >= threshold:
+                matches.append((doc_id, score))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches
+
+
+class DuplicateDetector:
+    """
+    이전에 카드뉴스로 만든 기사와 거의 같은 기사 찾기 (덱 저장소의 시그니처로 색인 구성)
+    워커마다 색인을 메모리에 두고, 다른 워커가 만든 덱은 생성 시각 인덱스로 새 덱만 주기적으로 읽어 반영합니다.
+    """
+
+    # 다른 워커의 트랜잭션이 늦게 커밋되어도 놓치지 않도록 이미 읽은 구간을 겹쳐서 다시 읽는 시간 (초)
+    SYNC_OVERLAP = 30.0
+
+    def __init__(self, deck_store, threshold=0.85, min_chars=200, window_days=30, max_entries=20000,
+                 sync_interval=1.0):
+        self.deck_store = deck_store
+        self.threshold = threshold
+        self.min_chars = min_chars
+        self.window = window_days * 86400
+        self.sync_interval = sync_interval
+        self.index = SimilarityIndex(max_entries)
+        self._synced_until = None
+        self._synced_at = 0.0
+        # 색인 자료구조 잠금 (짧게만 잡음)과 동기화를 한 스레드만 하도록 막는 잠금
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._counters = {"lookups": 0, "matches": 0, "backfilled": 0}
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def fingerprint(self, text):
+        """색인 대상 기사의 시그니처 (기능이 꺼져 있거나 본문이 짧으면 None)"""
+        if not self.enabled:
+            return None
+        normalized = normalize_text(text)
+        return minhash(normalized) if len(normalized) >= self.min_chars else None
+
+    def add(self, deck_id, signature):
+        if signature is not None:
+            with self._lock:
+                self.index.add(deck_id, signature)
+
+    def find(self, text):
+        """임계값 이상으로 비슷한 이전 덱의 (덱 ID, 유사도) (없으면 None)"""
+        matches = self.find_all(text)
+        return matches[0] if matches else None
+
+    def find_all(self, text):
+        """임계값 이상으로 비슷한 이전 덱의 (덱 ID, 유사도) 목록 (유사도 내림차순)"""
+        signature = self.fingerprint(text)
+        if signature is None:
+            return []
+        self.sync()
+        with self._lock:
+            matches = self.index.query(signature, self.threshold)
+            self._counters["lookups"] += 1
+            if matches:
+                self._counters["matches"] += 1
+        return matches
+
+    def sync(self, force=False):
+        """
+        덱 저장소에서 마지막 동기화 이후 생성된 덱의 시그니처를 색인에 추가 (처음에는 최근 window 전체)
+        DB 조회와 시그니처 보완은 색인 잠금 밖에서 하므로 동시에 들어온 조회/추가는 기다리지 않으며,
+        다른 스레드가 이미 동기화 중이면 force가 아닌 호출은 건너뜁니다.
+        """
+        now = time.time()
+        if not force and now - self._synced_at < self.sync_interval:
+            return
+        if not self._sync_lock.acquire(blocking=force):
+            return
+        try:
+            if not force and now - self._synced_at < self.sync_interval:
+                return
+            since = now - self.window if self._synced_until is None else self._synced_until - self.SYNC_OVERLAP
+            latest = self._synced_until or since
+            rows = self.deck_store.list_fingerprints(since)
+            with self._lock:
+                known = {row[0] for row in rows if row[0] in self.index}
+
+            signatures = {}
+            backfill = {}
+            for deck_id, created_at, signature, source_text in rows:
+                latest = max(latest, created_at)
+                if deck_id in known:
+                    continue
+                if signature is None:
+                    # 시그니처 저장 이전에 만든 덱은 원문으로 계산하여 저장
+                    signature = self.fingerprint(source_text)
+                    if signature is None:
+                        continue
+                    backfill[deck_id] = signature
+                signatures[deck_id] = signature
+            if backfill:
+                self.deck_store.set_fingerprints(backfill)
+
+            with self._lock:
+                for deck_id, signature in signatures.items():
+                    self.index.add(deck_id, signature)
+                self._counters["backfilled"] += len(backfill)
+                indexed = len(self.index)
+            if self._synced_until is None:
+                logger.info("Loaded %s article fingerprints into the similarity index", indexed)
+            self._synced_until = latest
+            self._synced_at = now
+        finally:
+            self._sync_lock.release()
+
+    def warm(self):
+        """색인을 백그라운드에서 미리 불러옴 (워커 시작 시 호출)"""
+        if self.enabled:
+            threading.Thread(target=self._warm, name="similarity-warm", daemon=True).start()
+
+    def _warm(self):
+        try:
+            self.sync(force=True)
+        except Exception as e:
+            logger.error("Failed to load similarity index: %s", e)
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "indexed": len(self.index)}
+
+
+def create_duplicate_detector(deck_store):
+    """
+    환경 변수 설정으로 중복 기사 검출기 생성
+    DUPLICATE_THRESHOLD(기본 0.85, 0이면 끔), DUPLICATE_MIN_CHARS, DUPLICATE_WINDOW_DAYS, DUPLICATE_INDEX_MAX
+    """
+    return DuplicateDetector(
+        deck_store,
+        threshold=float(os.getenv("DUPLICATE_THRESHOLD", "0.85")),
+        min_chars=int(os.getenv("DUPLICATE_MIN_CHARS", "200")),
+        window_days=float(os.getenv("DUPLICATE_WINDOW_DAYS", "30")),
+        max_entries=int(os.getenv("DUPLICATE_INDEX_MAX", "20000")),
+    )
@@ -0,0 +1,236 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from services.deadlines import current_deadline, DeadlineExceededError
+
+try:
+    import fcntl
+except ImportError:  # Windows 등 fcntl이 없는 환경에서는 프로세스 간 병합을 사용하지 않음
+    fcntl = None
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """진행 중인 호출 하나 (먼저 온 요청이 실행하고 나머지는 결과를 기다림)"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    같은 키의 호출이 동시에 들어오면 한 번만 실행하고 결과를 공유하는 요청 병합 계층
+    lock_path를 지정하면 같은 파일을 쓰는 다른 프로세스(gunicorn 워커)와도 파일 잠금으로 실행을 직렬화하며,
+    잠금을 기다린 경우 lookup()으로 다른 프로세스가 저장한 결과를 먼저 확인합니다.
+    잠금은 lock_timeout이 지나면 포기하고 잠금 없이 실행하며, 그 전에 현재 요청의 기한이 지나면 DeadlineExceededError를 던집니다.
+    """
+
+    def __init__(self, lock_path=None, lock_timeout=300, poll_interval=0.05):
+        self.lock_path = lock_path if fcntl is not None else None
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counters = {"leaders": 0, "coalesced": 0, "cross_process": 0, "lock_waits": 0, "lock_timeouts": 0, "errors": 0}
+        self._offset_locks = {}
+        self._fd = None
+        self._fd_pid = None
+
+        if lock_path and fcntl is None:
+            logger.warning("fcntl is not available, cross-process request coalescing disabled")
+        if self.lock_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def do(self, key, fn, lookup=None):
+        """
+        key에 대해 fn()을 실행하여 결과 반환
+        같은 키가 이미 실행 중이면 그 결과(또는 예외)를 함께 받습니다.
+        lookup()은 (hit 여부, 값)을 반환해야 하며 프로세스 간 잠금을 기다린 뒤에만 호출됩니다.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is not None:
+                    call.waiters += 1
+                    self._counters["coalesced"] += 1
+                    leader = False
+                else:
+                    call = _Call()
+                    self._calls[key] = call
+                    self._counters["leaders"] += 1
+                    leader = True
+
+            if leader:
+                break
+            logger.info("Coalesced request for %s", key)
+            self._wait(call)
+            if isinstance(call.error, DeadlineExceededError):
+                # 먼저 온 요청의 기한이 끝나 중단된 것이므로 이 요청의 기한으로 다시 실행
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = self._run(key, fn, lookup)
+            return call.value
+        except Exception as e:
+            call.error = e
+            self._count("errors")
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    @staticmethod
+    def _wait(call):
+        """먼저 온 요청의 결과를 현재 요청의 기한까지 기다림 (클라이언트 연결이 끊기면 중단)"""
+        deadline = current_deadline()
+        if deadline is None:
+            call.done.wait()
+            return
+        while not call.done.wait(min(0.5, deadline.remaining() or 0.5)):
+            deadline.check("coalesce")
+
+    def _run(self, key, fn, lookup):
+        if not self.lock_path:
+            return fn()
+
+        offset = self._lock_offset(key)
+        fd = self._lock_fd()
+        local = self._hold_offset(offset)
+        try:
+            waited = self._acquire(fd, local, offset)
+            try:
+                if waited and lookup is not None:
+                    # 다른 워커가 방금 같은 작업을 끝냈다면 저장된 결과 사용
+                    hit, value = lookup()
+                    if hit:
+                        self._count("cross_process")
+                        logger.info("Reused result from another worker for %s", key)
+                        return value
+                return fn()
+            finally:
+                if waited is not None:
+                    fcntl.lockf(fd, fcntl.LOCK_UN, 1, offset)
+                    local.release()
+        finally:
+            self._drop_offset(offset)
+
+    @staticmethod
+    def _lock_offset(key):
+        # 키마다 잠금 파일의 서로 다른 1바이트 구간을 잠가 파일 하나로 처리
+        return int(hashlib.sha256(key.encode("utf-8")).hexdigest()[:8], 16) % (2 ** 31)
+
+    def _lock_fd(self):
+        # fcntl 잠금은 프로세스 단위이므로 fork 이후에는 새로 엶
+        with self._lock:
+            if self._fd is None or self._fd_pid != os.getpid():
+                self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                self._fd_pid = os.getpid()
+                # 부모 프로세스 스레드가 잡고 있던 구간 잠금은 자식에서 풀리지 않으므로 버림
+                self._offset_locks = {}
+            return self._fd
+
+    def _hold_offset(self, offset):
+        """
+        잠금 구간별 프로세스 내부 잠금 (fcntl 잠금은 프로세스 단위라 같은 구간을 쓰는 스레드끼리는 막지 못하고,
+        한 스레드가 풀면 다른 스레드의 잠금까지 풀리므로 먼저 이 잠금으로 직렬화)
+        """
+        with self._lock:
+            entry = self._offset_locks.get(offset)
+            if entry is None:
+                entry = self._offset_locks[offset] = [threading.Lock(), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def _drop_offset(self, offset):
+        with self._lock:
+            entry = self._offset_locks[offset]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._offset_locks[offset]
+
+    def _acquire(self, fd, local, offset):
+        """
+        키 구간의 잠금 획득 (프로세스 내부 잠금 다음에 프로세스 간 잠금)
+        바로 얻으면 False, 기다려서 얻으면 True, 시간 초과로 잠금 없이 진행하면 None을 반환합니다.
+        현재 요청의 기한이 먼저 지나면 DeadlineExceededError를 던집니다.
+        """
+        local_held = local.acquire(blocking=False)
+        if local_held and self._try_lockf(fd, offset):
+            return False
+
+        self._count("lock_waits")
+        stop_at = time.monotonic() + self.lock_timeout
+        try:
+            if not local_held:
+                local_held = self._wait_for(lambda timeout: local.acquire(timeout=timeout), stop_at)
+            if local_held and self._wait_for(lambda timeout: self._try_lockf(fd, offset, timeout), stop_at):
+                return True
+        except BaseException:
+            if local_held:
+                local.release()
+            raise
+
+        if local_held:
+            local.release()
+        self._count("lock_timeouts")
+        logger.warning("Timed out waiting for cross-process lock, running without it (offset %s)", offset)
+        return None
+
+    def _wait_for(self, attempt, stop_at):
+        """
+        attempt(timeout)가 성공할 때까지 poll_interval 단위로 반복
+        stop_at(lock_timeout)이 지나면 False를 반환하고, 그 전에 현재 요청의 기한이 지나면 예외를 던집니다.
+        """
+        deadline = current_deadline()
+        while True:
+            if deadline is not None:
+                deadline.check("coalesce")
+            timeout = min(self.poll_interval, stop_at - time.monotonic())
+            if timeout <= 0:
+                return False
+            remaining = deadline.remaining() if deadline is not None else None
+            if attempt(timeout if remaining is None else max(0.0, min(timeout, remaining))):
+                return True
+
+    @staticmethod
+    def _try_lockf(fd, offset, timeout=0):
+        """fcntl 잠금을 기다리지 않고 시도 (실패하면 timeout만큼 쉬고 False)"""
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, offset)
+            return True
+        except OSError:
+            if timeout:
+                time.sleep(timeout)
+            return False
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = len(self._calls)
+            stats["waiting"] = sum(call.waiters for call in self._calls.values())
+        stats["cross_process_enabled"] = bool(self.lock_path)
+        return stats
+
+
+def create_singleflight():
+    """환경 변수 설정으로 요청 병합 계층 생성 (SINGLEFLIGHT_LOCK 지정 시 워커 간 병합)"""
+    return SingleFlight(
+        lock_path=os.getenv("SINGLEFLIGHT_LOCK") or None,
+        lock_timeout=int(os.getenv("SINGLEFLIGHT_LOCK_TIMEOUT", "300")),
+    )
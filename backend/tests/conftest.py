@@ -0,0 +1,15 @@
+import os
+import tempfile
+
+# flask_app은 import 시 저장소를 만들므로 테스트용 임시 디렉터리를 먼저 지정
+_data_dir = tempfile.mkdtemp(prefix="cardnews-tests-")
+for name, filename in (
+    ("JOB_QUEUE_DB", "jobs.db"),
+    ("DECK_STORE_DB", "decks.db"),
+    ("RESULT_CACHE_DB", "cache.db"),
+    ("BLOB_STORE_DIR", "images"),
+    ("BATCH_OUTPUT_DIR", "batches"),
+):
+    os.environ.setdefault(name, os.path.join(_data_dir, filename))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("OPENAI_BASE_URL", "http://127.0.0.1:9/v1")
@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import flask_app
+from services import openai_service
+
+TEXT = "카드수: 1\n정부가 내년도 예산안을 발표했다."
+TRUNCATED = "카드 1:\n제목: 예산안\n내용: 정부가"
+COMPLETE = "카드 1:\n제목: 예산안\n내용: 정부가 예산안을 발표했다.\n강조: 예산 발표\n이미지: 국회 의사당"
+
+
+def response(content, finish_reason):
+    choice = SimpleNamespace(message=SimpleNamespace(content=content), finish_reason=finish_reason)
+    return SimpleNamespace(choices=[choice], usage=None)
+
+
+class FakeCompletions:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.max_tokens = []
+
+    def create(self, **params):
+        self.max_tokens.append(params["max_tokens"])
+        return self.responses.pop(0)
+
+
+class FakeAsyncCompletions(FakeCompletions):
+    async def create(self, **params):
+        return super().create(**params)
+
+
+def fake_client(completions):
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+@pytest.fixture
+def text_mode(monkeypatch):
+    monkeypatch.setattr(flask_app, "ANALYSIS_OUTPUT_MODE", "text")
+    monkeypatch.setattr(openai_service, "ANALYSIS_OUTPUT_MODE", "text")
+
+
+def test_truncated_response_is_retried_with_larger_budget(monkeypatch, text_mode):
+    completions = FakeCompletions([response(TRUNCATED, "length"), response(COMPLETE, "stop")])
+    monkeypatch.setattr(flask_app, "get_openai_client", lambda: fake_client(completions))
+    cards = flask_app.analyze_text(TEXT)
+    assert len(completions.max_tokens) == 2
+    assert completions.max_tokens[1] > completions.max_tokens[0]
+    assert cards[0]["highlight"] == "예산 발표"
+
+
+def test_truncated_response_is_retried_only_once(monkeypatch, text_mode):
+    completions = FakeCompletions([response(TRUNCATED, "length"), response(TRUNCATED, "length")])
+    monkeypatch.setattr(flask_app, "get_openai_client", lambda: fake_client(completions))
+    flask_app.analyze_text(TEXT)
+    assert len(completions.max_tokens) == 2
+
+
+def test_complete_response_is_not_retried(monkeypatch, text_mode):
+    completions = FakeCompletions([response(COMPLETE, "stop")])
+    monkeypatch.setattr(flask_app, "get_openai_client", lambda: fake_client(completions))
+    flask_app.analyze_text(TEXT)
+    assert len(completions.max_tokens) == 1
+
+
+def test_async_service_retries_truncated_response(monkeypatch, text_mode):
+    completions = FakeAsyncCompletions([response(TRUNCATED, "length"), response(COMPLETE, "stop")])
+    monkeypatch.setattr(openai_service, "get_async_client", lambda: fake_client(completions))
+    cards = asyncio.run(openai_service.OpenAIService.analyze_text(TEXT))
+    assert len(completions.max_tokens) == 2
+    assert completions.max_tokens[1] > completions.max_tokens[0]
+    assert cards[0].highlight == "예산 발표"
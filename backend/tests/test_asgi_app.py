@@ -0,0 +1,131 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import asgi_app
+from models.card_news import Card
+from services.openai_service import OpenAIService, get_blob_store
+
+IMAGE = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def client():
+    with TestClient(asgi_app.app) as client:
+        yield client
+
+
+@pytest.fixture
+def image_url():
+    store = get_blob_store()
+    return store.url_for(store.put(IMAGE))
+
+
+def test_image_etag_and_not_modified(client, image_url):
+    response = client.get(image_url)
+    assert response.status_code == 200
+    assert response.content == IMAGE
+    etag = response.headers["etag"]
+    assert response.headers["accept-ranges"] == "bytes"
+
+    assert client.get(image_url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(image_url, headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert client.get(image_url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-9", 0, 9),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-24", 1000, 1023),
+    ("bytes=10-5000", 10, 1023),
+])
+def test_image_range(client, image_url, header, start, end):
+    response = client.get(image_url, headers={"Range": header})
+    assert response.status_code == 206
+    assert response.content == IMAGE[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(IMAGE)}"
+
+
+def test_image_range_not_satisfiable(client, image_url):
+    response = client.get(image_url, headers={"Range": "bytes=5000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(IMAGE)}"
+
+
+def test_image_range_ignored_when_if_range_differs(client, image_url):
+    response = client.get(image_url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == IMAGE
+
+
+@pytest.fixture
+def analyzed(monkeypatch):
+    texts = []
+
+    async def fake_analyze_text(text):
+        texts.append(text)
+        return [Card(title="제목", content="내용", highlight="강조")]
+
+    monkeypatch.setattr(OpenAIService, "analyze_text", staticmethod(fake_analyze_text))
+    return texts
+
+
+def test_upload_decodes_cp949(client, analyzed):
+    body = "카드수: 3\n\n정부가 예산안을 발표했다.".encode("cp949")
+    response = client.post("/api/upload-file", files={"file": ("article.txt", body, "text/plain")})
+    assert response.status_code == 200
+    assert response.json()["cards"][0]["title"] == "제목"
+    assert analyzed == ["카드수: 3\n\n정부가 예산안을 발표했다."]
+
+    again = client.post("/api/upload-file", files={"file": ("article.txt", body, "text/plain")})
+    assert again.json()["cached"] is True
+
+
+def test_upload_too_large(client, analyzed, monkeypatch):
+    monkeypatch.setattr(asgi_app, "UPLOAD_MAX_BYTES", 10)
+    response = client.post("/api/upload-file", files={"file": ("article.txt", b"x" * 100, "text/plain")})
+    assert response.status_code == 413
+    assert analyzed == []
+
+
+def test_long_upload_is_summarized_by_section(client, analyzed, monkeypatch):
+    import services.openai_service as openai_service
+
+    async def fake_summarize(section, index):
+        return f"요약 {index + 1}"
+
+    monkeypatch.setattr(openai_service, "LONG_TEXT_TOKEN_LIMIT", 50)
+    monkeypatch.setattr(asgi_app, "CHUNK_SECTION_TOKENS", 40)
+    monkeypatch.setattr(OpenAIService, "summarize_section", staticmethod(fake_summarize))
+    paragraphs = ["카드수: 4"] + [f"{index}번째 문단입니다. " * 5 for index in range(6)]
+    body = "\n\n".join(paragraphs).encode("utf-8")
+
+    response = client.post("/api/upload-file", files={"file": ("long.txt", body, "text/plain")}, data={"noCache": "1"})
+    assert response.status_code == 200
+    composed = analyzed[-1]
+    assert composed.startswith("카드수: 4\n\n요약 1")
+
+
+def test_long_text_is_summarized_by_section(client, analyzed, monkeypatch):
+    import services.openai_service as openai_service
+
+    summarized = []
+
+    async def fake_summarize(section, index):
+        summarized.append(index)
+        return f"요약 {index + 1}"
+
+    monkeypatch.setattr(openai_service, "LONG_TEXT_TOKEN_LIMIT", 50)
+    monkeypatch.setattr(openai_service, "CHUNK_SECTION_TOKENS", 40)
+    monkeypatch.setattr(OpenAIService, "summarize_section", staticmethod(fake_summarize))
+    text = "\n\n".join(["카드수: 4"] + [f"{index}번째 문단입니다. " * 5 for index in range(6)])
+
+    response = client.post("/api/analyze-text", json={"text": text, "noCache": True})
+    assert response.status_code == 200
+    assert len(summarized) > 1
+    assert analyzed[-1].startswith("카드수: 4\n\n요약 1")
+
+
+def test_short_text_is_analyzed_directly(client, analyzed):
+    response = client.post("/api/analyze-text", json={"text": "짧은 기사", "noCache": True})
+    assert response.status_code == 200
+    assert analyzed == ["짧은 기사"]
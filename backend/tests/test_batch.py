@@ -0,0 +1,96 @@
+import json
+import sys
+
+import pytest
+
+import batch_cli
+import flask_app
+from services import batch
+
+CARDS = [{"title": "제목", "content": "내용", "highlight": "강조", "image": "", "prompt": "그림"}]
+
+
+@pytest.fixture
+def analyzed(monkeypatch):
+    articles = []
+
+    def fake_analyze(article, bypass_cache=False):
+        articles.append(article["id"])
+        return {"cards": CARDS, "cached": False, "deck_id": None}
+
+    monkeypatch.setattr(flask_app, "analyze_batch_article", fake_analyze)
+    return articles
+
+
+@pytest.fixture
+def writers(monkeypatch):
+    opened = []
+
+    class RecordingWriter(batch.JsonlWriter):
+        def __init__(self, path, sync=True):
+            super().__init__(path, sync)
+            self.closed = False
+            opened.append(self)
+
+        def close(self):
+            self.closed = True
+            super().close()
+
+    monkeypatch.setattr(flask_app, "JsonlWriter", RecordingWriter)
+    return opened
+
+
+def test_batch_stream_writes_and_closes_results(analyzed, writers):
+    client = flask_app.app.test_client()
+    response = client.post("/api/analyze-batch", json={"articles": [{"id": "a", "text": "본문 1"}, {"id": "b", "text": "본문 2"}]})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[-1]["type"] == "done" and lines[-1]["succeeded"] == 2
+    assert sorted(analyzed) == ["a", "b"]
+    assert len(writers) == 1 and writers[0].closed
+
+
+def test_batch_output_closed_when_client_disconnects(analyzed, writers):
+    client = flask_app.app.test_client()
+    response = client.post("/api/analyze-batch", json={"articles": [{"id": "a", "text": "본문"}]}, buffered=False)
+    response.close()
+    assert all(writer.closed for writer in writers)
+
+
+def test_batch_output_opened_by_stream(analyzed, writers):
+    with flask_app.app.test_request_context("/api/analyze-batch", method="POST", json={"articles": [{"id": "a", "text": "본문"}]}):
+        flask_app.start_request_deadline()
+        response = flask_app.api_analyze_batch()
+        # 응답 본문을 읽기 전에는 결과 파일을 열지 않음
+        assert writers == []
+        response.close()
+    assert writers == []
+
+
+def run_cli(monkeypatch, tmp_path, *options):
+    source = tmp_path / "articles.jsonl"
+    source.write_text("\n".join(json.dumps({"id": str(i), "text": f"본문 {i}"}) for i in range(3)), encoding="utf-8")
+    output = tmp_path / "decks.jsonl"
+    monkeypatch.setattr(sys, "argv", ["batch_cli.py", str(source), "-o", str(output), *options])
+    return batch_cli.main(), output
+
+
+def test_cli_caps_concurrency_and_warms_index(monkeypatch, tmp_path, capsys, analyzed):
+    warmed = []
+    monkeypatch.setattr(flask_app.duplicates, "warm", lambda: warmed.append(True))
+    monkeypatch.setattr(flask_app, "BATCH_MAX_WORKERS", 2)
+
+    status, output = run_cli(monkeypatch, tmp_path, "--concurrency", "50")
+    assert status == 0
+    stderr = capsys.readouterr().err
+    assert "using 2" in stderr
+    assert "Processing with concurrency 2" in stderr
+    assert warmed == [True]
+    assert len(output.read_text(encoding="utf-8").splitlines()) == 3
+
+
+def test_cli_resumes_completed_articles(monkeypatch, tmp_path, analyzed):
+    run_cli(monkeypatch, tmp_path)
+    del analyzed[:]
+    status, _ = run_cli(monkeypatch, tmp_path)
+    assert status == 0
+    assert analyzed == []
@@ -0,0 +1,88 @@
+import base64
+import io
+import random
+import threading
+
+import pytest
+from openai import OpenAI
+from PIL import Image
+
+from bench.mock_openai import MockConfig, MockOpenAIServer, chat_content, make_png, parse_latency
+from bench.run_bench import bench_parser, percentile
+from services.card_parser import PARSE_STRUCTURED, PARSE_TEXT, parse_analysis_response_with_outcome
+
+
+@pytest.fixture
+def mock_server():
+    config = MockConfig(chat_latency="fixed:0", image_latency="fixed:0", image_bytes=4096)
+    server = MockOpenAIServer(("127.0.0.1", 0), config)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_parse_latency_distributions():
+    assert parse_latency("fixed:0.5")() == 0.5
+    assert 0.2 <= parse_latency("uniform:0.2,0.3")() <= 0.3
+    assert parse_latency("normal:0,1")() >= 0
+    with pytest.raises(ValueError):
+        parse_latency("poisson:1")
+
+
+def test_mock_png_is_a_decodable_image_of_requested_size():
+    data = make_png(64 * 1024)
+    assert abs(len(data) - 64 * 1024) < 8 * 1024
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        assert image.format == "PNG" and image.width == 1024
+
+
+@pytest.mark.parametrize("structured, outcome", [(False, PARSE_TEXT), (True, PARSE_STRUCTURED)])
+def test_mock_chat_content_parses_into_requested_card_count(structured, outcome):
+    body = {"messages": [{"role": "user", "content": "카드수: 7\n원문"}]}
+    if structured:
+        body["response_format"] = {"type": "json_schema"}
+
+    cards, parsed_as = parse_analysis_response_with_outcome(chat_content(body, random.Random(1)), structured)
+    assert parsed_as == outcome
+    assert len(cards) == 7
+    assert all(card["title"] and card["prompt"] for card in cards)
+
+
+def test_openai_client_talks_to_mock_server(mock_server):
+    client = OpenAI(api_key="bench", base_url=f"http://127.0.0.1:{mock_server.server_port}/v1", max_retries=0)
+
+    completion = client.chat.completions.create(model="m", messages=[{"role": "user", "content": "카드수: 3"}])
+    assert len(parse_analysis_response_with_outcome(completion.choices[0].message.content)[0]) == 3
+    assert completion.usage.total_tokens > 0
+
+    stream = client.chat.completions.create(
+        model="m", messages=[{"role": "user", "content": "카드수: 2"}], stream=True,
+        stream_options={"include_usage": True},
+    )
+    chunks = list(stream)
+    text = "".join(chunk.choices[0].delta.content or "" for chunk in chunks if chunk.choices)
+    assert len(parse_analysis_response_with_outcome(text)[0]) == 2
+    assert chunks[-1].usage is not None
+
+    image = client.images.generate(model="gpt-image-1", prompt="p")
+    assert base64.b64decode(image.data[0].b64_json).startswith(b"\x89PNG")
+    assert mock_server.counts == {"/v1/chat/completions": 2, "/v1/images/generations": 1}
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile([], 50) == 0.0
+    assert percentile(values, 50) == 51
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+
+
+def test_parser_bench_reports_each_size_and_mode():
+    rows = bench_parser(1)
+    assert {(row["mode"], row["cards"]) for row in rows} == {
+        (mode, count) for mode in ("text", "json") for count in (1, 5, 10, 20, 50)
+    }
+    assert all(row["us_per_parse"] > 0 for row in rows)
@@ -0,0 +1,67 @@
+import base64
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import flask_app
+from services.blob_store import LocalBlobStore, is_valid_key, make_key, store_generated_image
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"card-image"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalBlobStore(str(tmp_path))
+
+
+def test_put_is_content_addressed_and_idempotent(store):
+    key = store.put(PNG)
+    assert key == make_key(PNG) and key.endswith(".png")
+    # 해시 앞 2자리 디렉터리에 저장
+    assert os.path.dirname(store.path(key)).endswith(key[:2])
+    assert store.put(PNG) == key
+    with store.open(key) as f:
+        assert f.read() == PNG
+    assert os.listdir(os.path.dirname(store.path(key))) == [key]
+
+
+def test_invalid_keys_are_rejected(store):
+    for key in ("", "../etc/passwd", "abc.png", "0" * 64):
+        assert not is_valid_key(key)
+    with pytest.raises(ValueError):
+        store.path("../secret.png")
+
+
+def test_url_round_trips_to_key(store):
+    key = store.put(PNG)
+    url = store.url_for(key)
+    assert url == f"/api/images/{key}"
+    assert store.key_for_url(f"http://localhost{url}?rendition=thumb") == key
+    assert store.key_for_url(f"https://images.example.com/{key}") is None
+    assert store.key_for_url("") is None
+
+
+def test_generated_image_is_stored_once_decoded(store):
+    image = SimpleNamespace(b64_json=base64.b64encode(PNG).decode(), url=None)
+    url = store_generated_image(store, image)
+    assert store.key_for_url(url) == make_key(PNG)
+    # URL만 있는 이전 모델 응답은 그대로 반환
+    legacy = SimpleNamespace(b64_json=None, url="https://images.example.com/a.png")
+    assert store_generated_image(store, legacy) == legacy.url
+
+
+def test_image_endpoint_serves_blob_with_immutable_caching():
+    key = flask_app.blob_store.put(PNG)
+    client = flask_app.app.test_client()
+
+    response = client.get(f"/api/images/{key}")
+    assert response.status_code == 200
+    assert response.data == PNG
+    assert response.mimetype == "image/png"
+    assert response.headers["ETag"] == f'"{key}"'
+    assert "immutable" in response.headers["Cache-Control"]
+
+    assert client.get(f"/api/images/{key}", headers={"If-None-Match": f'"{key}"'}).status_code == 304
+    assert client.get(f"/api/images/{'0' * 64}.png").status_code == 404
+    assert client.get("/api/images/not-a-key.png").status_code == 404
@@ -0,0 +1,84 @@
+import pytest
+
+from services import cache
+from services.cache import ResultCache, make_cache_key, normalize_text
+
+
+def test_cache_key_ignores_whitespace_and_unicode_form():
+    composed = make_cache_key("analyze", text="한국어  본문\n", count=3)
+    decomposed = make_cache_key("analyze", text="한국어 본문", count=3)
+    assert composed == decomposed
+    assert normalize_text(None) == ""
+
+
+def test_cache_key_depends_on_namespace_and_params():
+    key = make_cache_key("analyze", text="본문", count=3)
+    assert key.startswith("analyze:")
+    assert key != make_cache_key("analyze", text="본문", count=4)
+    assert key != make_cache_key("image", text="본문", count=3)
+
+
+def test_lru_evicts_oldest_entry():
+    result_cache = ResultCache(max_entries=2)
+    result_cache.set("a", 1)
+    result_cache.set("b", 2)
+    assert result_cache.get("a") == (True, 1)
+    result_cache.set("c", 3)
+    assert result_cache.get("b") == (False, None)
+    assert result_cache.get("a") == (True, 1)
+    assert result_cache.stats()["evictions"] == 1
+
+
+def test_byte_limit_skips_oversized_values():
+    result_cache = ResultCache(max_bytes=10)
+    result_cache.set("big", "x" * 100)
+    assert result_cache.get("big") == (False, None)
+    assert result_cache.stats()["bytes"] == 0
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    result_cache = ResultCache(ttl=10)
+    result_cache.set("a", 1)
+    now[0] += 11
+    assert result_cache.get("a") == (False, None)
+    assert result_cache.stats()["entries"] == 0
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResultCache(disk_path=path).set("key", {"cards": ["카드"]})
+    other = ResultCache(disk_path=path)
+    assert other.get("key") == (True, {"cards": ["카드"]})
+    assert other.stats()["disk_hits"] == 1
+
+
+def test_get_or_compute_respects_bypass_and_should_store():
+    result_cache = ResultCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert result_cache.get_or_compute("k", compute) == (1, False)
+    assert result_cache.get_or_compute("k", compute) == (1, True)
+    assert result_cache.get_or_compute("k", compute, bypass=True) == (2, False)
+    assert result_cache.get("k") == (True, 2)
+    assert result_cache.get_or_compute("skip", lambda: [], should_store=bool) == ([], False)
+    assert result_cache.get("skip") == (False, None)
+
+
+def test_disk_hit_keeps_stored_expiry(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    path = str(tmp_path / "cache.db")
+    ResultCache(ttl=10, disk_path=path).set("key", "value")
+
+    now[0] += 8
+    other = ResultCache(ttl=10, disk_path=path)
+    assert other.get("key") == (True, "value")
+    # 메모리로 올린 항목도 처음 저장할 때의 만료 시각에 만료됨
+    now[0] += 3
+    assert other.get("key") == (False, None)
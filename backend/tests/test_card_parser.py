@@ -0,0 +1,86 @@
+from services.card_parser import CardStreamParser, parse_analysis_response, parse_cards
+
+
+RESPONSE = """카드뉴스는 카드 5장으로 구성된 흐름으로 준비했습니다.
+카드 5장으로 구성된 구성안입니다.
+
+카드 1:
+제목: 첫 번째 제목
+내용: 첫 번째 내용
+강조: 첫 번째 강조
+이미지: 첫 번째 이미지
+
+카드 2:
+제목: 두 번째 제목
+이미지: 도시 야경을 내려다보는
+  넓은 전망의 일러스트
+내용: 두 번째 내용
+강조: 두 번째 강조
+"""
+
+
+def test_preamble_does_not_start_card():
+    cards = parse_cards(RESPONSE)
+    assert [card["title"] for card in cards] == ["첫 번째 제목", "두 번째 제목"]
+    assert cards[0]["content"] == "첫 번째 내용"
+
+
+def test_header_requires_colon():
+    cards = parse_cards("카드 3장 요약\n제목: 하나\n내용: 본문")
+    assert len(cards) == 1
+    assert cards[0]["title"] == "하나"
+
+
+def test_fields_after_image_are_kept():
+    card = parse_cards(RESPONSE)[1]
+    assert card["content"] == "두 번째 내용"
+    assert card["highlight"] == "두 번째 강조"
+
+
+def test_multiline_image_prompt():
+    card = parse_cards(RESPONSE)[1]
+    assert card["prompt"] == "도시 야경을 내려다보는 넓은 전망의 일러스트"
+
+
+def test_header_title_used_without_title_field():
+    cards = parse_cards("카드 1: 머리 제목\n내용: 본문\n이미지: 그림")
+    assert cards[0]["title"] == "머리 제목"
+    assert cards[0]["content"] == "본문"
+
+
+def test_title_without_header_starts_new_card():
+    cards = parse_cards("제목: A\n내용: a\n제목: B\n내용: b")
+    assert [(card["title"], card["content"]) for card in cards] == [("A", "a"), ("B", "b")]
+
+
+def test_stream_emits_card_when_next_card_starts():
+    parser = CardStreamParser()
+    assert parser.feed("카드 1:\n제목: 첫 번째\n이미지: 그림\n") == []
+    # 이미지 뒤에 오는 항목도 같은 카드에 들어가야 하므로 다음 카드가 시작될 때 완성
+    assert parser.feed("강조: 늦게 온 강조\n") == []
+    emitted = parser.feed("카드 2:\n제목: 두 번째\n")
+    assert [card["highlight"] for card in emitted] == ["늦게 온 강조"]
+    assert [card["title"] for card in parser.close()] == ["두 번째"]
+    assert parser.emitted == 2
+
+
+def test_stream_matches_batch_parser_for_any_chunking():
+    expected = parse_cards(RESPONSE)
+    for size in (1, 3, 7, 64):
+        parser = CardStreamParser()
+        cards = []
+        for start in range(0, len(RESPONSE), size):
+            cards.extend(parser.feed(RESPONSE[start:start + size]))
+        cards.extend(parser.close())
+        assert cards == expected
+
+
+def test_structured_response_falls_back_to_text_parser():
+    cards = parse_analysis_response(RESPONSE, structured=True)
+    assert [card["title"] for card in cards] == ["첫 번째 제목", "두 번째 제목"]
+
+
+def test_structured_response():
+    content = '{"cards": [{"title": " 제목 ", "content": "내용", "highlight": "강조", "prompt": "그림"}, {"title": ""}]}'
+    cards = parse_analysis_response(content, structured=True)
+    assert cards == [{"title": "제목", "content": "내용", "highlight": "강조", "image": "", "prompt": "그림"}]
@@ -0,0 +1,98 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.chunking import (
+    UploadTooLargeError, detect_encoding, hash_stream, iter_decoded_text, iter_sections, map_sections,
+)
+from services.prompts import estimate_tokens
+
+ARTICLE = "\n\n".join(f"{i}번째 문단입니다. 정부가 예산안을 발표했다. 국회는 심사를 시작했다." for i in range(40))
+
+
+def test_detect_encoding_prefers_bom_then_utf8_then_cp949():
+    assert detect_encoding("﻿본문".encode("utf-8")) == "utf-8-sig"
+    assert detect_encoding("본문".encode("utf-16")) == "utf-16"
+    assert detect_encoding("본문".encode("utf-8")) == "utf-8"
+    assert detect_encoding("본문".encode("cp949")) == "cp949"
+
+
+def test_detect_encoding_accepts_utf8_cut_mid_character():
+    assert detect_encoding("본문".encode("utf-8")[:-1]) == "utf-8"
+
+
+def test_hash_stream_rewinds_and_limits_size():
+    data = ARTICLE.encode("utf-8")
+    stream = io.BytesIO(data)
+    digest, sample, size = hash_stream(stream, len(data), chunk_size=100)
+    assert size == len(data)
+    assert sample == data[:len(sample)]
+    assert stream.tell() == 0
+    assert hash_stream(io.BytesIO(data), len(data))[0] == digest
+    with pytest.raises(UploadTooLargeError):
+        hash_stream(io.BytesIO(data), len(data) - 1)
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "cp949"])
+def test_decoding_small_chunks_keeps_multibyte_characters(encoding):
+    data = ARTICLE.replace("\n", "\r\n").encode(encoding)
+    assert "".join(iter_decoded_text(io.BytesIO(data), encoding, chunk_size=7)) == ARTICLE
+
+
+def test_sections_respect_token_limit_and_keep_paragraphs():
+    sections = list(iter_sections([ARTICLE], 120))
+    assert len(sections) > 1
+    assert all(estimate_tokens(section) <= 120 for section in sections)
+    assert "\n\n".join(sections) == ARTICLE
+
+
+def test_sections_do_not_depend_on_chunk_boundaries():
+    chunks = [ARTICLE[i:i + 13] for i in range(0, len(ARTICLE), 13)]
+    assert list(iter_sections(chunks, 120)) == list(iter_sections([ARTICLE], 120))
+
+
+def test_oversized_paragraph_is_split():
+    paragraph = "가" * 500
+    sections = list(iter_sections([paragraph], 100))
+    assert all(estimate_tokens(section) <= 100 for section in sections)
+    assert "".join(sections) == paragraph
+
+
+def test_map_sections_keeps_order_with_bounded_in_flight():
+    sections = [f"섹션 {i}" for i in range(10)]
+    with ThreadPoolExecutor(4) as executor:
+        results = map_sections(iter(sections), lambda section, index: (index, section), executor, 2)
+    assert results == list(enumerate(sections))
+
+
+def test_map_sections_propagates_errors():
+    def fail(section, index):
+        raise RuntimeError(section)
+
+    with ThreadPoolExecutor(2) as executor, pytest.raises(RuntimeError):
+        map_sections(["하나"], fail, executor, 2)
+
+
+def test_map_sections_cancels_pending_sections_on_error():
+    import threading
+
+    release = threading.Event()
+    started = []
+
+    def fn(section, index):
+        started.append(index)
+        if index == 0:
+            raise RuntimeError("boom")
+        release.wait(5)
+        return index
+
+    with ThreadPoolExecutor(1) as executor:
+        try:
+            with pytest.raises(RuntimeError):
+                map_sections([f"섹션 {i}" for i in range(4)], fn, executor, 4)
+        finally:
+            release.set()
+    # 첫 섹션이 실패한 뒤 대기 중이던 섹션은 실행되지 않음 (작업자 하나는 섹션 1에서 멈춰 있을 수 있음)
+    assert started[0] == 0
+    assert 2 not in started and 3 not in started
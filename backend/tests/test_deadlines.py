@@ -0,0 +1,83 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.deadlines import (
+    REASON_DISCONNECT, REASON_TIMEOUT, Deadline, DeadlineExceededError, bind_deadline, current_deadline, parse_timeout,
+    request_deadline, with_deadline,
+)
+
+
+class FakeClient:
+    def with_options(self, timeout):
+        return ("client", timeout)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None), ("", None), ("abc", None), ("0", None), ("-1", None), ("nan", None), ("inf", None),
+    ("2.5", 2.5), ("100", 30),
+])
+def test_parse_timeout(value, expected):
+    assert parse_timeout(value, maximum=30) == expected
+
+
+def test_deadline_without_timeout_only_cancels():
+    deadline = Deadline()
+    assert deadline.remaining() is None
+    assert not deadline.expired
+    deadline.cancel()
+    assert deadline.remaining() == 0
+    with pytest.raises(DeadlineExceededError) as error:
+        deadline.check("test")
+    assert error.value.reason == REASON_DISCONNECT
+
+
+def test_deadline_expires():
+    deadline = Deadline(0.05)
+    assert 0 < deadline.remaining() <= 0.05
+    time.sleep(0.06)
+    assert deadline.expired
+    error = deadline.error("openai")
+    assert error.reason == REASON_TIMEOUT
+    assert "openai" in str(error)
+
+
+def test_wait_cancelled_wakes_on_cancel():
+    deadline = Deadline()
+    assert not deadline.wait_cancelled(0.01)
+    deadline.cancel()
+    assert deadline.wait_cancelled(5)
+
+
+def test_request_deadline_scopes_context():
+    deadline = Deadline(10)
+    with request_deadline(deadline):
+        assert current_deadline() is deadline
+    assert current_deadline() is None
+
+
+def test_bind_deadline_carries_deadline_into_thread_pool():
+    deadline = Deadline(10)
+    with ThreadPoolExecutor(1) as executor:
+        assert bind_deadline(current_deadline) is current_deadline
+        with request_deadline(deadline):
+            assert executor.submit(bind_deadline(current_deadline)).result() is deadline
+            assert executor.submit(current_deadline).result() is None
+
+
+def test_with_deadline_applies_remaining_time_as_timeout():
+    client = FakeClient()
+    assert with_deadline(client) is client
+    with request_deadline(Deadline()):
+        assert with_deadline(client) is client
+    with request_deadline(Deadline(10)):
+        name, timeout = with_deadline(client)
+        assert 9 < timeout <= 10
+
+
+def test_with_deadline_refuses_expired_requests():
+    deadline = Deadline(10)
+    deadline.cancel()
+    with request_deadline(deadline), pytest.raises(DeadlineExceededError):
+        with_deadline(FakeClient())
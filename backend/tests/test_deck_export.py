@@ -0,0 +1,75 @@
+import io
+import json
+import re
+import zipfile
+
+import pytest
+from PIL import Image
+
+import flask_app
+from services.blob_store import make_key
+
+
+def png(color, size=(64, 48)):
+    output = io.BytesIO()
+    Image.new("RGB", size, color).save(output, format="PNG")
+    return output.getvalue()
+
+
+@pytest.fixture
+def deck():
+    store = flask_app.blob_store
+    red, blue = png("red"), png("blue", (32, 32))
+    cards = [
+        {"title": "첫 번째", "content": "내용 1", "image": store.url_for(store.put(red))},
+        # 저장소 밖의 URL은 내보내지 않음
+        {"title": "두 번째", "content": "내용 2", "image": "https://images.example.com/expired.png"},
+        {"title": "세 번째", "content": "내용 3", "image": store.url_for(store.put(blue))},
+        # 저장소에서 사라진 이미지는 건너뜀
+        {"title": "네 번째", "content": "내용 4", "image": store.url_for(make_key(b"missing"))},
+    ]
+    deck_id = flask_app.deck_store.create("원문", cards)
+    return deck_id, red, blue
+
+
+def test_zip_export_streams_manifest_and_stored_images(deck):
+    deck_id, red, blue = deck
+    response = flask_app.app.test_client().get(f"/api/decks/{deck_id}/export")
+    assert response.status_code == 200
+    assert response.mimetype == "application/zip"
+    assert response.headers["Content-Disposition"] == f'attachment; filename="cardnews-{deck_id[:8]}.zip"'
+
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert archive.namelist() == ["manifest.json", "card_01.png", "card_03.png"]
+    assert archive.read("card_01.png") == red
+    assert archive.read("card_03.png") == blue
+    manifest = json.loads(archive.read("manifest.json"))
+    assert manifest["deck_id"] == deck_id
+    assert [card["image_file"] for card in manifest["cards"]] == ["card_01.png", None, "card_03.png", "card_04.png"]
+    assert manifest["cards"][1]["title"] == "두 번째"
+
+
+def test_pdf_export_has_one_page_per_image_and_valid_xref(deck):
+    deck_id, _, _ = deck
+    response = flask_app.app.test_client().get(f"/api/decks/{deck_id}/export?format=pdf")
+    assert response.status_code == 200
+    assert response.mimetype == "application/pdf"
+
+    data = response.data
+    assert data.startswith(b"%PDF-1.4") and data.rstrip().endswith(b"%%EOF")
+    assert b"/Count 2" in data
+    assert b"/MediaBox [0 0 32.0 24.0]" in data and b"/MediaBox [0 0 16.0 16.0]" in data
+
+    # xref의 위치가 실제 객체 시작 위치를 가리키는지 확인
+    xref_offset = int(re.search(rb"startxref\n(\d+)", data).group(1))
+    entries = re.findall(rb"(\d{10}) 00000 n", data[xref_offset:])
+    assert len(entries) == 8  # 카탈로그, 페이지 목록, 페이지마다 이미지/내용/페이지
+    for object_id, offset in enumerate(entries, 1):
+        assert data[int(offset):].startswith(f"{object_id} 0 obj".encode())
+
+
+def test_export_rejects_unknown_format_and_deck():
+    client = flask_app.app.test_client()
+    deck_id = flask_app.deck_store.create("원문", [{"title": "카드"}])
+    assert client.get(f"/api/decks/{deck_id}/export?format=docx").status_code == 400
+    assert client.get("/api/decks/does-not-exist/export").status_code == 404
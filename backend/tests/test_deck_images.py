@@ -0,0 +1,99 @@
+import pytest
+
+import flask_app
+from services.prompts import IMAGE_TIER_DRAFT, IMAGE_TIER_FINAL
+
+CARDS = [
+    {"title": "첫 번째", "content": "첫 번째 내용", "highlight": "강조 1", "image": "", "prompt": "그림 1"},
+    {"title": "두 번째", "content": "두 번째 내용", "highlight": "강조 2", "image": "", "prompt": "그림 2"},
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    generated = []
+
+    def fake_generate(prompt, title="", content="", highlight="", style="", background_color="", bypass_cache=False,
+                      tier=IMAGE_TIER_FINAL):
+        generated.append((title, tier))
+        return f"https://images.example.com/{len(generated)}-{tier}.png", False
+
+    monkeypatch.setattr(flask_app, "cached_generate_image", fake_generate)
+    client = flask_app.app.test_client()
+    client.generated = generated
+    return client
+
+
+def create_deck():
+    return flask_app.deck_store.create("원문", [dict(card) for card in CARDS])
+
+
+def generate_for_card(client, deck_id, index, tier):
+    card = CARDS[index]
+    # 프론트엔드는 추가 요청사항을 내용 뒤에 붙이고 스타일을 따로 보냄
+    response = client.post("/api/generate-image", json={
+        "prompt": card["prompt"], "title": card["title"], "highlight": card["highlight"],
+        "content": f"{card['content']}\n\n추가 요청사항: 스타일: 수채화", "style": "수채화",
+        "deckId": deck_id, "cardIndex": index, "tier": tier,
+    })
+    assert response.status_code == 200
+
+
+def test_attached_image_is_current_for_deck_card(client):
+    deck_id = create_deck()
+    generate_for_card(client, deck_id, 0, IMAGE_TIER_DRAFT)
+    card = client.get(f"/api/decks/{deck_id}").get_json()["cards"][0]
+    assert card["image_tier"] == IMAGE_TIER_DRAFT
+    assert card["image_stale"] is False
+
+
+def test_finalize_only_regenerates_cards_without_final_image(client):
+    deck_id = create_deck()
+    generate_for_card(client, deck_id, 0, IMAGE_TIER_FINAL)
+    generate_for_card(client, deck_id, 1, IMAGE_TIER_DRAFT)
+    del client.generated[:]
+
+    body = client.post(f"/api/decks/{deck_id}/finalize", json={}).get_json()
+    assert [result["index"] for result in body["results"]] == [1]
+    assert client.generated == [("두 번째", IMAGE_TIER_FINAL)]
+
+    cards = client.get(f"/api/decks/{deck_id}").get_json()["cards"]
+    assert [card["image_tier"] for card in cards] == [IMAGE_TIER_FINAL, IMAGE_TIER_FINAL]
+
+
+def test_refresh_skips_attached_images(client):
+    deck_id = create_deck()
+    generate_for_card(client, deck_id, 0, IMAGE_TIER_FINAL)
+    del client.generated[:]
+    body = client.post(f"/api/decks/{deck_id}/images", json={}).get_json()
+    assert [result["index"] for result in body["results"]] == [1]
+
+
+def test_editing_card_marks_attached_image_stale(client):
+    deck_id = create_deck()
+    generate_for_card(client, deck_id, 0, IMAGE_TIER_FINAL)
+    response = client.patch(f"/api/decks/{deck_id}/cards/0", json={"title": "바뀐 제목"})
+    assert response.get_json()["card"]["image_stale"] is True
+
+
+@pytest.mark.parametrize("revision", ["abc", {}, [1], True, 1.5])
+def test_invalid_revision_is_rejected(client, revision):
+    deck_id = create_deck()
+    response = client.patch(f"/api/decks/{deck_id}/cards/0", json={"title": "새 제목", "revision": revision})
+    assert response.status_code == 400
+    response = client.post(f"/api/decks/{deck_id}/cards/0/regenerate", json={"revision": revision})
+    assert response.status_code == 400
+    assert flask_app.deck_store.get(deck_id)["cards"][0]["title"] == "첫 번째"
+
+
+def test_stale_revision_conflicts(client):
+    deck_id = create_deck()
+    assert client.patch(f"/api/decks/{deck_id}/cards/0", json={"title": "새 제목", "revision": "1"}).status_code == 200
+    assert client.patch(f"/api/decks/{deck_id}/cards/0", json={"title": "또", "revision": 1}).status_code == 409
+
+
+def test_non_string_tier_is_rejected(client):
+    response = client.post("/api/generate-image", json={"prompt": "그림", "tier": 2})
+    assert response.status_code == 400
+    response = client.post("/api/generate-images", json={"cards": [{"prompt": "그림"}], "tier": {}})
+    assert response.status_code == 400
@@ -0,0 +1,100 @@
+from types import SimpleNamespace
+
+import pytest
+
+from services import deck_store
+from services.deck_store import MAX_PAGE_SIZE, DeckStore, decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DeckStore(f"sqlite:///{tmp_path / 'decks.db'}")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1_700_000_000.123456789)
+    monkeypatch.setattr(deck_store, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def create(store, title, source="원문"):
+    return store.create(source, [{"title": title, "content": "내용", "highlight": "강조", "prompt": "그림"}])
+
+
+def list_all(store, limit, **kwargs):
+    pages = []
+    cursor = None
+    while True:
+        decks, cursor = store.list_decks(limit, cursor, **kwargs)
+        pages.append([deck["deck_id"] for deck in decks])
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trips_float_exactly():
+    created_at = 1_700_000_000.1234567
+    assert decode_cursor(encode_cursor(created_at, "abc")) == (created_at, "abc")
+
+
+@pytest.mark.parametrize("cursor", ["", "1700000000.5", "not-a-time:abc"])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_pages_are_newest_first_without_gaps_or_repeats(store, clock):
+    ids = []
+    for i in range(7):
+        clock.now += 1
+        ids.append(create(store, f"덱 {i}"))
+
+    pages = list_all(store, 3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [deck_id for page in pages for deck_id in page] == ids[::-1]
+
+
+def test_pages_break_created_at_ties_by_id(store, clock):
+    ids = [create(store, f"덱 {i}") for i in range(5)]
+
+    pages = list_all(store, 2)
+    assert [deck_id for page in pages for deck_id in page] == sorted(ids, reverse=True)
+
+
+def test_cursor_stays_valid_when_newer_decks_are_added(store, clock):
+    for i in range(4):
+        clock.now += 1
+        create(store, f"덱 {i}")
+    first, cursor = store.list_decks(2)
+
+    clock.now += 1
+    create(store, "새 덱")
+    second, _ = store.list_decks(2, cursor)
+    assert not {deck["deck_id"] for deck in first} & {deck["deck_id"] for deck in second}
+    assert second[0]["created_at"] < first[-1]["created_at"]
+
+
+def test_last_full_page_has_no_cursor(store, clock):
+    for i in range(4):
+        clock.now += 1
+        create(store, f"덱 {i}")
+    assert [len(page) for page in list_all(store, 2)] == [2, 2]
+
+
+def test_list_filters_by_source_and_summarizes_cover(store, clock):
+    create(store, "다른 원문", source="다른 기사")
+    clock.now += 1
+    deck_id = create(store, "표지", source="기사")
+
+    decks, cursor = store.list_decks(10, source_text="기사")
+    assert cursor is None
+    assert [deck["deck_id"] for deck in decks] == [deck_id]
+    assert decks[0]["title"] == "표지"
+    assert decks[0]["card_count"] == 1
+
+
+def test_limit_is_clamped(store, clock):
+    create(store, "하나")
+    decks, _ = store.list_decks(0)
+    assert len(decks) == 1
+    assert store.list_decks(MAX_PAGE_SIZE * 10)[1] is None
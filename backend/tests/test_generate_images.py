@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+import flask_app
+
+
+@pytest.fixture
+def client():
+    return flask_app.app.test_client()
+
+
+def test_batch_results_keep_input_order_and_report_failures(client, monkeypatch):
+    def fake_generate(prompt, *args):
+        if prompt == "boom":
+            raise RuntimeError("upstream failed")
+        # 뒤쪽 카드가 먼저 끝나도 결과는 입력 순서대로
+        time.sleep(0.03 if prompt == "slow" else 0)
+        return f"/api/images/{prompt}.png", prompt == "fast"
+
+    monkeypatch.setattr(flask_app, "cached_generate_image", fake_generate)
+    cards = [{"prompt": "slow"}, {"prompt": " "}, {"prompt": "boom"}, {"prompt": "fast"}]
+
+    response = client.post("/api/generate-images", json={"cards": cards})
+    assert response.status_code == 200
+    body = response.get_json()
+    results = body["results"]
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert results[0]["image_url"] == "http://localhost/api/images/slow.png"
+    assert results[1]["error"] == "No prompt provided"
+    assert (results[2]["image_url"], results[2]["error"]) == ("", "upstream failed")
+    assert results[3]["cached"] is True
+    assert (body["succeeded"], body["failed"]) == (2, 2)
+
+
+def test_batch_concurrency_is_capped_per_request(monkeypatch):
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def fake_generate(prompt, *args):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+        return f"/api/images/{prompt}.png", False
+
+    monkeypatch.setattr(flask_app, "cached_generate_image", fake_generate)
+    cards = [{"prompt": str(i)} for i in range(6)]
+
+    results = flask_app.generate_images(cards, concurrency=2)
+    assert all(result["image_url"] for result in results)
+    assert 1 <= peak <= 2
+
+
+def test_batch_rejects_missing_or_too_many_cards(client):
+    assert client.post("/api/generate-images", json={}).status_code == 400
+    assert client.post("/api/generate-images", json={"cards": []}).status_code == 400
+    cards = [{"prompt": "p"}] * (flask_app.IMAGE_BATCH_MAX_CARDS + 1)
+    assert client.post("/api/generate-images", json={"cards": cards}).status_code == 400
+
+
+def test_batch_fails_when_no_image_is_generated(client, monkeypatch):
+    monkeypatch.setattr(flask_app, "cached_generate_image", lambda *args: (None, False))
+
+    response = client.post("/api/generate-images", json={"cards": [{"prompt": "a"}]})
+    assert response.status_code == 500
+    body = response.get_json()
+    assert body["failed"] == 1
+    assert body["results"][0]["error"]
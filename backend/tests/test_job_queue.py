@@ -0,0 +1,128 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from services.job_queue import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), workers=1, poll_interval=0.05, stale_after=60, heartbeat_interval=0.1)
+    yield queue
+    queue.stop()
+
+
+def insert_running(queue, job_id, owner_pid, started_at, heartbeat_at=None):
+    queue._connect().execute(
+        "INSERT INTO jobs (id, kind, payload, status, created_at, started_at, owner_pid, heartbeat_at)"
+        " VALUES (?, 'echo', '{}', ?, ?, ?, ?, ?)",
+        (job_id, RUNNING, started_at, started_at, owner_pid, heartbeat_at),
+    )
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_runs_jobs_and_records_owner(queue):
+    queue.register("echo", lambda payload: {"value": payload["value"]})
+    queue.register("fail", lambda payload: 1 / 0)
+    ok = queue.enqueue("echo", {"value": 3})
+    bad = queue.enqueue("fail", {})
+    assert queue.wait(ok, 5)["status"] == SUCCEEDED
+    assert queue.wait(ok, 5)["result"] == {"value": 3}
+    assert queue.wait(bad, 5)["status"] == FAILED
+    row = queue._connect().execute("SELECT owner_pid FROM jobs WHERE id = ?", (ok,)).fetchone()
+    assert row["owner_pid"] == os.getpid()
+
+
+def test_requeues_job_of_dead_owner(queue):
+    queue._started_at = time.time()
+    insert_running(queue, "dead", dead_pid(), time.time())
+    insert_running(queue, "alive", os.getppid(), time.time())
+    assert queue._requeue_stale() == 1
+    assert queue.get("dead")["status"] == QUEUED
+    assert queue.get("alive")["status"] == RUNNING
+
+
+def test_requeues_job_left_by_previous_process_with_same_pid(queue):
+    insert_running(queue, "previous", os.getpid(), time.time() - 5)
+    queue._started_at = time.time()
+    insert_running(queue, "current", os.getpid(), time.time())
+    assert queue._requeue_stale() == 1
+    assert queue.get("previous")["status"] == QUEUED
+    assert queue.get("current")["status"] == RUNNING
+
+
+def test_requeues_job_without_heartbeat(queue):
+    queue._started_at = time.time()
+    insert_running(queue, "silent", os.getppid(), time.time() - 120)
+    insert_running(queue, "legacy", None, time.time() - 120)
+    assert queue._requeue_stale() == 2
+
+
+def test_worker_loop_requeues_and_reruns_interrupted_job(queue):
+    queue.register("echo", lambda payload: "done")
+    queue.start()
+    insert_running(queue, "crashed", dead_pid(), time.time())
+    job = queue.wait("crashed", 5)
+    assert job["status"] == SUCCEEDED
+    assert job["attempts"] == 1
+
+
+def test_heartbeat_keeps_long_job_running(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), workers=1, poll_interval=0.05, stale_after=0.5, heartbeat_interval=0.1)
+    queue.register("slow", lambda payload: time.sleep(1.5) or "done")
+    try:
+        job_id = queue.enqueue("slow", {})
+        job = queue.wait(job_id, 5)
+        assert job["status"] == SUCCEEDED
+        assert job["attempts"] == 1
+    finally:
+        queue.stop()
+
+
+def test_adds_owner_columns_to_existing_db(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL,"
+        " result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL,"
+        " started_at REAL, finished_at REAL)"
+    )
+    conn.commit()
+    conn.close()
+    queue = JobQueue(path)
+    columns = {row["name"] for row in queue._connect().execute("PRAGMA table_info(jobs)")}
+    assert {"owner_pid", "heartbeat_at"} <= columns
+
+
+def test_requeued_job_result_is_not_overwritten_by_original_runner(queue):
+    import threading
+
+    running = threading.Event()
+    release = threading.Event()
+    queue.register("slow", lambda payload: (running.set(), release.wait(5), "first")[-1])
+    job_id = queue.enqueue("slow", {})
+    queue.start()
+    assert running.wait(5)
+
+    # 중단된 작업으로 판단되어 다시 대기열에 들어간 뒤 다른 워커가 가져감
+    queue._connect().execute("UPDATE jobs SET status = ? WHERE id = ?", (QUEUED, job_id))
+    claimed = queue._claim()
+    assert claimed["id"] == job_id
+    release.set()
+    time.sleep(0.3)
+
+    job = queue.get(job_id)
+    assert job["status"] == RUNNING
+    assert job["attempts"] == 2
+    assert job["result"] is None
+    assert queue._finish(job_id, claimed["attempts"] + 1, SUCCEEDED, result="second")
+    assert queue.get(job_id)["result"] == "second"
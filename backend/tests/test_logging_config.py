@@ -0,0 +1,91 @@
+import logging
+import queue
+
+import pytest
+
+import flask_app
+from services import logging_config
+from services.logging_config import preview, should_log_payload, summarize_payload
+
+
+def test_preview_truncates_and_flattens():
+    assert preview("a\nb") == "a b"
+    assert preview(None) == ""
+    assert preview("x" * 10, 4) == "xxxx...(+6 chars)"
+
+
+def test_summarize_payload_hides_long_values():
+    summary = summarize_payload({"text": "x" * 100, "cards": [1, 2], "noCache": True, "style": "사진"})
+    assert summary == {"text": "<100 chars>", "cards": "<list of 2>", "noCache": True, "style": "사진"}
+    assert summarize_payload(["not", "a", "dict"]) == "list"
+
+
+@pytest.fixture
+def set_level():
+    # setLevel은 isEnabledFor 캐시도 비우므로 속성을 직접 바꾸지 않고 테스트 후 원래 레벨로 복원
+    saved = []
+
+    def set_level(logger, level):
+        saved.append((logger, logger.level))
+        logger.setLevel(level)
+
+    yield set_level
+    for logger, level in reversed(saved):
+        logger.setLevel(level)
+
+
+def test_should_log_payload_respects_level_and_sampling(monkeypatch, set_level):
+    logger = logging.getLogger("tests.payload")
+    set_level(logger, logging.INFO)
+    assert not should_log_payload(logger)
+    set_level(logger, logging.DEBUG)
+    monkeypatch.setattr(logging_config, "LOG_PAYLOAD_SAMPLE_RATE", 1.0)
+    assert should_log_payload(logger)
+    monkeypatch.setattr(logging_config, "LOG_PAYLOAD_SAMPLE_RATE", 0.0)
+    assert not should_log_payload(logger)
+
+
+def test_request_payload_is_not_formatted_below_debug(monkeypatch, set_level):
+    def forbidden(*args, **kwargs):
+        raise AssertionError("payload formatted while debug logging is off")
+
+    set_level(flask_app.logger, logging.INFO)
+    monkeypatch.setattr(flask_app, "preview", forbidden)
+    monkeypatch.setattr(flask_app, "summarize_payload", forbidden)
+    monkeypatch.setattr(flask_app, "cached_analyze_text", lambda text, bypass_cache=False: ([], False))
+
+    response = flask_app.app.test_client().post("/api/analyze-text", json={"text": "본문", "force": True})
+    assert response.status_code == 200
+    assert response.get_json()["cards"] == []
+
+
+def queued_record(log):
+    log_queue = queue.Queue()
+    logger = logging.getLogger("tests.queue")
+    handler = logging_config.NonBlockingQueueHandler(log_queue)
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        log(logger)
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = True
+    return log_queue.get_nowait()
+
+
+def test_queue_handler_snapshots_mutable_args():
+    counts = {"succeeded": 1}
+
+    def log(logger):
+        logger.warning("Batch progress: %s", counts)
+        counts["succeeded"] = 99
+
+    record = queued_record(log)
+    assert record.getMessage() == "Batch progress: {'succeeded': 1}"
+    assert record.args is None
+
+
+def test_queue_handler_keeps_immutable_args_lazy():
+    record = queued_record(lambda logger: logger.warning("Analyzed %d chars in %s", 12, "text"))
+    assert record.args == (12, "text")
+    assert record.getMessage() == "Analyzed 12 chars in text"
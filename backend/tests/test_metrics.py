@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import flask_app
+from services.metrics import OPENAI_TOKENS, Registry, record_usage
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry(prefix="test_")
+    histogram = registry.histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1))
+    histogram.observe(0.05, stage="parse")
+    histogram.observe(0.5, stage="parse")
+    histogram.observe(5, stage="parse")
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP test_latency_seconds Latency", "# TYPE test_latency_seconds histogram"]
+    assert lines[2:] == [
+        'test_latency_seconds_bucket{stage="parse",le="0.1"} 1',
+        'test_latency_seconds_bucket{stage="parse",le="1"} 2',
+        'test_latency_seconds_bucket{stage="parse",le="+Inf"} 3',
+        'test_latency_seconds_sum{stage="parse"} 5.55',
+        'test_latency_seconds_count{stage="parse"} 3',
+    ]
+
+
+def test_counter_escapes_label_values_and_gauge_skips_failures():
+    registry = Registry()
+    registry.counter("errors_total", "Errors", ("error",)).inc(error='bad "quote"\n')
+
+    def broken():
+        raise RuntimeError("unavailable")
+
+    registry.gauge("broken", "Broken gauge", broken)
+    registry.gauge("queue", "Queue", lambda: {"pending": 2, "note": "skip"}, labelname="status")
+
+    body = registry.render()
+    assert 'errors_total{error="bad \\"quote\\"\\n"} 1' in body
+    assert not [line for line in body.splitlines() if line.startswith("broken")]
+    assert 'queue{status="pending"} 2' in body
+    assert "note" not in body
+
+
+def test_record_usage_counts_chat_and_image_token_names():
+    before = OPENAI_TOKENS.value(operation="test", model="m", type="prompt")
+    chat = SimpleNamespace(prompt_tokens=10, completion_tokens=5)
+    image = SimpleNamespace(prompt_tokens=None, completion_tokens=None, input_tokens=7, output_tokens=3)
+
+    assert record_usage("test", "m", chat) == 15
+    assert record_usage("test", "m", image) == 10
+    assert record_usage("test", "m", None) == 0
+    assert OPENAI_TOKENS.value(operation="test", model="m", type="prompt") == before + 17
+
+
+def test_metrics_endpoint_reports_route_latency():
+    client = flask_app.app.test_client()
+    assert client.get("/").status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert 'newscard_http_request_duration_seconds_count{method="GET",route="/",status="200"}' in body
+    assert "# TYPE newscard_job_queue_jobs gauge" in body
@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import flask_app
+from services.openai_scheduler import (
+    LANE_BATCH, LANE_INTERACTIVE, CircuitBreaker, CircuitOpenError, OpenAIScheduler, TokenBucket,
+    bind_lane, current_lane, estimate_request_tokens, openai_lane,
+)
+
+
+def wait_until(predicate, timeout=5):
+    limit = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < limit, "condition not met in time"
+        time.sleep(0.005)
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(0)
+    assert bucket.unlimited
+    bucket.take(1000)
+    assert bucket.wait_time(1000, time.monotonic()) == 0.0
+
+
+def test_bucket_allows_burst_then_refills_at_rate():
+    bucket = TokenBucket(600, burst_seconds=1)  # 초당 10개, 버스트 10개
+    now = bucket.updated
+    assert bucket.capacity == pytest.approx(10)
+    assert bucket.wait_time(10, now) == 0.0
+    bucket.take(10)
+    assert bucket.wait_time(1, now) == pytest.approx(0.1)
+    assert bucket.wait_time(1, now + 0.1) == pytest.approx(0.0)
+
+
+def test_bucket_lets_oversized_request_through_when_full():
+    bucket = TokenBucket(600, burst_seconds=1)
+    now = bucket.updated
+    assert bucket.wait_time(50, now) == 0.0
+    bucket.take(50)
+    # 빌린 만큼 다음 요청이 기다림
+    assert bucket.wait_time(1, now) == pytest.approx(4.1)
+
+
+def test_bucket_adjust_refunds_unused_tokens_up_to_capacity():
+    bucket = TokenBucket(600, burst_seconds=1)
+    bucket.take(8)
+    bucket.adjust(-5)
+    assert bucket.tokens == pytest.approx(7)
+    bucket.adjust(-100)
+    assert bucket.tokens == pytest.approx(bucket.capacity)
+    bucket.adjust(4)
+    assert bucket.tokens == pytest.approx(6)
+
+
+def test_interactive_calls_jump_ahead_of_waiting_batch_calls():
+    scheduler = OpenAIScheduler("test", rpm=600, max_retries=0)
+    with scheduler._cond:
+        scheduler.requests.tokens = -1.0
+        scheduler.requests.updated = time.monotonic()
+    order = []
+
+    def call(lane, name):
+        with openai_lane(lane):
+            scheduler.call(lambda: order.append(name))
+
+    batch = [threading.Thread(target=call, args=(LANE_BATCH, f"batch-{i}")) for i in range(2)]
+    for thread in batch:
+        thread.start()
+    wait_until(lambda: scheduler.stats()["waiting_batch"] == 2)
+    interactive = threading.Thread(target=call, args=(LANE_INTERACTIVE, "interactive"))
+    interactive.start()
+    for thread in batch + [interactive]:
+        thread.join(5)
+
+    assert order[0] == "interactive"
+    assert sorted(order[1:]) == ["batch-0", "batch-1"]
+    assert scheduler.stats()["waiting_batch"] == 0
+
+
+def test_explicit_lane_overrides_context():
+    scheduler = OpenAIScheduler("test", rpm=600, max_retries=0)
+    seen = []
+    original = scheduler._enqueue
+
+    def record(lane):
+        seen.append(lane)
+        return original(lane)
+
+    scheduler._enqueue = record
+    with openai_lane(LANE_BATCH):
+        scheduler.call(lambda: None)
+        scheduler.call(lambda: None, lane=LANE_INTERACTIVE)
+    scheduler.call(lambda: None)
+    assert seen == [LANE_BATCH, LANE_INTERACTIVE, LANE_INTERACTIVE]
+
+
+def test_bind_lane_carries_lane_into_thread_pool():
+    with ThreadPoolExecutor(1) as executor:
+        with openai_lane(LANE_BATCH):
+            bound = executor.submit(bind_lane(current_lane)).result()
+            unbound = executor.submit(current_lane).result()
+    assert bound == LANE_BATCH
+    assert unbound == LANE_INTERACTIVE
+
+
+def test_generate_images_uses_callers_lane(monkeypatch):
+    lanes = []
+
+    def fake_generate(prompt, *args):
+        lanes.append(current_lane())
+        return f"/api/images/{prompt}", False
+
+    monkeypatch.setattr(flask_app, "cached_generate_image", fake_generate)
+    cards = [{"prompt": "a"}, {"prompt": "b"}]
+
+    flask_app.generate_images(cards)
+    assert lanes == [LANE_INTERACTIVE, LANE_INTERACTIVE]
+
+    lanes.clear()
+    with openai_lane(LANE_BATCH):
+        flask_app.generate_images(cards)
+    assert lanes == [LANE_BATCH, LANE_BATCH]
+
+    lanes.clear()
+    flask_app.in_batch_lane(flask_app.run_deck_images_job, {"cards": cards})
+    assert lanes == [LANE_BATCH, LANE_BATCH]
+
+
+def test_circuit_opens_after_threshold_and_allows_single_probe():
+    breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_estimate_request_tokens_adds_max_output():
+    messages = [{"role": "user", "content": "hello world"}]
+    assert estimate_request_tokens(messages, 100) == estimate_request_tokens(messages) + 100
+    assert estimate_request_tokens(messages) > 0
+
+
+def open_breaker(scheduler):
+    scheduler.breaker.record_failure()
+    assert scheduler.breaker.state == "half_open"
+
+
+def test_cancelled_probe_does_not_leave_circuit_stuck_open():
+    scheduler = OpenAIScheduler("test", max_retries=0, breaker_threshold=1, breaker_cooldown=0)
+    open_breaker(scheduler)
+
+    async def cancel_probe():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(10)
+
+        task = asyncio.ensure_future(scheduler.acall(hang))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await scheduler.acall(lambda: asyncio.sleep(0, "ok"))
+
+    assert asyncio.run(cancel_probe()) == "ok"
+    assert scheduler.breaker.state == "closed"
+
+
+def test_interrupted_probe_does_not_leave_circuit_stuck_open():
+    scheduler = OpenAIScheduler("test", max_retries=0, breaker_threshold=1, breaker_cooldown=0)
+    open_breaker(scheduler)
+
+    def interrupt():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        scheduler.call(interrupt)
+    assert scheduler.call(lambda: "ok") == "ok"
+    assert scheduler.breaker.state == "closed"
@@ -0,0 +1,51 @@
+import pytest
+
+from services import prompts
+
+
+TEXT = "주제: 예산안\n카드수: 3\n내용: 정부가 예산안을 발표했다."
+
+
+def test_stream_key_differs_from_structured_key(monkeypatch):
+    monkeypatch.setattr(prompts, "ANALYSIS_OUTPUT_MODE", "json")
+    assert prompts.analysis_cache_key(TEXT) == prompts.analysis_cache_key(TEXT, structured=True)
+    assert prompts.analysis_cache_key(TEXT, structured=False) != prompts.analysis_cache_key(TEXT)
+
+
+def test_stream_key_matches_text_mode_key(monkeypatch):
+    monkeypatch.setattr(prompts, "ANALYSIS_OUTPUT_MODE", "text")
+    assert prompts.analysis_cache_key(TEXT, structured=False) == prompts.analysis_cache_key(TEXT)
+
+
+def test_cache_key_depends_on_card_count():
+    assert prompts.analysis_cache_key(TEXT) != prompts.analysis_cache_key(TEXT.replace("카드수: 3", "카드수: 4"))
+
+
+def test_single_card_budget_has_a_floor():
+    assert prompts.analysis_max_tokens(1) >= prompts.ANALYSIS_MIN_TOKENS
+    assert prompts.analysis_max_tokens(1) >= 1000
+
+
+def test_budget_grows_with_cards_up_to_the_cap():
+    budgets = [prompts.analysis_max_tokens(count) for count in range(1, 11)]
+    assert budgets == sorted(budgets)
+    assert budgets[4] >= 5 * 400
+    assert max(budgets) <= prompts.ANALYSIS_MAX_TOKENS
+
+
+def test_retry_budget_doubles_until_the_retry_cap(monkeypatch):
+    monkeypatch.setattr(prompts, "ANALYSIS_RETRY_MAX_TOKENS", 3000)
+    assert prompts.analysis_retry_max_tokens(1200) == 2400
+    assert prompts.analysis_retry_max_tokens(2000) == 3000
+    assert prompts.analysis_retry_max_tokens(3000) is None
+
+
+@pytest.mark.parametrize("tier", [2, {}, ["draft"], True, "poster"])
+def test_invalid_image_tier_raises_value_error(tier):
+    with pytest.raises(ValueError):
+        prompts.resolve_image_tier(tier)
+
+
+def test_image_tier_defaults_and_ignores_case():
+    assert prompts.resolve_image_tier(None) == prompts.DEFAULT_IMAGE_TIER
+    assert prompts.resolve_image_tier("DRAFT") == prompts.IMAGE_TIER_DRAFT
@@ -0,0 +1,93 @@
+import io
+import threading
+
+import pytest
+from PIL import Image
+
+import flask_app
+from services.blob_store import LocalBlobStore
+from services.renditions import RENDITIONS, RenditionService, negotiate_format, rendition_key
+
+
+def png(size=(1024, 768)):
+    output = io.BytesIO()
+    Image.new("RGB", size, "green").save(output, format="PNG")
+    return output.getvalue()
+
+
+class GatedBlobStore(LocalBlobStore):
+    """원본을 읽기 전에 gate가 열릴 때까지 기다리는 저장소"""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.gate = threading.Event()
+
+    def open(self, key):
+        self.gate.wait(5)
+        return super().open(key)
+
+
+@pytest.fixture
+def service(tmp_path):
+    store = GatedBlobStore(str(tmp_path))
+    store.gate.set()
+    return RenditionService(store, max_workers=2)
+
+
+def test_negotiate_format_prefers_smallest_supported():
+    assert negotiate_format("image/avif,image/webp,*/*", ["webp", "jpg"]) == "webp"
+    assert negotiate_format("image/avif,image/webp", ["avif", "webp", "jpg"]) == "avif"
+    assert negotiate_format("image/png,*/*", ["webp", "jpg"]) == "jpg"
+    assert negotiate_format(None, ["webp", "jpg"]) == "jpg"
+
+
+def test_thumbnail_is_resized_and_stored_under_derived_key(service):
+    source = service.blob_store.put(png())
+    key = service.get(source, "thumb", "webp")
+    assert key == rendition_key(source, "thumb", "webp")
+    assert key.startswith(source.split(".")[0]) and key.endswith(".thumb.webp")
+
+    with service.blob_store.open(key) as f, Image.open(f) as image:
+        assert image.format == "WEBP"
+        assert image.size == (RENDITIONS["thumb"], RENDITIONS["thumb"] * 3 // 4)
+
+    assert service.get(source, "thumb", "webp") == key
+    stats = service.stats()
+    assert (stats["rendered"], stats["reused"]) == (1, 1)
+    assert stats["bytes_out"] < stats["bytes_in"]
+
+
+def test_concurrent_requests_share_one_render(service):
+    source = service.blob_store.put(png())
+    service.blob_store.gate.clear()
+    first = service.submit(source, "preview", "jpg")
+    second = service.submit(source, "preview", "jpg")
+    assert first is second
+    service.blob_store.gate.set()
+    assert first.result(5) == rendition_key(source, "preview", "jpg")
+    assert service.stats()["rendered"] == 1
+
+
+def test_unsupported_rendition_is_rejected(service):
+    source = service.blob_store.put(png())
+    with pytest.raises(ValueError):
+        service.submit(source, "huge", "webp")
+    with pytest.raises(ValueError):
+        service.submit(source, "thumb", "gif")
+
+
+def test_image_endpoint_serves_negotiated_rendition():
+    key = flask_app.blob_store.put(png((640, 640)))
+    client = flask_app.app.test_client()
+
+    response = client.get(f"/api/images/{key}?rendition=preview", headers={"Accept": "image/webp,*/*"})
+    assert response.status_code == 200
+    assert response.mimetype == "image/webp"
+    assert "Accept" in response.headers["Vary"]
+    with Image.open(io.BytesIO(response.data)) as image:
+        assert image.size == (RENDITIONS["preview"], RENDITIONS["preview"])
+
+    explicit = client.get(f"/api/images/{key}?rendition=thumb&format=jpg")
+    assert explicit.mimetype == "image/jpeg"
+    assert "Vary" not in explicit.headers
+    assert client.get(f"/api/images/{key}?rendition=poster").status_code == 400
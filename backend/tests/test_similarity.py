@@ -0,0 +1,150 @@
+import threading
+import time
+
+import pytest
+
+from services.similarity import (
+    DuplicateDetector, SimilarityIndex, fingerprint, normalize_text, similarity,
+)
+
+ARTICLE = (
+    "정부는 오늘 내년도 예산안을 발표했다. 복지 예산은 지난해보다 8% 늘어난 250조 원으로 편성되었고, "
+    "연구개발 예산은 일부 조정되었다. 기획재정부는 재정 건전성을 유지하면서도 취약계층 지원을 강화하겠다고 밝혔다. "
+    "야당은 세수 전망이 지나치게 낙관적이라며 국회 심의 과정에서 꼼꼼히 따지겠다는 입장이다. "
+    "전문가들은 경기 둔화 국면에서 재정의 역할이 중요하다고 평가했다. "
+    "지방자치단체에 대한 교부금도 늘어나 지역 균형 발전 사업에 쓰일 예정이며, "
+    "정부는 다음 달 국회 예산결산특별위원회에서 세부 항목을 설명할 계획이다."
+)
+
+
+def article_request(card_count, body=ARTICLE):
+    return f"주제: 내년도 예산안\n카드수: {card_count}\n내용: {body}"
+
+
+class FakeDeckStore:
+    def __init__(self):
+        self.rows = []
+        self.saved = {}
+
+    def list_fingerprints(self, since):
+        return [row for row in self.rows if row[1] >= since]
+
+    def set_fingerprints(self, fingerprints):
+        self.saved.update(fingerprints)
+
+
+def test_normalize_removes_bylines_and_spacing():
+    a = normalize_text("서울=연합뉴스) 홍길동 기자 = 예산안 발표\n© 연합뉴스 무단 전재 금지")
+    b = normalize_text("예산안  발표")
+    assert a.endswith(b)
+    assert "기자" not in a and "무단" not in a
+
+
+def test_near_duplicates_score_high_and_different_articles_low():
+    edited = ARTICLE.replace("8%", "8.1%") + "\n김철수 기자 chulsoo@example.com"
+    assert similarity(fingerprint(ARTICLE), fingerprint(edited)) >= 0.85
+    other = "프로야구 개막전이 열린 잠실구장에는 3만 관중이 몰렸다. 홈팀은 연장 끝에 승리했다." * 3
+    assert similarity(fingerprint(ARTICLE), fingerprint(other)) < 0.3
+
+
+def test_fingerprint_of_empty_text_is_none():
+    assert fingerprint("") is None
+    assert fingerprint(" ... ") is None
+
+
+def test_index_query_add_remove():
+    index = SimilarityIndex(max_entries=2)
+    index.add("a", fingerprint(ARTICLE))
+    assert index.query(fingerprint(ARTICLE), 0.9) == [("a", 1.0)]
+    index.remove("a")
+    assert len(index) == 0
+    assert index.query(fingerprint(ARTICLE), 0.9) == []
+
+
+def test_index_evicts_oldest_entry():
+    index = SimilarityIndex(max_entries=2)
+    for doc_id in ("a", "b", "c"):
+        index.add(doc_id, fingerprint(f"{doc_id} {ARTICLE}"))
+    assert "a" not in index
+    assert len(index) == 2
+
+
+def test_detector_syncs_and_backfills_from_store():
+    store = FakeDeckStore()
+    store.rows.append(("old", 10**10, None, ARTICLE))
+    detector = DuplicateDetector(store, min_chars=50, sync_interval=0)
+    deck_id, score = detector.find(ARTICLE)
+    assert (deck_id, score) == ("old", 1.0)
+    assert "old" in store.saved
+    assert detector.stats()["backfilled"] == 1
+
+
+class SlowDeckStore(FakeDeckStore):
+    def __init__(self):
+        super().__init__()
+        self.querying = threading.Event()
+        self.release = threading.Event()
+
+    def list_fingerprints(self, since):
+        self.querying.set()
+        self.release.wait(5)
+        return super().list_fingerprints(since)
+
+
+def test_lookups_do_not_wait_for_store_sync():
+    store = SlowDeckStore()
+    store.rows.append(("old", 10**10, None, ARTICLE))
+    detector = DuplicateDetector(store, min_chars=50, sync_interval=0)
+    syncing = threading.Thread(target=detector.sync, kwargs={"force": True})
+    syncing.start()
+    try:
+        assert store.querying.wait(5)
+        started = time.monotonic()
+        detector.add("new", fingerprint(ARTICLE))
+        assert detector.find(ARTICLE)[0] == "new"
+        assert time.monotonic() - started < 1
+    finally:
+        store.release.set()
+        syncing.join(5)
+    assert {deck_id for deck_id, _ in detector.find_all(ARTICLE)} == {"new", "old"}
+    assert "old" in store.saved
+
+
+def test_detector_ignores_short_text_and_can_be_disabled():
+    store = FakeDeckStore()
+    assert DuplicateDetector(store, min_chars=10000).find(ARTICLE) is None
+    assert DuplicateDetector(store, threshold=0).fingerprint(ARTICLE) is None
+
+
+def test_card_count_barely_changes_similarity():
+    # 지시문만 다른 요청은 MinHash로 구분되지 않으므로 재사용 시 지시문을 따로 비교해야 함
+    assert similarity(fingerprint(article_request(3)), fingerprint(article_request(8))) >= 0.85
+
+
+@pytest.fixture
+def app_module():
+    import flask_app
+    return flask_app
+
+
+CARDS = [{"title": "예산안", "content": "내용", "highlight": "강조", "image": "", "prompt": "그림"}]
+
+
+def test_reuse_requires_same_card_count(app_module):
+    body = ARTICLE + " 세 장짜리 요청."
+    deck_id = app_module.save_deck(article_request(3, body), CARDS)
+    assert deck_id
+
+    reused = app_module.find_duplicate_deck(article_request(3, body.replace("8%", "8.1%")))
+    assert reused is not None and reused[0]["deck_id"] == deck_id
+    assert "source_text" not in reused[0]
+
+    assert app_module.find_duplicate_deck(article_request(8, body)) is None
+
+
+def test_reuse_picks_deck_with_matching_directives(app_module):
+    body = ARTICLE + " 여러 덱이 있는 경우."
+    three = app_module.save_deck(article_request(3, body), CARDS)
+    eight = app_module.save_deck(article_request(8, body), CARDS * 8)
+    assert app_module.find_duplicate_deck(article_request(8, body))[0]["deck_id"] == eight
+    assert app_module.find_duplicate_deck(article_request(3, body))[0]["deck_id"] == three
@@ -0,0 +1,167 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from services.deadlines import Deadline, DeadlineExceededError, request_deadline
+from services.singleflight import SingleFlight
+
+
+@pytest.fixture
+def flight(tmp_path):
+    return SingleFlight(lock_path=str(tmp_path / "singleflight.lock"), lock_timeout=5, poll_interval=0.01)
+
+
+def run_in_thread(fn):
+    thread = threading.Thread(target=fn)
+    thread.start()
+    return thread
+
+
+def other_process_can_lock(path, offset):
+    script = (
+        "import fcntl, os, sys\n"
+        "fd = os.open(sys.argv[1], os.O_RDWR)\n"
+        "try:\n"
+        "    fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, int(sys.argv[2]))\n"
+        "except OSError:\n"
+        "    sys.exit(1)\n"
+    )
+    return subprocess.run([sys.executable, "-c", script, path, str(offset)]).returncode == 0
+
+
+def test_concurrent_calls_with_same_key_run_once(flight):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    leader = run_in_thread(lambda: results.append(flight.do("key", slow)))
+    started.wait(5)
+    follower = run_in_thread(lambda: results.append(flight.do("key", slow)))
+    while flight.stats()["waiting"] == 0:
+        time.sleep(0.005)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert calls == [1]
+    assert results == ["value", "value"]
+    assert flight.stats()["coalesced"] == 1
+
+
+def test_errors_are_shared_with_waiters(flight):
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert flight.stats()["errors"] == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_keys_sharing_an_offset_are_serialized_in_process(flight, monkeypatch):
+    monkeypatch.setattr(flight, "_lock_offset", lambda key: 7)
+    first_running = threading.Event()
+    release = threading.Event()
+    second_started = threading.Event()
+
+    def first():
+        first_running.set()
+        release.wait(5)
+
+    first_thread = run_in_thread(lambda: flight.do("a", first))
+    first_running.wait(5)
+    second_thread = run_in_thread(lambda: flight.do("b", second_started.set))
+    time.sleep(0.1)
+    # 같은 프로세스의 다른 키가 잠금 구간을 풀어 버리지 않도록 두 번째 호출은 기다림
+    assert not second_started.is_set()
+    assert not other_process_can_lock(flight.lock_path, 7)
+
+    release.set()
+    first_thread.join(5)
+    second_thread.join(5)
+    assert second_started.is_set()
+    assert flight.stats()["lock_waits"] == 1
+    assert other_process_can_lock(flight.lock_path, 7)
+    assert flight._offset_locks == {}
+
+
+def test_waiting_for_lock_stops_at_request_deadline(flight, monkeypatch):
+    monkeypatch.setattr(flight, "_lock_offset", lambda key: 7)
+    first_running = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def second():
+        with request_deadline(Deadline(0.2)):
+            try:
+                flight.do("b", lambda: "never")
+            except DeadlineExceededError as e:
+                errors.append(e)
+
+    first_thread = run_in_thread(lambda: flight.do("a", lambda: (first_running.set(), release.wait(5))))
+    first_running.wait(5)
+    started = time.monotonic()
+    second_thread = run_in_thread(second)
+    second_thread.join(5)
+    elapsed = time.monotonic() - started
+    release.set()
+    first_thread.join(5)
+
+    assert len(errors) == 1
+    assert elapsed < 1
+    assert flight._offset_locks == {}
+
+
+def test_lock_held_by_another_process_times_out_and_runs(tmp_path):
+    flight = SingleFlight(lock_path=str(tmp_path / "singleflight.lock"), lock_timeout=0.2, poll_interval=0.01)
+    offset = flight._lock_offset("key")
+    open(flight.lock_path, "a").close()
+    holder = subprocess.Popen(
+        [sys.executable, "-c",
+         "import fcntl, os, sys, time\n"
+         "fd = os.open(sys.argv[1], os.O_RDWR)\n"
+         "fcntl.lockf(fd, fcntl.LOCK_EX, 1, int(sys.argv[2]))\n"
+         "print('locked', flush=True)\n"
+         "time.sleep(5)\n",
+         flight.lock_path, str(offset)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        assert holder.stdout.readline().strip() == "locked"
+        assert flight.do("key", lambda: "value", lookup=lambda: (False, None)) == "value"
+        assert flight.stats()["lock_timeouts"] == 1
+    finally:
+        holder.kill()
+        holder.wait()
+
+
+def test_waiter_reuses_result_stored_by_other_process(tmp_path):
+    flight = SingleFlight(lock_path=str(tmp_path / "singleflight.lock"), lock_timeout=5, poll_interval=0.01)
+    offset = flight._lock_offset("key")
+    open(flight.lock_path, "a").close()
+    holder = subprocess.Popen(
+        [sys.executable, "-c",
+         "import fcntl, os, sys, time\n"
+         "fd = os.open(sys.argv[1], os.O_RDWR)\n"
+         "fcntl.lockf(fd, fcntl.LOCK_EX, 1, int(sys.argv[2]))\n"
+         "print('locked', flush=True)\n"
+         "time.sleep(0.2)\n",
+         flight.lock_path, str(offset)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        assert holder.stdout.readline().strip() == "locked"
+        result = flight.do("key", lambda: "fresh", lookup=lambda: (True, "stored"))
+    finally:
+        holder.wait()
+    assert result == "stored"
+    assert flight.stats()["cross_process"] == 1
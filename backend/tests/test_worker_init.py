@@ -0,0 +1,40 @@
+import flask_app
+
+
+def test_build_app_wires_shared_services():
+    first, second = flask_app.build_app(), flask_app.build_app()
+    assert first is not second
+    assert "api" in first.blueprints and "api" in second.blueprints
+    assert first.config["MAX_CONTENT_LENGTH"] > flask_app.UPLOAD_MAX_BYTES
+    # 서비스는 모듈 전역이므로 두 앱이 같은 덱 저장소를 봄
+    deck_id = flask_app.deck_store.create("원문", [{"title": "제목", "content": "", "highlight": "", "prompt": ""}])
+    assert first.test_client().get(f"/api/decks/{deck_id}").status_code == 200
+    assert second.test_client().get(f"/api/decks/{deck_id}").status_code == 200
+
+
+def test_init_worker_starts_background_work_once_per_process(monkeypatch):
+    started = []
+    monkeypatch.setattr(flask_app, "_worker_pid", None)
+    monkeypatch.setattr(flask_app.job_queue, "start", lambda: started.append("jobs"))
+    monkeypatch.setattr(flask_app.duplicates, "warm", lambda: started.append("duplicates"))
+    flask_app.init_worker()
+    flask_app.init_worker()
+    assert started == ["jobs", "duplicates"]
+
+
+def test_first_request_initializes_worker(monkeypatch):
+    started = []
+    monkeypatch.setattr(flask_app, "_worker_pid", None)
+    monkeypatch.setattr(flask_app.job_queue, "start", lambda: started.append("jobs"))
+    monkeypatch.setattr(flask_app.duplicates, "warm", lambda: None)
+    assert flask_app.app.test_client().get("/").status_code == 200
+    assert started == ["jobs"]
+
+
+def test_openai_client_is_created_lazily_and_reset_after_fork(monkeypatch):
+    monkeypatch.setattr(flask_app, "_openai_client", None)
+    client = flask_app.get_openai_client()
+    assert flask_app.get_openai_client() is client
+    flask_app._reset_openai_client()
+    assert flask_app._openai_client is None
+    assert flask_app.get_openai_client() is not client
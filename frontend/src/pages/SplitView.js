@@ -1,7 +1,10 @@
 import React, { useState, useEffect } from 'react';
-import { analyzeText, uploadFile, generateImage } from '../utils/api';
+import { analyzeText, uploadFile, generateImage, getDeck, updateDeckCard, getImageRenditionUrl, getImageSrcSet } from '../utils/api';
 import { downloadCardImage, downloadAllImages } from '../utils/download';
 
+// 마지막으로 만든 덱 ID를 저장하는 localStorage 키
+const LAST_DECK_KEY = 'cardnews:lastDeckId';
+
 // 스타일 정의
 const styles = {
   container: {
@@ -150,10 +153,12 @@ const SplitView = () => {
   const [additionalRequest, setAdditionalRequest] = useState(''); // 추가 요청사항
   const [files, setFiles] = useState([]); // 첨부내용 (파일)
   const [cards, setCards] = useState(sampleCards);
+  const [deckId, setDeckId] = useState(null); // 서버에 저장된 덱 ID (내보내기에 사용)
   const [currentPage, setCurrentPage] = useState(0);
   const [loading, setLoading] = useState(false);
   const [imageLoading, setImageLoading] = useState(false);
   const [error, setError] = useState('');
+  const [duplicateOf, setDuplicateOf] = useState(null); // 비슷한 기사로 만든 이전 덱을 재사용한 경우 { deck_id, similarity }
   const [downloadLoading, setDownloadLoading] = useState(false);
   const [isEditing, setIsEditing] = useState(false); // 편집 모드 상태
   const [editTitle, setEditTitle] = useState(''); // 편집 중인 제목
@@ -161,6 +166,25 @@ const SplitView = () => {
   const [editHighlight, setEditHighlight] = useState(''); // 편집 중인 강조 문구
   const [editPrompt, setEditPrompt] = useState(''); // 편집 중인 이미지 프롬프트
 
+  // 새로고침 후에도 마지막으로 만든 덱을 서버에서 다시 불러옴
+  useEffect(() => {
+    const savedDeckId = localStorage.getItem(LAST_DECK_KEY);
+    if (!savedDeckId) return;
+    getDeck(savedDeckId)
+      .then((deck) => {
+        if (deck.cards && deck.cards.length > 0) {
+          setCards(deck.cards);
+          setDeckId(deck.deck_id);
+        }
+      })
+      .catch(() => localStorage.removeItem(LAST_DECK_KEY));
+  }, []);
+
+  // 현재 덱 ID 기억
+  useEffect(() => {
+    if (deckId) localStorage.setItem(LAST_DECK_KEY, deckId);
+  }, [deckId]);
+
   // 파일 선택 처리
   const handleFileChange = (e) => {
     setFiles([...e.target.files]);
@@ -194,14 +218,15 @@ const SplitView = () => {
     return true;
   };
 
-  // 텍스트 또는 파일 제출 처리
-  const handleSubmit = async () => {
+  // 텍스트 또는 파일 제출 처리 (force: 비슷한 기사의 이전 덱을 재사용하지 않고 새로 생성)
+  const handleSubmit = async (force = false) => {
     if (!validateInputs()) {
       return;
     }
     
     setLoading(true);
     setError('');
+    setDuplicateOf(null);
     
     try {
       let result;
@@ -212,7 +237,7 @@ const SplitView = () => {
       // 텍스트 분석 또는 파일 업로드
       if (contentType === 'text') {
         console.log('Submitting text:', fullText);
-        result = await analyzeText(fullText);
+        result = await analyzeText(fullText, force);
       } else if (contentType === 'file' && files.length > 0) {
         console.log('Submitting file:', files[0].name);
         result = await uploadFile(files[0]);
@@ -223,6 +248,8 @@ const SplitView = () => {
       // 결과 처리
       if (result && result.cards && result.cards.length > 0) {
         setCards(result.cards);
+        setDeckId(result.deck_id || null);
+        setDuplicateOf(result.duplicate_of || null);
         setCurrentPage(0);
       } else {
         setError('서버 응답에 카드 데이터가 없습니다.');
@@ -236,8 +263,8 @@ const SplitView = () => {
     }
   };
 
-  // 이미지 생성 처리
-  const handleGenerateImage = async (cardIndex) => {
+  // 이미지 생성 처리 (tier: 'draft'는 빠른 시안, 'final'은 최종 품질)
+  const handleGenerateImage = async (cardIndex, tier = 'draft') => {
     const card = cards[cardIndex];
     setImageLoading(true);
     try {
@@ -274,14 +301,18 @@ const SplitView = () => {
         enhancedContent, 
         card.highlight,
         style,
-        backgroundColor
+        backgroundColor,
+        deckId,
+        cardIndex,
+        tier
       );
       
       if (result.image_url) {
         const updatedCards = [...cards];
         updatedCards[cardIndex] = {
           ...updatedCards[cardIndex],
-          image: result.image_url
+          image: result.image_url,
+          imageTier: result.tier || tier
         };
         setCards(updatedCards);
       } else {
@@ -315,7 +346,7 @@ const SplitView = () => {
         return;
       }
       
-      const count = await downloadAllImages(cardsWithImages);
+      const count = await downloadAllImages(cardsWithImages, deckId);
       alert(`${count}개의 이미지가 다운로드되었습니다.`);
     } catch (error) {
       setError('다운로드 중 오류가 발생했습니다.');
@@ -347,6 +378,16 @@ const SplitView = () => {
     };
     setCards(updatedCards);
     setIsEditing(false);
+
+    // 서버 덱에도 반영 (실패해도 화면의 편집 내용은 유지)
+    if (deckId) {
+      updateDeckCard(deckId, currentPage, {
+        title: editTitle,
+        content: editContent,
+        highlight: editHighlight,
+        prompt: editPrompt
+      }).catch(err => console.error('Failed to update deck card:', err));
+    }
   };
 
   // 편집 취소
@@ -459,10 +500,23 @@ const SplitView = () => {
         </div>
         
         {error && <p style={styles.errorMessage}>{error}</p>}
+
+        {duplicateOf && (
+          <p>
+            비슷한 기사(유사도 {Math.round(duplicateOf.similarity * 100)}%)로 만든 카드뉴스를 불러왔습니다.
+            <button
+              style={loading ? styles.disabledButton : styles.button}
+              onClick={() => handleSubmit(true)}
+              disabled={loading}
+            >
+              새로 생성
+            </button>
+          </p>
+        )}
         
         <button 
           style={loading ? styles.disabledButton : styles.button}
-          onClick={handleSubmit} 
+          onClick={() => handleSubmit()} 
           disabled={loading}
         >
           {loading ? '생성 중...' : '카드뉴스 생성'}
@@ -579,7 +633,9 @@ const SplitView = () => {
           {currentCard.image ? (
             <div>
               <img 
-                src={currentCard.image} 
+                src={getImageRenditionUrl(currentCard.image, 'preview')} 
+                srcSet={getImageSrcSet(currentCard.image)}
+                sizes="(max-width: 768px) 100vw, 50vw"
                 alt={currentCard.title} 
                 style={styles.cardImage}
               />
@@ -591,6 +647,16 @@ const SplitView = () => {
                 >
                   {imageLoading ? '이미지 생성 중...' : '이미지 재생성하기'}
                 </button>
+                {/* 시안 이미지가 마음에 들면 같은 내용으로 최종 품질 이미지 생성 */}
+                {currentCard.imageTier === 'draft' && (
+                  <button 
+                    style={imageLoading ? styles.disabledButton : {...styles.button, marginLeft: '8px'}}
+                    onClick={() => handleGenerateImage(currentPage, 'final')} 
+                    disabled={imageLoading}
+                  >
+                    고화질로 확정하기
+                  </button>
+                )}
               </div>
             </div>
           ) : (
@@ -600,7 +666,7 @@ const SplitView = () => {
                 onClick={() => handleGenerateImage(currentPage)} 
                 disabled={imageLoading}
               >
-                {imageLoading ? '이미지 생성 중...' : '이미지 생성하기'}
+                {imageLoading ? '이미지 생성 중...' : '이미지 생성하기 (시안)'}
               </button>
             </div>
           )}
@@ -3,17 +3,36 @@ import axios from 'axios';
 // API 기본 URL - 개발 환경과 프로덕션 환경에 따라 다르게 설정
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 
+// 요청 제한 시간 (ms) - 서버에도 X-Request-Timeout 헤더(초)로 알려 응답을 기다리지 않게 된 요청의 작업을 중단하게 함
+const REQUEST_TIMEOUT_MS = Number(process.env.REACT_APP_REQUEST_TIMEOUT_MS) || 110000;
+// 서버가 클라이언트보다 먼저 포기하도록 네트워크 왕복 시간만큼 짧게 전달
+const DEADLINE_MARGIN_MS = 1000;
+
+const deadlineHeader = (timeoutMs) => ({
+  'X-Request-Timeout': String(Math.max(1000, timeoutMs - DEADLINE_MARGIN_MS) / 1000),
+});
+
 const api = axios.create({
   baseURL: API_BASE_URL,
+  timeout: REQUEST_TIMEOUT_MS,
   headers: {
     'Content-Type': 'application/json',
   },
 });
 
-export const analyzeText = async (text) => {
+// 요청별 timeout 옵션을 반영하여 서버 기한 헤더 추가
+api.interceptors.request.use((config) => {
+  if (config.timeout) {
+    Object.assign(config.headers, deadlineHeader(config.timeout));
+  }
+  return config;
+});
+
+// force가 true이면 비슷한 기사로 만든 이전 덱을 재사용하지 않고 새로 생성
+export const analyzeText = async (text, force = false) => {
   try {
     console.log('Sending text for analysis:', text);
-    const response = await api.post('/api/analyze-text', { text });
+    const response = await api.post('/api/analyze-text', force ? { text, force } : { text });
     console.log('Response received:', response.data);
     return response.data;
   } catch (error) {
@@ -23,6 +42,73 @@ export const analyzeText = async (text) => {
   }
 };
 
+// 스트리밍 텍스트 분석 - 카드가 완성될 때마다 onCard(card, index) 호출
+// 제한 시간이 지나면 연결을 끊어 서버도 OpenAI 스트림을 닫음
+export const analyzeTextStream = async (text, onCard) => {
+  const controller = new AbortController();
+  const timer = setTimeout(() => controller.abort(), REQUEST_TIMEOUT_MS);
+  try {
+    return await readAnalysisStream(text, onCard, controller.signal);
+  } finally {
+    clearTimeout(timer);
+  }
+};
+
+const readAnalysisStream = async (text, onCard, signal) => {
+  const response = await fetch(`${API_BASE_URL}/api/analyze-text/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', ...deadlineHeader(REQUEST_TIMEOUT_MS) },
+    body: JSON.stringify({ text }),
+    signal,
+  });
+
+  if (!response.ok || !response.body) {
+    throw new Error(`Streaming analysis failed: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder('utf-8');
+  const cards = [];
+  let buffer = '';
+  let result = { cards };
+
+  // SSE 이벤트는 빈 줄로 구분됨
+  const handleEvent = (raw) => {
+    let event = 'message';
+    let data = '';
+    raw.split('\n').forEach((line) => {
+      if (line.startsWith('event:')) event = line.slice(6).trim();
+      else if (line.startsWith('data:')) data += line.slice(5).trim();
+    });
+    if (!data) return;
+
+    const payload = JSON.parse(data);
+    if (event === 'card') {
+      cards[payload.index] = payload.card;
+      if (onCard) onCard(payload.card, payload.index);
+    } else if (event === 'done') {
+      result = { cards, cached: payload.cached };
+    } else if (event === 'error') {
+      console.error('Streaming analysis error:', payload.error);
+      result = { cards, error: payload.error };
+    }
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      handleEvent(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+    }
+  }
+
+  return result;
+};
+
 export const uploadFile = async (file) => {
   try {
     console.log('Uploading file:', file.name);
@@ -49,7 +135,10 @@ export const generateImage = async (
   content = "", 
   highlight = "", 
   style = "", 
-  backgroundColor = ""
+  backgroundColor = "",
+  deckId = null,
+  cardIndex = null,
+  tier = 'final'
 ) => {
   try {
     console.log('Generating image with prompt:', prompt);
@@ -67,7 +156,11 @@ export const generateImage = async (
       content, 
       highlight,
       style,
-      backgroundColor
+      backgroundColor,
+      // draft: 빠른 시안용 저품질, final: 최종본
+      tier,
+      // 덱 카드의 이미지이면 서버 덱에도 저장 (덱 내보내기에 사용)
+      ...(deckId ? { deckId, cardIndex } : {})
     });
     
     console.log('Image generation response:', response.data);
@@ -79,4 +172,145 @@ export const generateImage = async (
   }
 };
 
+// 여러 카드의 이미지를 한 번에 생성 (카드별 성공/실패 결과 반환)
+export const generateImages = async (cards, style = "", backgroundColor = "") => {
+  try {
+    console.log('Generating images for cards:', cards.length);
+    const response = await api.post('/api/generate-images', {
+      cards: cards.map((card) => ({
+        prompt: card.prompt,
+        title: card.title,
+        content: card.content,
+        highlight: card.highlight,
+      })),
+      style,
+      backgroundColor
+    });
+
+    console.log('Batch image generation response:', response.data);
+    return response.data;
+  } catch (error) {
+    console.error('Error generating images:', error);
+    console.error('Error details:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
+// 저장된 덱 목록 (최신순, nextCursor로 다음 페이지 조회)
+export const listDecks = async (limit = 20, cursor = null) => {
+  try {
+    const response = await api.get('/api/decks', { params: { limit, ...(cursor ? { cursor } : {}) } });
+    return response.data;
+  } catch (error) {
+    console.error('Error listing decks:', error);
+    console.error('Error details:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
+// 덱 카드의 이미지 등급/갱신 필요 여부를 화면에서 쓰는 이름(imageTier, imageStale)으로 변환
+const toClientCard = (card) => card && {
+  ...card,
+  imageTier: card.image_tier ?? null,
+  imageStale: Boolean(card.image_stale),
+};
+
+const toClientDeck = (deck) => deck && { ...deck, cards: (deck.cards || []).map(toClientCard) };
+
+// 카드 수정/재생성 응답의 덱과 카드 변환
+const toClientCardResponse = (data) => ({ ...data, deck: toClientDeck(data.deck), card: toClientCard(data.card) });
+
+// 덱 조회 (카드별 버전과 이미지 갱신 필요 여부 포함)
+export const getDeck = async (deckId) => {
+  try {
+    const response = await api.get(`/api/decks/${deckId}`);
+    return toClientDeck(response.data);
+  } catch (error) {
+    console.error('Error fetching deck:', error);
+    console.error('Error details:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
+// 카드 한 장 수정 (바뀐 항목만 전달, revision이 다르면 409 오류)
+export const updateDeckCard = async (deckId, index, fields, revision) => {
+  try {
+    const response = await api.patch(`/api/decks/${deckId}/cards/${index}`, { ...fields, revision });
+    return toClientCardResponse(response.data);
+  } catch (error) {
+    console.error('Error updating card:', error);
+    console.error('Error details:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
+// 카드 한 장만 다시 생성 (나머지 카드는 문맥으로 사용)
+export const regenerateDeckCard = async (deckId, index, instruction = "", generateImage = false) => {
+  try {
+    const response = await api.post(`/api/decks/${deckId}/cards/${index}/regenerate`, { instruction, generateImage });
+    return toClientCardResponse(response.data);
+  } catch (error) {
+    console.error('Error regenerating card:', error);
+    console.error('Error details:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
+// 이미지가 없거나 내용이 바뀐 카드의 이미지만 생성
+export const refreshDeckImages = async (deckId, indexes = null) => {
+  try {
+    const response = await api.post(`/api/decks/${deckId}/images`, indexes ? { indexes } : {});
+    return response.data;
+  } catch (error) {
+    console.error('Error refreshing deck images:', error);
+    console.error('Error details:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
+// 확정한 카드(indexes, 생략 시 전체) 중 아직 시안인 이미지만 최종 품질로 다시 생성
+export const finalizeDeck = async (deckId, indexes = null) => {
+  try {
+    const response = await api.post(`/api/decks/${deckId}/finalize`, indexes ? { indexes } : {});
+    return response.data;
+  } catch (error) {
+    console.error('Error finalizing deck images:', error);
+    console.error('Error details:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
+// 서버 저장 이미지의 축소/압축 렌디션 URL (rendition: thumb, preview, full / 형식은 브라우저 Accept 헤더로 결정)
+// 서버가 제공하지 않는 이미지(data URL, 외부 URL)는 그대로 반환
+export const getImageRenditionUrl = (url, rendition = 'preview') => {
+  if (!url || !url.includes('/api/images/') || url.includes('?')) {
+    return url;
+  }
+  return `${url}?rendition=${rendition}`;
+};
+
+// 화면 크기에 맞는 렌디션을 브라우저가 고르도록 srcSet 구성 (렌디션이 없는 이미지는 undefined)
+export const getImageSrcSet = (url) => {
+  if (getImageRenditionUrl(url) === url) {
+    return undefined;
+  }
+  return `${getImageRenditionUrl(url, 'preview')} 512w, ${getImageRenditionUrl(url, 'full')} 1024w`;
+};
+
+// 덱 내보내기 URL (format: zip 또는 pdf, 서버가 스트리밍으로 생성)
+export const getDeckExportUrl = (deckId, format = 'zip') =>
+  `${API_BASE_URL}/api/decks/${deckId}/export?format=${format}`;
+
+// 백그라운드 작업 상태 조회 (wait 초 동안 완료를 기다리는 long polling)
+export const getJob = async (jobId, wait = 0) => {
+  try {
+    const response = await api.get(`/api/jobs/${jobId}`, { params: wait ? { wait } : {} });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching job status:', error);
+    console.error('Error details:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
 export default api; 
\ No newline at end of file
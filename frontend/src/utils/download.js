@@ -1,4 +1,5 @@
 // 카드뉴스 다운로드 기능을 위한 유틸리티
+import { getDeckExportUrl } from './api';
 
 // 이미지 URL을 Blob으로 변환
 export const urlToBlob = async (url) => {
@@ -15,12 +16,20 @@ export const downloadCardImage = async (card, index) => {
   }
   
   try {
+    // 서버 URL 이미지는 다른 출처일 수 있으므로 Blob으로 받아 다운로드
+    const isDataUrl = card.image.startsWith('data:');
+    const href = isDataUrl ? card.image : URL.createObjectURL(await urlToBlob(card.image));
+
     const a = document.createElement('a');
-    a.href = card.image;
+    a.href = href;
     a.download = `카드뉴스_${index + 1}.png`;
     document.body.appendChild(a);
     a.click();
     document.body.removeChild(a);
+
+    if (!isDataUrl) {
+      URL.revokeObjectURL(href);
+    }
     return true;
   } catch (error) {
     console.error('이미지 다운로드 오류:', error);
@@ -29,10 +38,18 @@ export const downloadCardImage = async (card, index) => {
 };
 
 // 모든 카드뉴스 이미지 다운로드 (zip 형태로)
-export const downloadAllImages = async (cards) => {
-  // zip 라이브러리가 필요한 경우 추가 구현
-  // 여기서는 간단하게 각 이미지를 개별적으로 다운로드
-  
+export const downloadAllImages = async (cards, deckId = null) => {
+  // 서버에 저장된 덱이면 서버가 스트리밍으로 만든 zip을 바로 다운로드
+  if (deckId) {
+    const a = document.createElement('a');
+    a.href = getDeckExportUrl(deckId, 'zip');
+    document.body.appendChild(a);
+    a.click();
+    document.body.removeChild(a);
+    return cards.length;
+  }
+
+  // 덱이 없으면(샘플 카드 등) 각 이미지를 개별적으로 다운로드
   let successCount = 0;
   
   for (let i = 0; i < cards.length; i++) {